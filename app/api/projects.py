@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func
+from datetime import datetime
 
 from app.db.deps import get_db
 from app.core.dependencies import get_current_user
@@ -9,8 +10,11 @@ from app.models.project import Project
 from app.models.model_run import ModelRun
 from app.models.evaluation_result import EvaluationResult
 from app.models.test_case import TestCase
-from app.schemas.project import ProjectCreate, ProjectResponse
+from app.models.deletion_job import ProjectDeletionJob
+from app.schemas.project import ProjectCreate, ProjectResponse, DeletionJobResponse, RetentionPolicy
 from app.schemas.analytics import HealthResponse, FailingTest
+from app.services.project_deletion import start_deletion_job
+from app.services.run_archive import runs_to_archive, start_retention
 
 router = APIRouter(prefix="/projects", tags=["Projects"],
     dependencies=[Depends(get_current_user)])
@@ -36,7 +40,10 @@ def list_projects(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    projects = db.query(Project).filter(Project.user_id == current_user.id).all()
+    projects = db.query(Project).filter(
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).all()
     return projects
 
 @router.post("/{project_id}/health", response_model=HealthResponse)
@@ -48,23 +55,28 @@ def get_project_health(
     # 1. Verify Project
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # 2. Get Recent Runs (Completed only)
+    # 2. Get Recent Runs (Completed only). Bisect probes grade a handful of
+    # regressed cases, so they say nothing about the project's health
+    not_probe = ModelRun.mode.is_distinct_from("bisect")
     runs = db.query(ModelRun).filter(
         ModelRun.project_id == project_id,
-        ModelRun.status == "completed"
+        ModelRun.status == "completed",
+        not_probe
     ).order_by(desc(ModelRun.completed_at)).limit(2).all()
 
     # --- Metrics Logic ---
 
     # A. Models Compared (Unique count)
     unique_models = db.query(ModelRun.model_name).filter(
-        ModelRun.project_id == project_id
+        ModelRun.project_id == project_id,
+        not_probe
     ).distinct().count()
 
     # B. Worst Failing Tests (Top 5 most frequent failures)
@@ -76,6 +88,7 @@ def get_project_health(
      .join(ModelRun, EvaluationResult.model_run_id == ModelRun.id)\
      .filter(
          ModelRun.project_id == project_id,
+         not_probe,
          EvaluationResult.score == 0  # 0 = Incorrect
      )\
      .group_by(TestCase.id)\
@@ -134,7 +147,7 @@ def get_project_health(
     )
 
 # 👇 NEW: Delete Project Endpoint
-@router.delete("/{project_id}")
+@router.delete("/{project_id}", status_code=202)
 def delete_project(
     project_id: int,
     db: Session = Depends(get_db),
@@ -143,28 +156,93 @@ def delete_project(
     # 1. Verify Project Ownership
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # 2. Cascade Delete (Manually deleting children to be safe)
-    # Delete Evaluation Results linked to this project's runs
-    db.query(EvaluationResult).filter(
-        EvaluationResult.model_run_id.in_(
-            db.query(ModelRun.id).filter(ModelRun.project_id == project_id)
-        )
-    ).delete(synchronize_session=False)
+    # 2. Soft-delete now; children are removed in batches by a background job
+    project.deleted_at = datetime.utcnow()
+    job = ProjectDeletionJob(project_id=project_id, user_id=current_user.id, status="pending")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    start_deletion_job(job.id)
 
-    # Delete Model Runs
-    db.query(ModelRun).filter(ModelRun.project_id == project_id).delete(synchronize_session=False)
+    return {"status": "success", "message": f"Project {project_id} scheduled for deletion", "job_id": job.id}
+
+@router.get("/{project_id}/deletion", response_model=DeletionJobResponse)
+def get_deletion_status(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = db.query(ProjectDeletionJob).filter(
+        ProjectDeletionJob.project_id == project_id,
+        ProjectDeletionJob.user_id == current_user.id
+    ).order_by(desc(ProjectDeletionJob.created_at)).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="No deletion job for this project")
+
+    return DeletionJobResponse(
+        job_id=job.id,
+        project_id=job.project_id,
+        status=job.status,
+        stage=job.stage,
+        deleted_rows=job.deleted_rows or 0,
+        error=job.error,
+        created_at=job.created_at,
+        completed_at=job.completed_at
+    )
+
+
+@router.put("/{project_id}/retention", response_model=RetentionPolicy)
+def set_retention_policy(
+    project_id: int,
+    policy: RetentionPolicy,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
 
-    # Delete Test Cases
-    db.query(TestCase).filter(TestCase.project_id == project_id).delete(synchronize_session=False)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-    # 3. Delete Project
-    db.delete(project)
+    project.retention_days = policy.retention_days
+    project.retention_keep_latest = policy.retention_keep_latest
     db.commit()
 
-    return {"status": "success", "message": f"Project {project_id} deleted"}
\ No newline at end of file
+    return policy
+
+@router.post("/{project_id}/retention/apply", status_code=202)
+def apply_retention_policy(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if not project.retention_days:
+        raise HTTPException(status_code=400, detail="Project has no retention policy")
+
+    # Archive in the background; report what will be moved
+    run_ids = [run.id for run in runs_to_archive(db, project)]
+    if run_ids:
+        start_retention(project_id)
+
+    return {"status": "success", "runs_to_archive": run_ids}
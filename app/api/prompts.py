@@ -7,7 +7,9 @@ from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.models.project import Project
 from app.models.prompt import PromptVersion
-from app.schemas.prompt import PromptCreate, PromptResponse
+from app.schemas.prompt import BisectRequest, BisectResponse, PromptCreate, PromptResponse
+from app.services.bisect import BisectAborted, bisect_prompt_versions
+from app.services.scheduler import RunCancelled
 
 router = APIRouter(prefix="/projects/{project_id}/prompts", tags=["Prompts"],
     dependencies=[Depends(get_current_user)])
@@ -22,7 +24,8 @@ def create_prompt_version(
     # 1. Verify project ownership
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not project:
@@ -59,7 +62,8 @@ def list_prompts(
     # Verify project
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not project:
@@ -69,4 +73,49 @@ def list_prompts(
         PromptVersion.project_id == project_id
     ).order_by(desc(PromptVersion.version)).all()
 
-    return prompts
\ No newline at end of file
+    return prompts
+
+@router.post("/bisect", response_model=BisectResponse)
+def bisect_prompts(
+    project_id: int,
+    payload: BisectRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # 1. Verify project ownership
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    # 2. Both versions must belong to the project, good before bad
+    good = db.query(PromptVersion).filter(
+        PromptVersion.id == payload.good_version_id,
+        PromptVersion.project_id == project_id
+    ).first()
+    bad = db.query(PromptVersion).filter(
+        PromptVersion.id == payload.bad_version_id,
+        PromptVersion.project_id == project_id
+    ).first()
+
+    if not good or not bad:
+        raise HTTPException(status_code=404, detail="Prompt version not found")
+    if good.version >= bad.version:
+        raise HTTPException(status_code=400, detail="The good version must be older than the bad version")
+
+    # 3. Bisect, reusing cached results and grading only regressed cases
+    user_keys = {
+        "openai": current_user.openai_key,
+        "anthropic": current_user.anthropic_key,
+        "gemini": current_user.gemini_key
+    }
+    try:
+        return bisect_prompt_versions(db, project_id, good, bad, payload.model_name, user_keys, current_user.id)
+    except BisectAborted as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except RunCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
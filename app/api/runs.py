@@ -1,20 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session, aliased
+from typing import List, Optional
 from datetime import datetime
 import csv
 from fastapi.responses import StreamingResponse
 import io
 
 from app.db.deps import get_db
+from app.db.session import SessionLocal
 from app.core.dependencies import get_current_user
+from app.core.metrics import RUNS_IN_FLIGHT
+from app.core.responses import FastJSONResponse
+from app.core.http_cache import cache_headers, not_modified, run_etag
 from app.models.user import User
 from app.models.project import Project
 from app.models.test_case import TestCase
 from app.models.model_run import ModelRun
 from app.models.evaluation_result import EvaluationResult
-from app.schemas.run import RunRequest, RunSummary
-from app.schemas.compare import ComparisonResponse, ComparisonRow
-from app.services.evaluation_engine import evaluate
+from app.models.evaluation_sample import EvaluationSample
+from app.models.output_blob import OutputBlob
+from app.models.batch_job import BatchJob
+from app.schemas.run import BatchJobResponse, FlakinessResponse, FlakyTest, RunRequest, RunSummary
+from app.schemas.analytics import ModelLatencyResponse, RunLatencyResponse
+from app.schemas.compare import ComparisonResponse, ComparisonSummary
+from app.services.evaluation_engine import cached_input_tokens, estimate_cost, evaluate
+from app.services.sampling import evaluate_sampled
+from app.services.flakiness import evaluate_repeated, save_samples
+from app.services.hedging import HedgePolicy
+from app.services.scheduler import RunCancelled, scheduler
+from app.services.batch_backends import backend_name_for
+from app.services.batch_runs import submit_batch_run
+from app.services import columnar_export, run_matrix
+from app.services.output_store import output_text, save_results
+from app.services.run_archive import (
+    ArchiveInProgress, archived_records, archived_results, archived_scores, ensure_hot, is_archived,
+)
+from app.services.latency_stats import completed_runs_by_model, latency_report
 
 # Handle PromptVersion import gracefully
 try:
@@ -22,6 +44,9 @@ try:
 except ImportError:
     PromptVersion = None
 
+MAX_MATRIX_RUNS = 20
+CSV_FLUSH_BYTES = 64 * 1024
+
 router = APIRouter(prefix="/projects/{project_id}/run", tags=["Evaluation"], dependencies=[Depends(get_current_user)])
 
 @router.post("/", response_model=RunSummary)
@@ -34,7 +59,8 @@ def run_evaluation(
     # 1. Verify project ownership
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not project:
@@ -58,12 +84,38 @@ def run_evaluation(
     if not tests:
         raise HTTPException(status_code=400, detail="No test cases found")
 
+    if payload.mode != "full" and payload.samples_per_test > 1:
+        raise HTTPException(status_code=400, detail="Repeated sampling is only supported for full runs")
+
+    batch_backend = backend_name_for(payload.model_name) if payload.mode == "batch" else None
+    if payload.mode == "batch" and not batch_backend:
+        raise HTTPException(status_code=400, detail="Batch mode is not available for this model")
+
+    # Smoke runs against a baseline compare pass/fail per test
+    baseline_scores = None
+    if payload.mode == "smoke" and payload.baseline_run_id is not None:
+        baseline = db.query(ModelRun).filter(
+            ModelRun.id == payload.baseline_run_id,
+            ModelRun.project_id == project_id
+        ).first()
+        if not baseline:
+            raise HTTPException(status_code=404, detail="Baseline run not found")
+        if is_archived(baseline):
+            baseline_scores = archived_scores(baseline)
+        else:
+            baseline_scores = dict(db.query(EvaluationResult.test_case_id, EvaluationResult.score).filter(
+                EvaluationResult.model_run_id == baseline.id
+            ).all())
+
     # 4. Create model run record
     run = ModelRun(
         project_id=project_id,
         model_name=payload.model_name,
         prompt_version_id=getattr(payload, "prompt_version_id", None),
         status="running",
+        mode=payload.mode,
+        priority=payload.priority,
+        samples_per_test=payload.samples_per_test,
         total_input_tokens=0,
         total_output_tokens=0,
         estimated_cost=0.0
@@ -72,140 +124,428 @@ def run_evaluation(
     db.commit()
     db.refresh(run)
 
+    # 👇 NEW: Extract User Keys
+    user_keys = {
+        "openai": current_user.openai_key,
+        "anthropic": current_user.anthropic_key,
+        "gemini": current_user.gemini_key
+    }
+
+    # Batch runs are only submitted here; the worker ingests the results
+    if payload.mode == "batch":
+        try:
+            submit_batch_run(db, run, tests, system_template, user_keys, batch_backend)
+        except Exception as e:
+            print(f"Batch submission failed: {e}")
+            run.status = "failed"
+            db.commit()
+            raise HTTPException(status_code=502, detail=f"Batch submission failed: {e}")
+
+        return RunSummary(
+            run_id=str(run.id),
+            model_name=payload.model_name,
+            status=run.status,
+            prompt_version_id=getattr(payload, "prompt_version_id", None),
+            total_tests=0,
+            correct=0,
+            incorrect=0,
+            mode=run.mode
+        )
+
     # 5. Run Evaluation
+    hedge = HedgePolicy(payload.hedge_quantile, payload.hedge_budget) if payload.hedge else None
+    # Provider calls wait for fair-share slots, shared with every other run
+    ticket = scheduler.register(run.id, current_user.id, project_id, payload.priority)
+    RUNS_IN_FLIGHT.inc()
     try:
-        # 👇 NEW: Extract User Keys
-        user_keys = {
-            "openai": current_user.openai_key,
-            "anthropic": current_user.anthropic_key,
-            "gemini": current_user.gemini_key
-        }
 
         # 👇 UPDATED: Pass keys to evaluate function
-        results, input_tokens, output_tokens = evaluate(
-            test_cases=tests, 
-            model_name=payload.model_name, 
-            api_keys=user_keys, 
-            system_template=system_template
-        )
+        if payload.mode == "smoke":
+            results, input_tokens, output_tokens, report = evaluate_sampled(
+                tests,
+                model_name=payload.model_name,
+                api_keys=user_keys,
+                system_template=system_template,
+                target_ci_width=payload.target_ci_width,
+                confidence=payload.confidence,
+                wave_size=payload.wave_size,
+                max_cases=payload.max_cases,
+                baseline_scores=baseline_scores,
+                hedge=hedge,
+                ticket=ticket
+            )
+            run.sampling_report = report
+        elif payload.samples_per_test > 1:
+            results, input_tokens, output_tokens, samples = evaluate_repeated(
+                tests,
+                model_name=payload.model_name,
+                api_keys=user_keys,
+                system_template=system_template,
+                samples_per_test=payload.samples_per_test,
+                stop_confidence=payload.stop_confidence,
+                concurrency=payload.sample_concurrency,
+                hedge=hedge,
+                ticket=ticket
+            )
+            save_samples(db, run.id, samples)
+            run.sample_calls = len(samples)
+        else:
+            results, input_tokens, output_tokens = evaluate(
+                test_cases=tests, 
+                model_name=payload.model_name, 
+                api_keys=user_keys, 
+                system_template=system_template,
+                hedge=hedge,
+                ticket=ticket
+            )
 
-        # Cost Calculation
-        cost = (input_tokens / 1_000_000 * 0.075) + (output_tokens / 1_000_000 * 0.30)
+        # Cost Calculation (prompt-cache hits are billed at a discount)
+        cached_input = cached_input_tokens(samples if payload.samples_per_test > 1 else results)
+        cost = estimate_cost(input_tokens, output_tokens, cached_input, model_name=payload.model_name)
 
         run.total_input_tokens = input_tokens
         run.total_output_tokens = output_tokens
+        run.total_cached_input_tokens = cached_input
         run.estimated_cost = cost
+        run.hedged_calls = hedge.hedges if hedge else None
         
-        # 6. Save Results
-        for res in results:
-            db_res = EvaluationResult(
-                model_run_id=run.id,
-                test_case_id=res["test_id"],
-                model_output=res["output"],
-                score=res["score"],
-                category=res["category"]
-            )
-            db.add(db_res)
+        # 6. Save Results (outputs are deduplicated into the blob store)
+        save_results(db, run.id, results)
         
         run.status = "completed"
         run.completed_at = datetime.utcnow()
         db.commit()
 
         correct = sum(1 for r in results if r["score"] == 2)
+        # Smoke runs only spend part of the suite
+        total = len(results) if payload.mode == "smoke" else len(tests)
         
         return RunSummary(
             run_id=str(run.id),
             model_name=payload.model_name,
+            status=run.status,
             prompt_version_id=getattr(payload, "prompt_version_id", None),
-            total_tests=len(tests),
+            total_tests=total,
             correct=correct,
-            incorrect=len(tests) - correct,
+            incorrect=total - correct,
             total_input_tokens=run.total_input_tokens,
             total_output_tokens=run.total_output_tokens,
-            estimated_cost=run.estimated_cost
+            total_cached_input_tokens=run.total_cached_input_tokens,
+            estimated_cost=run.estimated_cost,
+            mode=run.mode,
+            sampling=run.sampling_report,
+            samples_per_test=run.samples_per_test,
+            sample_calls=run.sample_calls,
+            hedged_calls=run.hedged_calls,
+            priority=run.priority
         )
 
+    except RunCancelled:
+        # Partial results are discarded
+        db.rollback()
+        run.status = "cancelled"
+        run.completed_at = datetime.utcnow()
+        db.commit()
+        return RunSummary(
+            run_id=str(run.id),
+            model_name=payload.model_name,
+            status=run.status,
+            prompt_version_id=getattr(payload, "prompt_version_id", None),
+            total_tests=0,
+            correct=0,
+            incorrect=0,
+            mode=run.mode,
+            priority=run.priority
+        )
     except Exception as e:
         print(f"Run Failed: {e}")
         run.status = "failed"
         db.commit()
         raise e
+    finally:
+        RUNS_IN_FLIGHT.dec()
+        scheduler.unregister(ticket)
+        if hedge:
+            hedge.close()
     
 @router.get("/", response_model=list[RunSummary])
 def list_runs(
     project_id: int,
+    include_probes: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
     
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    runs = db.query(ModelRun).filter(
-        ModelRun.project_id == project_id
-    ).order_by(ModelRun.started_at.desc()).all()
+    query = db.query(ModelRun).filter(ModelRun.project_id == project_id)
+    # Bisect probes are partial runs; listed only on request
+    if not include_probes:
+        query = query.filter(ModelRun.mode.is_distinct_from("bisect"))
+    runs = query.order_by(ModelRun.started_at.desc()).all()
 
     summaries = []
     for run in runs:
-        total = db.query(EvaluationResult).filter(EvaluationResult.model_run_id == run.id).count()
-        correct = db.query(EvaluationResult).filter(
-            EvaluationResult.model_run_id == run.id, 
-            EvaluationResult.score == 2
-        ).count()
+        if is_archived(run):
+            # Results are in cold storage; use the counts kept on the run
+            total = run.archived_total or 0
+            correct = run.archived_correct or 0
+        else:
+            total = db.query(EvaluationResult).filter(EvaluationResult.model_run_id == run.id).count()
+            correct = db.query(EvaluationResult).filter(
+                EvaluationResult.model_run_id == run.id, 
+                EvaluationResult.score == 2
+            ).count()
         
         summaries.append(RunSummary(
             run_id=str(run.id),
             model_name=run.model_name,
+            status=run.status,
             prompt_version_id=run.prompt_version_id,
             total_tests=total,
             correct=correct,
             incorrect=total - correct,
             total_input_tokens=run.total_input_tokens,
             total_output_tokens=run.total_output_tokens,
-            estimated_cost=run.estimated_cost
+            total_cached_input_tokens=run.total_cached_input_tokens or 0,
+            estimated_cost=run.estimated_cost,
+            mode=run.mode or "full",
+            sampling=run.sampling_report,
+            samples_per_test=run.samples_per_test or 1,
+            sample_calls=run.sample_calls,
+            hedged_calls=run.hedged_calls,
+            priority=run.priority or "interactive"
         ))
 
     return summaries
 
-@router.get("/{run_id}/details")
+def _results_with_tests(db, run):
+    """(result, TestCase, output text) of a run, hot or archived."""
+    if is_archived(run):
+        # Read from the archive file; reads never move a run back to the hot table
+        return ((res, test, res.output) for res, test in archived_results(db, run))
+
+    rows = db.query(EvaluationResult, TestCase, OutputBlob.codec, OutputBlob.data).join(
+        TestCase, EvaluationResult.test_case_id == TestCase.id
+    ).outerjoin(
+        OutputBlob, EvaluationResult.output_hash == OutputBlob.hash
+    ).filter(
+        EvaluationResult.model_run_id == run.id
+    ).all()
+    return ((res, test, output_text(res.model_output, codec, data)) for res, test, codec, data in rows)
+
+@router.get("/{run_id}/details", response_class=FastJSONResponse)
 def get_run_details(
+    project_id: int,
     run_id: int, 
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    results = db.query(EvaluationResult, TestCase).join(
-        TestCase, EvaluationResult.test_case_id == TestCase.id
-    ).filter(
-        EvaluationResult.model_run_id == run_id 
-    ).all()
+    run = db.query(ModelRun).join(Project, ModelRun.project_id == Project.id).filter(
+        ModelRun.id == run_id,
+        ModelRun.project_id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    # Repeat views of a completed run are answered from the run row alone
+    etag = run_etag([run], "details")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
 
     details = []
-    for res, test in results:
+    for res, test, output in _results_with_tests(db, run):
         details.append({
             "test_id": test.id,
             "prompt": test.prompt,
             "expected": test.expected,
-            "output": res.model_output,
+            "output": output,
             "score": res.score,
-            "category": res.category
+            "category": res.category,
+            "sample_count": res.sample_count,
+            "pass_probability": res.pass_probability,
+            "flakiness": res.flakiness,
+            "context_spans": res.context_spans,
+            "scorer_stage": res.scorer_stage,
+            "judge_backend": res.judge_backend
         })
-    return details
+    return FastJSONResponse(details, headers=cache_headers(etag))
+
+def _compare_sql(db, project_id, run_id_1, run_id_2, changed_only, after_test_id, limit):
+    """(summary, page rows, next cursor) of two hot runs, joined in SQL."""
+    r1 = aliased(EvaluationResult)
+    r2 = aliased(EvaluationResult)
+    b1 = aliased(OutputBlob)
+    b2 = aliased(OutputBlob)
+
+    # Every test of the project, with its result (if any) in each run
+    joined = db.query(TestCase).outerjoin(
+        r1, and_(r1.test_case_id == TestCase.id, r1.model_run_id == run_id_1)
+    ).outerjoin(
+        r2, and_(r2.test_case_id == TestCase.id, r2.model_run_id == run_id_2)
+    ).filter(TestCase.project_id == project_id)
+
+    # Summary counts, computed in the database
+    totals = joined.with_entities(
+        func.count(TestCase.id),
+        func.coalesce(func.sum(case((r2.score > r1.score, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((r2.score < r1.score, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((r2.score == r1.score, 1), else_=0)), 0),
+    ).one()
+    total, wins, losses, ties = (int(v) for v in totals)
+    summary = ComparisonSummary(
+        total=total, wins=wins, losses=losses, ties=ties,
+        missing=total - wins - losses - ties
+    )
 
-@router.get("/compare", response_model=ComparisonResponse)
+    # One page of rows, keyset-paginated on test id
+    page_query = joined.outerjoin(
+        b1, r1.output_hash == b1.hash
+    ).outerjoin(
+        b2, r2.output_hash == b2.hash
+    ).with_entities(
+        TestCase.id, TestCase.prompt, TestCase.expected,
+        r1.model_output, b1.codec, b1.data, r1.score,
+        r2.model_output, b2.codec, b2.data, r2.score
+    )
+    if changed_only:
+        # Regressions, fixes, and tests that only one of the runs covered
+        page_query = page_query.filter(
+            func.coalesce(r1.score, -1) != func.coalesce(r2.score, -1)
+        )
+    if after_test_id is not None:
+        page_query = page_query.filter(TestCase.id > after_test_id)
+
+    rows = page_query.order_by(TestCase.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1][0]
+
+    # Plain dicts shaped like ComparisonRow: skips per-row model validation
+    comparison_rows = [
+        {
+            "test_id": test_id,
+            "prompt": prompt,
+            "expected": expected,
+            "run1_output": output_text(out1, codec1, data1),
+            "run1_score": score1,
+            "run2_output": output_text(out2, codec2, data2),
+            "run2_score": score2,
+        }
+        for (
+            test_id, prompt, expected,
+            out1, codec1, data1, score1,
+            out2, codec2, data2, score2
+        ) in rows
+    ]
+
+    return summary, comparison_rows, next_cursor
+
+def _compare_archived(db, project_id, run1, run2, changed_only, after_test_id, limit):
+    """
+    Same as _compare_sql when either run is archived: scores are matched up
+    per test here, and outputs are only resolved for the returned page.
+    """
+    scores = [_run_scores(db, run) for run in (run1, run2)]
+
+    total = wins = losses = ties = 0
+    page = []
+    for test_id, prompt, expected in db.query(TestCase.id, TestCase.prompt, TestCase.expected).filter(
+        TestCase.project_id == project_id
+    ).order_by(TestCase.id).yield_per(1000):
+        score1, score2 = scores[0].get(test_id), scores[1].get(test_id)
+        total += 1
+        if score1 is not None and score2 is not None:
+            wins += score2 > score1
+            losses += score2 < score1
+            ties += score2 == score1
+
+        if len(page) > limit or (after_test_id is not None and test_id <= after_test_id):
+            continue
+        if changed_only and (-1 if score1 is None else score1) == (-1 if score2 is None else score2):
+            continue
+        page.append((test_id, prompt, expected, score1, score2))
+
+    summary = ComparisonSummary(
+        total=total, wins=wins, losses=losses, ties=ties,
+        missing=total - wins - losses - ties
+    )
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = page[-1][0]
+
+    page_ids = {row[0] for row in page}
+    outputs = [_run_outputs(db, run, page_ids) for run in (run1, run2)]
+    comparison_rows = [
+        {
+            "test_id": test_id,
+            "prompt": prompt,
+            "expected": expected,
+            "run1_output": outputs[0].get(test_id),
+            "run1_score": score1,
+            "run2_output": outputs[1].get(test_id),
+            "run2_score": score2,
+        }
+        for test_id, prompt, expected, score1, score2 in page
+    ]
+    return summary, comparison_rows, next_cursor
+
+def _run_scores(db, run):
+    if is_archived(run):
+        return archived_scores(run)
+    return dict(db.query(EvaluationResult.test_case_id, EvaluationResult.score).filter(
+        EvaluationResult.model_run_id == run.id
+    ))
+
+def _run_outputs(db, run, test_ids):
+    """{test id: output text} of a run, for `test_ids` only."""
+    if is_archived(run):
+        return {
+            record["test_case_id"]: record["output"]
+            for record in archived_records(run) if record["test_case_id"] in test_ids
+        }
+    return {
+        test_id: output_text(model_output, codec, data)
+        for test_id, model_output, codec, data in db.query(
+            EvaluationResult.test_case_id, EvaluationResult.model_output, OutputBlob.codec, OutputBlob.data
+        ).outerjoin(
+            OutputBlob, EvaluationResult.output_hash == OutputBlob.hash
+        ).filter(
+            EvaluationResult.model_run_id == run.id,
+            EvaluationResult.test_case_id.in_(list(test_ids))
+        )
+    }
+
+@router.get("/compare", response_model=ComparisonResponse, response_class=FastJSONResponse)
 def compare_runs(
     project_id: int,
     run_id_1: int,
     run_id_2: int,
+    request: Request,
+    changed_only: bool = False,
+    after_test_id: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=5000),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
     
     if not project:
@@ -217,39 +557,233 @@ def compare_runs(
     if not run1 or not run2:
         raise HTTPException(status_code=404, detail="One or both runs not found")
 
-    results1 = db.query(EvaluationResult).filter(EvaluationResult.model_run_id == run_id_1).all()
-    results2 = db.query(EvaluationResult).filter(EvaluationResult.model_run_id == run_id_2).all()
+    # The row set also depends on the project's tests (not on results)
+    test_count, max_test_id = db.query(func.count(TestCase.id), func.max(TestCase.id)).filter(
+        TestCase.project_id == project_id
+    ).one()
+    etag = run_etag(
+        [run1, run2],
+        f"compare:{changed_only}:{after_test_id}:{limit}:{test_count}:{max_test_id}"
+    )
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
 
-    r1_map = {r.test_case_id: r for r in results1}
-    r2_map = {r.test_case_id: r for r in results2}
+    if is_archived(run1) or is_archived(run2):
+        summary, comparison_rows, next_cursor = _compare_archived(
+            db, project_id, run1, run2, changed_only, after_test_id, limit
+        )
+    else:
+        summary, comparison_rows, next_cursor = _compare_sql(
+            db, project_id, run_id_1, run_id_2, changed_only, after_test_id, limit
+        )
 
-    tests = db.query(TestCase).filter(TestCase.project_id == project_id).all()
+    return FastJSONResponse({
+        "project_id": project_id,
+        "run1_id": str(run1.id),
+        "run1_name": run1.model_name,
+        "run2_id": str(run2.id),
+        "run2_name": run2.model_name,
+        "summary": summary.model_dump(),
+        "comparisons": comparison_rows,
+        "next_cursor": next_cursor,
+    }, headers=cache_headers(etag))
+
+@router.get("/matrix")
+def compare_runs_matrix(
+    project_id: int,
+    run_ids: List[int] = Query(...),
+    disagreements_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
 
-    comparison_rows = []
-    for test in tests:
-        res1 = r1_map.get(test.id)
-        res2 = r2_map.get(test.id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-        row = ComparisonRow(
-            test_id=test.id,
-            prompt=test.prompt,
-            expected=test.expected,
-            run1_output=res1.model_output if res1 else None,
-            run1_score=res1.score if res1 else None,
-            run2_output=res2.model_output if res2 else None,
-            run2_score=res2.score if res2 else None
-        )
-        comparison_rows.append(row)
+    run_ids = list(dict.fromkeys(run_ids))
+    if not 2 <= len(run_ids) <= MAX_MATRIX_RUNS:
+        raise HTTPException(status_code=400, detail=f"Provide between 2 and {MAX_MATRIX_RUNS} run ids")
 
-    return ComparisonResponse(
-        project_id=project_id,
-        run1_id=str(run1.id),
-        run1_name=run1.model_name,
-        run2_id=str(run2.id),
-        run2_name=run2.model_name,
-        comparisons=comparison_rows
+    runs = db.query(ModelRun).filter(
+        ModelRun.id.in_(run_ids),
+        ModelRun.project_id == project_id
+    ).all()
+    if len(runs) != len(run_ids):
+        raise HTTPException(status_code=404, detail="One or more runs not found")
+
+    # Keep the caller's column order
+    runs.sort(key=lambda r: run_ids.index(r.id))
+
+    return StreamingResponse(
+        run_matrix.stream_matrix(project_id, runs, disagreements_only=disagreements_only),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/latency/models", response_model=list[ModelLatencyResponse])
+def get_model_latency(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    # Archived runs are left out rather than rehydrated for a summary view
+    return [
+        ModelLatencyResponse(model_name=model_name, runs=len(runs), **latency_report(db, runs))
+        for model_name, runs in sorted(completed_runs_by_model(db, project_id).items())
+    ]
+
+@router.get("/{run_id}/latency", response_model=RunLatencyResponse)
+def get_run_latency(
+    project_id: int,
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    run = db.query(ModelRun).join(Project, ModelRun.project_id == Project.id).filter(
+        ModelRun.id == run_id,
+        ModelRun.project_id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    return RunLatencyResponse(run_id=str(run.id), model_name=run.model_name, **latency_report(db, [run]))
+
+@router.get("/{run_id}/batch", response_model=BatchJobResponse)
+def get_batch_job(
+    project_id: int,
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = db.query(BatchJob).join(ModelRun, BatchJob.model_run_id == ModelRun.id).join(
+        Project, ModelRun.project_id == Project.id
+    ).filter(
+        ModelRun.id == run_id,
+        ModelRun.project_id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    return BatchJobResponse(
+        run_id=str(run_id),
+        backend=job.backend,
+        provider_batch_id=job.provider_batch_id,
+        status=job.status,
+        request_count=job.request_count,
+        succeeded=job.succeeded,
+        errored=job.errored,
+        error=job.error,
+        created_at=job.created_at,
+        completed_at=job.completed_at
+    )
+
+@router.get("/{run_id}/flakiness", response_model=FlakinessResponse)
+def get_run_flakiness(
+    project_id: int,
+    run_id: int,
+    min_flakiness: float = Query(0.0, ge=0, le=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    run = db.query(ModelRun).join(Project, ModelRun.project_id == Project.id).filter(
+        ModelRun.id == run_id,
+        ModelRun.project_id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if (run.samples_per_test or 1) <= 1:
+        raise HTTPException(status_code=400, detail="Run was not evaluated with repeated sampling")
+
+    sample_scores = {}
+    for test_id, score in db.query(EvaluationSample.test_case_id, EvaluationSample.score).filter(
+        EvaluationSample.model_run_id == run_id
+    ).order_by(EvaluationSample.test_case_id, EvaluationSample.sample_index):
+        sample_scores.setdefault(test_id, []).append(score)
+
+    if is_archived(run):
+        archived = [(res, test.prompt) for res, test in archived_results(db, run)]
+        tested = len(archived)
+        rows = sorted(
+            ((res, prompt) for res, prompt in archived
+             if res.flakiness is not None and res.flakiness >= min_flakiness),
+            key=lambda row: (-row[0].flakiness, row[0].test_case_id)
+        )
+    else:
+        rows = db.query(EvaluationResult, TestCase.prompt).join(
+            TestCase, EvaluationResult.test_case_id == TestCase.id
+        ).filter(
+            EvaluationResult.model_run_id == run_id,
+            EvaluationResult.flakiness >= min_flakiness
+        ).order_by(EvaluationResult.flakiness.desc(), EvaluationResult.test_case_id).all()
+
+        tested = db.query(EvaluationResult).filter(EvaluationResult.model_run_id == run_id).count()
+
+    return FlakinessResponse(
+        run_id=str(run.id),
+        samples_per_test=run.samples_per_test,
+        sample_calls=run.sample_calls or 0,
+        full_sampling_calls=tested * run.samples_per_test,
+        tests=[
+            FlakyTest(
+                test_id=res.test_case_id,
+                prompt=prompt,
+                score=res.score,
+                sample_count=res.sample_count or 0,
+                pass_probability=res.pass_probability,
+                flakiness=res.flakiness,
+                sample_scores=sample_scores.get(res.test_case_id, [])
+            )
+            for res, prompt in rows
+        ]
     )
 
+@router.post("/{run_id}/cancel")
+def cancel_run(
+    project_id: int,
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    run = db.query(ModelRun).join(Project, ModelRun.project_id == Project.id).filter(
+        ModelRun.id == run_id,
+        ModelRun.project_id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.status not in ("running", "batch_pending", "cancelling"):
+        raise HTTPException(status_code=409, detail=f"Run is {run.status}")
+
+    # The run stops at its next provider call: right away when it executes
+    # in this process, otherwise once its process polls for cancellations.
+    # Batch runs are stopped by the worker on its next pass
+    run.status = "cancelling"
+    db.commit()
+    scheduler.cancel(run.id)
+
+    return {"run_id": str(run.id), "status": run.status}
+
 @router.put("/{run_id}/results/{test_id}")
 def update_result_score(
     project_id: int,
@@ -261,66 +795,155 @@ def update_result_score(
 ):
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    run = db.query(ModelRun).filter(ModelRun.id == run_id, ModelRun.project_id == project_id).first()
+    # Editing is the one thing that moves an archived run back to the hot table
+    try:
+        ensure_hot(db, run)
+    except ArchiveInProgress:
+        raise HTTPException(status_code=409, detail="Run is being archived, retry shortly")
+
     result = db.query(EvaluationResult).filter(
         EvaluationResult.model_run_id == run_id,
         EvaluationResult.test_case_id == test_id
     ).first()
 
-    if not result:
+    if not run or not result:
         raise HTTPException(status_code=404, detail="Result not found")
 
     result.score = score
     result.category = "manual_override" 
+
+    # Invalidates cached details / exports / comparisons of this run
+    run.result_version = (run.result_version or 0) + 1
     
     db.commit()
     
     return {"status": "success", "new_score": score}
 
+def _stream_csv(run):
+    # Runs after the handler returns, so it opens its own session
+    db = SessionLocal()
+    try:
+        output = io.StringIO()
+        writer = csv.writer(output)
+
+        writer.writerow(["Test ID", "Task Type", "Prompt", "Context (RAG)", "Expected", "Model Output", "Score", "Pass/Fail", "Category"])
+
+        for res, test, model_output in _results_with_tests(db, run):
+            status = "PASS" if res.score == 2 else "FAIL"
+            writer.writerow([
+                test.id,
+                test.task_type,
+                test.prompt,
+                test.context or "N/A",
+                test.expected,
+                model_output,
+                res.score,
+                status,
+                res.category
+            ])
+            if output.tell() >= CSV_FLUSH_BYTES:
+                yield output.getvalue().encode()
+                output.seek(0)
+                output.truncate()
+
+        yield output.getvalue().encode()
+    finally:
+        db.close()
+
 @router.get("/{run_id}/export/csv")
 def export_run_csv(
     project_id: int,
     run_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    run = db.query(ModelRun).filter(ModelRun.id == run_id).first()
+    run = db.query(ModelRun).join(Project, ModelRun.project_id == Project.id).filter(
+        ModelRun.id == run_id,
+        ModelRun.project_id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
-        
-    results = db.query(EvaluationResult, TestCase).join(
-        TestCase, EvaluationResult.test_case_id == TestCase.id
-    ).filter(
-        EvaluationResult.model_run_id == run_id
-    ).all()
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    writer.writerow(["Test ID", "Task Type", "Prompt", "Context (RAG)", "Expected", "Model Output", "Score", "Pass/Fail", "Category"])
-    
-    for res, test in results:
-        status = "PASS" if res.score == 2 else "FAIL"
-        writer.writerow([
-            test.id,
-            test.task_type,
-            test.prompt,
-            test.context or "N/A",
-            test.expected,
-            res.model_output,
-            res.score,
-            status,
-            res.category
-        ])
-    
-    output.seek(0)
-    
+    etag = run_etag([run], "csv")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     return StreamingResponse(
-        io.BytesIO(output.getvalue().encode()),
+        _stream_csv(run),
         media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=run_{run_id}_report.csv"}
-    )
\ No newline at end of file
+        headers={
+            "Content-Disposition": f"attachment; filename=run_{run_id}_report.csv",
+            **cache_headers(etag)
+        }
+    )
+
+def _columnar_response(db, project_id, fmt, run=None, etag=None):
+    if not columnar_export.is_available():
+        raise HTTPException(status_code=501, detail="Columnar export requires pyarrow")
+
+    run_id = run.id if run is not None else None
+    media_type, extension = columnar_export.FORMATS[fmt]
+    export_file = columnar_export.write_export(db, fmt, project_id, run_id=run_id)
+    filename = f"run_{run_id}_results" if run_id is not None else f"project_{project_id}_results"
+
+    return StreamingResponse(
+        columnar_export.iter_file(export_file),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{extension}",
+            **cache_headers(etag)
+        }
+    )
+
+@router.get("/export/columnar")
+def export_project_columnar(
+    project_id: int,
+    format: str = Query("parquet", pattern="^(parquet|arrow)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return _columnar_response(db, project_id, format)
+
+@router.get("/{run_id}/export/columnar")
+def export_run_columnar(
+    project_id: int,
+    run_id: int,
+    request: Request,
+    format: str = Query("parquet", pattern="^(parquet|arrow)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    run = db.query(ModelRun).join(Project, ModelRun.project_id == Project.id).filter(
+        ModelRun.id == run_id,
+        ModelRun.project_id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    etag = run_etag([run], f"columnar:{format}")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    return _columnar_response(db, project_id, format, run=run, etag=etag)
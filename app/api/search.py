@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.db.deps import get_db
+from app.core.dependencies import get_current_user
+from app.models.user import User
+from app.models.project import Project
+from app.models.test_case import TestCase
+from app.models.model_run import ModelRun
+from app.models.evaluation_result import EvaluationResult
+from app.models.output_blob import OutputBlob
+from app.schemas.search import ResultSearchHit, ResultSearchResponse, TestSearchHit, TestSearchResponse
+from app.services.output_store import output_text
+from app.services.search_index import outputs_match, query_terms, snippet, tests_match
+
+router = APIRouter(prefix="/projects/{project_id}/search", tags=["Search"], dependencies=[Depends(get_current_user)])
+
+def _get_project(db, project_id, current_user):
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+def _check_query(q):
+    if not query_terms(q):
+        raise HTTPException(status_code=400, detail="Query has no searchable terms")
+
+@router.get("/tests", response_model=TestSearchResponse)
+def search_tests(
+    project_id: int,
+    q: str = Query(..., min_length=1, max_length=500),
+    task_type: Optional[str] = None,
+    after_test_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    _get_project(db, project_id, current_user)
+    _check_query(q)
+
+    query = db.query(TestCase).filter(TestCase.project_id == project_id, tests_match(db, q))
+    if task_type:
+        query = query.filter(TestCase.task_type == task_type)
+    if after_test_id is not None:
+        query = query.filter(TestCase.id > after_test_id)
+
+    # One extra row tells us whether there is a next page
+    tests = query.order_by(TestCase.id).limit(limit + 1).all()
+    page = tests[:limit]
+
+    return TestSearchResponse(
+        hits=[
+            TestSearchHit(test_id=t.id, task_type=t.task_type, prompt=t.prompt, expected=t.expected)
+            for t in page
+        ],
+        next_cursor=page[-1].id if len(tests) > limit else None
+    )
+
+@router.get("/results", response_model=ResultSearchResponse)
+def search_results(
+    project_id: int,
+    q: str = Query(..., min_length=1, max_length=500),
+    include_tests: bool = False,
+    run_id: Optional[int] = None,
+    model_name: Optional[str] = None,
+    score: Optional[int] = None,
+    category: Optional[str] = None,
+    after: Optional[str] = Query(None, pattern=r"^\d+:\d+$"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Results whose model output matches `q` (or, with include_tests, whose
+    test prompt/expected/context does), newest run first. Results of
+    archived runs are not searched.
+    """
+    _get_project(db, project_id, current_user)
+    _check_query(q)
+
+    match = outputs_match(db, q)
+    if include_tests:
+        match = or_(match, tests_match(db, q))
+
+    query = db.query(
+        EvaluationResult, ModelRun.model_name, TestCase.prompt, OutputBlob.codec, OutputBlob.data
+    ).join(
+        ModelRun, EvaluationResult.model_run_id == ModelRun.id
+    ).join(
+        TestCase, EvaluationResult.test_case_id == TestCase.id
+    ).outerjoin(
+        OutputBlob, EvaluationResult.output_hash == OutputBlob.hash
+    ).filter(
+        ModelRun.project_id == project_id,
+        match
+    )
+
+    if run_id is not None:
+        query = query.filter(EvaluationResult.model_run_id == run_id)
+    if model_name:
+        query = query.filter(ModelRun.model_name == model_name)
+    if score is not None:
+        query = query.filter(EvaluationResult.score == score)
+    if category:
+        query = query.filter(EvaluationResult.category == category)
+
+    # Keyset paging on (run desc, test asc), served by the (run, test) index
+    if after:
+        after_run, after_test = (int(part) for part in after.split(":"))
+        query = query.filter(or_(
+            EvaluationResult.model_run_id < after_run,
+            and_(EvaluationResult.model_run_id == after_run, EvaluationResult.test_case_id > after_test)
+        ))
+
+    rows = query.order_by(
+        EvaluationResult.model_run_id.desc(), EvaluationResult.test_case_id
+    ).limit(limit + 1).all()
+    page = rows[:limit]
+
+    hits = [
+        ResultSearchHit(
+            run_id=str(res.model_run_id),
+            model_name=model,
+            test_id=res.test_case_id,
+            prompt=prompt,
+            score=res.score,
+            category=res.category,
+            snippet=snippet(output_text(res.model_output, codec, data), q)
+        )
+        for res, model, prompt, codec, data in page
+    ]
+    last = page[-1][0] if page else None
+    return ResultSearchResponse(
+        hits=hits,
+        next_cursor=f"{last.model_run_id}:{last.test_case_id}" if len(rows) > limit else None
+    )
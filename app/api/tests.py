@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from fastapi import UploadFile, File
-import csv
-import io
+from fastapi import UploadFile, File, Query
 from app.db.deps import get_db
 from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.models.project import Project
 from app.models.test_case import TestCase
-from app.schemas.test_case import TestCaseCreate, TestCaseResponse
+from app.schemas.test_case import TestCaseCreate, TestCaseResponse, ImportReport, DuplicateCluster
+from app.services.test_import import content_hash, import_test_cases
+from app.services.near_duplicates import duplicate_clusters, index_tests, minhash, remove_from_index
 
 router = APIRouter(prefix="/projects/{project_id}/tests", tags=["Test Cases"],
     dependencies=[Depends(get_current_user)])
@@ -23,7 +23,8 @@ def create_test_case(
     # 1. Verify project exists and belongs to user
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not project:
@@ -34,11 +35,15 @@ def create_test_case(
         project_id=project_id,
         prompt=test.prompt,
         task_type=test.task_type,
+        context=test.context,
         rules=test.rules,
-        expected=test.expected
+        expected=test.expected,
+        content_hash=content_hash(test.prompt, test.task_type, test.context, test.expected)
     )
 
     db.add(new_test)
+    db.flush()
+    index_tests(db, project_id, [(new_test.id, minhash(new_test.prompt, new_test.context))])
     db.commit()
     db.refresh(new_test)
 
@@ -53,7 +58,8 @@ def list_test_cases(
     # Verify project ownership
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not project:
@@ -75,48 +81,64 @@ def delete_test_case(
     test = db.query(TestCase).join(Project).filter(
         TestCase.id == test_id,
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not test:
         raise HTTPException(status_code=404, detail="Test case not found")
 
+    remove_from_index(db, [test.id])
     db.delete(test)
     db.commit()
     
-@router.post("/import")
+@router.post("/import", response_model=ImportReport)
 def import_tests(
     project_id: int,
     file: UploadFile = File(...),
+    format: str = Query("auto", pattern="^(auto|csv|jsonl)$"),
+    skip_duplicates: bool = False,
+    skip_near_duplicates: bool = False,
+    near_duplicate_threshold: float = Query(0.9, ge=0.5, le=1),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     # 1. Verify Project
     project = db.query(Project).filter(
         Project.id == project_id,
-        Project.user_id == current_user.id
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # 2. Read & Parse CSV
-    content = file.file.read().decode("utf-8")
-    csv_reader = csv.DictReader(io.StringIO(content))
-    
-    count = 0
-    for row in csv_reader:
-        # Expecting CSV columns: prompt, expected, task_type
-        if "prompt" in row:
-            test_case = TestCase(
-                project_id=project_id,
-                prompt=row["prompt"],
-                expected=row.get("expected", ""),
-                # 👇 NEW: Capture context from CSV
-                context=row.get("context", ""), 
-                task_type=row.get("task_type", "general")
-            )
-            db.add(test_case)
-            count += 1
-            
-    db.commit()
-    return {"message": f"Successfully imported {count} test cases"}   
\ No newline at end of file
+    # 2. Stream rows in batches (CSV / JSONL, optionally gzipped)
+    result = import_test_cases(
+        db,
+        project_id,
+        file.file,
+        filename=file.filename or "",
+        fmt=format,
+        skip_duplicates=skip_duplicates,
+        near_duplicate_threshold=near_duplicate_threshold if skip_near_duplicates else None
+    )
+    return result.as_report()
+
+@router.get("/duplicates", response_model=list[DuplicateCluster])
+def list_duplicate_clusters(
+    project_id: int,
+    threshold: float = Query(0.8, ge=0.5, le=1),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return duplicate_clusters(db, project_id, threshold=threshold, limit=limit)
+
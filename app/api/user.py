@@ -3,7 +3,8 @@ from sqlalchemy.orm import Session
 from app.db.deps import get_db
 from app.core.dependencies import get_current_user
 from app.models.user import User
-from app.schemas.user import UserResponse, UserKeysUpdate
+from app.schemas.user import JudgeBackendStatus, UserResponse, UserKeysUpdate
+from app.services.judge_router import router as judge_router
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -33,4 +34,13 @@ def update_api_keys(
     
     db.commit()
     db.refresh(current_user)
-    return {"status": "success", "message": "API Keys updated"}
\ No newline at end of file
+    return {"status": "success", "message": "API Keys updated"}
+
+@router.get("/me/judges", response_model=list[JudgeBackendStatus])
+def get_judge_status(current_user: User = Depends(get_current_user)):
+    """Judge backends as routed for this user's keys (see services/judge_router)."""
+    return judge_router.status({
+        "openai": current_user.openai_key,
+        "anthropic": current_user.anthropic_key,
+        "gemini": current_user.gemini_key
+    })
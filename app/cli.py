@@ -0,0 +1,281 @@
+"""
+Headless evaluation for CI: runs a CSV/JSONL suite against one or more
+models with the same engine and scorers as the API, without a web server.
+
+    python -m app.cli suite.jsonl --model gpt-4 [--model claude-3 ...]
+        [--template prompt.txt] [--concurrency 8] [--hedge]
+        [--out results.jsonl | results.parquet]
+        [--baseline baseline.json] [--max-regression 0.02]
+        [--write-baseline baseline.json] [--sync-project 42]
+
+Provider keys come from the environment (OPENAI_API_KEY, ANTHROPIC_API_KEY,
+GEMINI_API_KEY). Rows with the same content hash are evaluated once.
+
+Exit status: 0 on success, 1 when a model's pass rate fell more than
+--max-regression below the baseline, 2 on an invalid suite or arguments,
+3 when a provider rate limit aborted the run.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+# Entry point: read .env before modules below look at the environment
+load_dotenv()
+
+from app.services.evaluation_engine import cached_input_tokens, estimate_cost, evaluate_one
+from app.services.hedging import HedgePolicy
+from app.services.test_import import detect_format, iter_rows, open_text_stream, validate_row
+
+EXIT_REGRESSION = 1
+EXIT_INVALID = 2
+EXIT_RATE_LIMITED = 3
+MAX_PRINTED_ERRORS = 20
+LOOKUP_CHUNK = 500
+
+OUTPUT_FIELDS = (
+    "test_id", "output", "score", "category", "generation_latency_ms", "ttft_ms",
+    "judge_latency_ms", "retry_count", "scorer_stage", "judge_backend", "cached_input_tokens",
+)
+
+
+class RateLimited(Exception):
+    pass
+
+
+def load_suite(path):
+    """Returns (tests, errors); a test's id is its row number in the file."""
+    tests, errors, seen = [], [], set()
+    with open(path, "rb") as raw:
+        for row_no, row, error in iter_rows(open_text_stream(raw), detect_format(path)):
+            if error is None:
+                try:
+                    mapping = validate_row(row, None)
+                except ValueError as e:
+                    error = str(e)
+            if error:
+                errors.append((row_no, error))
+                continue
+            if mapping["content_hash"] in seen:
+                continue
+            seen.add(mapping["content_hash"])
+            tests.append(SimpleNamespace(id=row_no, **mapping))
+    return tests, errors
+
+
+def sync_tests(db, project_id, path, tests):
+    """Imports the suite into the project and re-keys `tests` by test id."""
+    from app.models.test_case import TestCase
+    from app.services.test_import import import_test_cases
+
+    with open(path, "rb") as raw:
+        import_test_cases(db, project_id, raw, filename=path, skip_duplicates=True)
+
+    hashes = [t.content_hash for t in tests]
+    ids = {}
+    for i in range(0, len(hashes), LOOKUP_CHUNK):
+        chunk = hashes[i:i + LOOKUP_CHUNK]
+        for test_id, h in db.query(TestCase.id, TestCase.content_hash).filter(
+            TestCase.project_id == project_id,
+            TestCase.content_hash.in_(chunk)
+        ):
+            ids.setdefault(h, test_id)
+    for test in tests:
+        test.id = ids[test.content_hash]
+
+
+def run_model(tests, model_name, system_template, concurrency, hedge):
+    """
+    Evaluates every test concurrently; returns (results in suite order,
+    input_tokens, output_tokens). Raises RateLimited on a provider 429.
+    """
+    results = {}
+    total_input = total_output = 0
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = {
+            pool.submit(evaluate_one, test, model_name, {}, system_template, hedge=hedge): test.id
+            for test in tests
+        }
+        for future in as_completed(futures):
+            result, usage = future.result()
+            if "[Mock Fallback]" in result["output"] and "429" in result["output"]:
+                raise RateLimited(f"Rate limited by the provider of {model_name}")
+            if usage:
+                total_input += usage["input"]
+                total_output += usage["output"]
+            results[futures[future]] = result
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return [results[test.id] for test in tests], total_input, total_output
+
+
+def write_results(path, rows):
+    if path.lower().endswith(".parquet"):
+        from app.services.columnar_export import is_available
+        if not is_available():
+            raise SystemExit("Parquet output requires pyarrow")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pylist(rows), path, compression="zstd")
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def save_run(db, project_id, model_name, results, input_tokens, output_tokens, started_at):
+    from app.models.model_run import ModelRun
+    from app.services.output_store import save_results
+
+    cached_input = cached_input_tokens(results)
+    run = ModelRun(
+        project_id=project_id,
+        model_name=model_name,
+        status="completed",
+        mode="full",
+        total_input_tokens=input_tokens,
+        total_output_tokens=output_tokens,
+        total_cached_input_tokens=cached_input,
+        estimated_cost=estimate_cost(input_tokens, output_tokens, cached_input, model_name=model_name),
+        started_at=started_at,
+        completed_at=datetime.utcnow()
+    )
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    save_results(db, run.id, results)
+    db.commit()
+    return run.id
+
+
+def regressions(summary, baseline, max_regression):
+    """(model, baseline pass rate, pass rate) for each model that regressed."""
+    found = []
+    for model_name, stats in summary.items():
+        base = baseline.get("models", {}).get(model_name)
+        if base is None:
+            print(f"  {model_name}: not in baseline, not compared")
+            continue
+        if stats["pass_rate"] < base["pass_rate"] - max_regression:
+            found.append((model_name, base["pass_rate"], stats["pass_rate"]))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a TrustLLM test suite from the command line")
+    parser.add_argument("suite", help="CSV or JSONL test suite (optionally gzipped)")
+    parser.add_argument("--model", action="append", required=True, help="Model to evaluate (repeatable)")
+    parser.add_argument("--template", help="File with a prompt template containing {{prompt}}")
+    parser.add_argument("--concurrency", type=int, default=8, help="Tests evaluated at once per model")
+    parser.add_argument("--hedge", action="store_true", help="Hedge slow generation calls")
+    parser.add_argument("--out", help="Write results to this .jsonl or .parquet file")
+    parser.add_argument("--baseline", help="Fail on a pass-rate regression against this baseline file")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.0,
+        help="Allowed pass-rate drop below the baseline (0-1)"
+    )
+    parser.add_argument("--write-baseline", help="Write this run's pass rates as a baseline file")
+    parser.add_argument("--sync-project", type=int, help="Also import the suite and save the runs to this project")
+    args = parser.parse_args(argv)
+
+    tests, errors = load_suite(args.suite)
+    if errors:
+        for row_no, error in errors[:MAX_PRINTED_ERRORS]:
+            print(f"{args.suite}:{row_no}: {error}", file=sys.stderr)
+        print(f"{len(errors)} invalid row(s)", file=sys.stderr)
+        return EXIT_INVALID
+    if not tests:
+        print("No test cases found", file=sys.stderr)
+        return EXIT_INVALID
+
+    system_template = None
+    if args.template:
+        with open(args.template, encoding="utf-8") as f:
+            system_template = f.read()
+
+    db = None
+    if args.sync_project is not None:
+        # Importing init_db registers every model, so relationships resolve
+        import app.db.init_db  # noqa: F401
+        from app.db.session import SessionLocal
+        from app.models.project import Project
+        db = SessionLocal()
+        project = db.query(Project).filter(
+            Project.id == args.sync_project,
+            Project.deleted_at.is_(None)
+        ).first()
+        if not project:
+            print(f"Project {args.sync_project} not found", file=sys.stderr)
+            return EXIT_INVALID
+        sync_tests(db, args.sync_project, args.suite, tests)
+
+    summary = {}
+    rows = []
+    try:
+        for model_name in args.model:
+            started_at = datetime.utcnow()
+            started = time.perf_counter()
+            hedge = HedgePolicy() if args.hedge else None
+            try:
+                results, input_tokens, output_tokens = run_model(
+                    tests, model_name, system_template, args.concurrency, hedge
+                )
+            except RateLimited as e:
+                print(str(e), file=sys.stderr)
+                return EXIT_RATE_LIMITED
+            finally:
+                if hedge:
+                    hedge.close()
+
+            passed = sum(1 for r in results if r["score"] == 2)
+            cached_input = cached_input_tokens(results)
+            summary[model_name] = {
+                "total": len(results),
+                "passed": passed,
+                "pass_rate": round(passed / len(results), 4),
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "estimated_cost": estimate_cost(input_tokens, output_tokens, cached_input, model_name=model_name),
+                "seconds": round(time.perf_counter() - started, 1),
+            }
+            if hedge:
+                summary[model_name]["hedged_calls"] = hedge.hedges
+            if db is not None:
+                summary[model_name]["run_id"] = save_run(
+                    db, args.sync_project, model_name, results, input_tokens, output_tokens, started_at
+                )
+            rows.extend({"model": model_name, **{k: r.get(k) for k in OUTPUT_FIELDS}} for r in results)
+            print(
+                f"{model_name}: {passed}/{len(results)} passed "
+                f"({summary[model_name]['pass_rate']:.1%}) in {summary[model_name]['seconds']}s"
+            )
+    finally:
+        if db is not None:
+            db.close()
+
+    if args.out:
+        write_results(args.out, rows)
+    if args.write_baseline:
+        with open(args.write_baseline, "w", encoding="utf-8") as f:
+            json.dump({"suite": args.suite, "models": summary}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressed = regressions(summary, baseline, args.max_regression)
+        for model_name, before, after in regressed:
+            print(f"REGRESSION {model_name}: pass rate {before:.1%} -> {after:.1%}", file=sys.stderr)
+        if regressed:
+            return EXIT_REGRESSION
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import zlib
+
+# Brotli is optional; without it only gzip is negotiated
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson")
+ENCODINGS = ("br", "gzip")
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    The strong ETag of one content coding of a representation ('"abc"' ->
+    '"abc-gzip"'): each coding is a different byte sequence. Weak ETags are
+    left alone.
+    """
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decoded_etag(etag: str) -> str:
+    """Reverses encoded_etag; other ETags are returned unchanged."""
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def negotiate_encoding(accept_encoding: str):
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    # Highest q wins; max keeps the first on ties, so br beats gzip
+    available = [e for e in ENCODINGS if e != "br" or brotli is not None]
+    best = max(available, key=lambda e: accepted.get(e, 0))
+    return best if accepted.get(best, 0) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=brotli_quality)
+            self.compress, self._finish = self._impl.process, self._impl.finish
+        else:
+            # wbits=31: gzip container
+            self._impl = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self.compress, self._finish = self._impl.compress, self._impl.flush
+
+    def finish(self):
+        return self._finish()
+
+
+class CompressionMiddleware:
+    """
+    Negotiated brotli/gzip compression for text and JSON responses larger
+    than `minimum_size`. Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(self, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware, send, encoding):
+        self.middleware = middleware
+        self._send = send
+        self.encoding = encoding
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    def _should_compress(self):
+        headers = {k.lower(): v for k, v in self.start_message["headers"]}
+        if b"content-encoding" in headers or self.start_message["status"] in (204, 304):
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _start_headers(self, length=None):
+        headers = []
+        vary = []
+        for k, v in self.start_message["headers"]:
+            name = k.lower()
+            if name == b"content-length":
+                continue
+            if name == b"vary":
+                # Keep what the app varies on (e.g. Origin for CORS)
+                vary.extend(part.strip() for part in v.split(b",") if part.strip())
+                continue
+            if name == b"etag":
+                v = encoded_etag(v.decode("latin-1"), self.encoding).encode("latin-1")
+            headers.append((k, v))
+        if b"accept-encoding" not in (part.lower() for part in vary):
+            vary.append(b"Accept-Encoding")
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b", ".join(vary)))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**self.start_message, "headers": headers}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        if self.compressor is None:
+            small = not more_body and len(body) < self.middleware.minimum_size
+            if small or not self._should_compress():
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.compressor = _Compressor(
+                self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality
+            )
+            if not more_body:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                await self._send(self._start_headers(len(compressed)))
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming: length is unknown, so drop content-length
+            await self._send(self._start_headers())
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -1,3 +1,43 @@
+import os
+
 SECRET_KEY = "CHANGE_THIS_SECRET"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+
+# Where archived (cold) run results are written
+ARCHIVE_DIR = os.getenv("TRUSTLLM_ARCHIVE_DIR", "data/archive")
+
+# Output blobs nothing references any more are deleted this long after
+# the garbage collector first finds them unreferenced (services/output_store)
+BLOB_GC_GRACE_SECONDS = int(os.getenv("TRUSTLLM_BLOB_GC_GRACE_SECONDS", "3600"))
+
+# Request/result files of the local batch backend (services/batch_backends)
+BATCH_DIR = os.getenv("TRUSTLLM_BATCH_DIR", "data/batches")
+
+# Per-call deadlines (seconds) for generation and judge requests; a call
+# that exceeds its deadline fails like any other provider error
+PROVIDER_TIMEOUT_SECONDS = float(os.getenv("TRUSTLLM_PROVIDER_TIMEOUT_SECONDS", "60"))
+JUDGE_TIMEOUT_SECONDS = float(os.getenv("TRUSTLLM_JUDGE_TIMEOUT_SECONDS", "30"))
+
+# Long RAG contexts are cut down to the passages most relevant to the
+# question and answer before grading (services/context_packing). 0 sends
+# the whole context
+JUDGE_CONTEXT_TOKENS = int(os.getenv("TRUSTLLM_JUDGE_CONTEXT_TOKENS", "1500"))
+
+# Provider calls of all runs in this process share PROVIDER_SLOTS, handed
+# out fairly between users (services/scheduler); each user may hold at
+# most USER_MAX_IN_FLIGHT of them at once. Both limits are per process:
+# with N API workers (plus batch workers) a provider sees up to
+# N x PROVIDER_SLOTS concurrent calls, so divide the provider's limit by
+# the process count when setting them
+PROVIDER_SLOTS = int(os.getenv("TRUSTLLM_PROVIDER_SLOTS", "16"))
+USER_MAX_IN_FLIGHT = int(os.getenv("TRUSTLLM_USER_MAX_IN_FLIGHT", "4"))
+
+# Judge routing (services/judge_router). Backends in preference order, the
+# minimum agreement with the reference (Gemini) judge a backend must have,
+# and optional "backend=value" overrides of each backend's agreement and
+# requests-per-minute limit, e.g. "openai=0.93,local=0.85"
+JUDGE_BACKENDS = os.getenv("TRUSTLLM_JUDGE_BACKENDS", "gemini,openai,anthropic,local")
+JUDGE_MIN_AGREEMENT = float(os.getenv("TRUSTLLM_JUDGE_MIN_AGREEMENT", "0.9"))
+JUDGE_AGREEMENT = os.getenv("TRUSTLLM_JUDGE_AGREEMENT", "")
+JUDGE_RPM = os.getenv("TRUSTLLM_JUDGE_RPM", "")
@@ -0,0 +1,51 @@
+import hashlib
+
+from fastapi import Request, Response
+
+from app.core.compression import decoded_etag
+
+# Completed runs only change through manual overrides, which bump
+# ModelRun.result_version, so clients may keep a copy but must revalidate
+CACHEABLE = "private, no-cache"
+UNCACHEABLE = "no-store"
+
+
+def run_etag(runs, variant=""):
+    """
+    Strong ETag for a resource derived from completed runs, or None while any
+    of them is still changing. `variant` distinguishes representations
+    (details vs CSV, query parameters, ...).
+    """
+    if any(run.status != "completed" for run in runs):
+        return None
+    key = "-".join(f"r{run.id}v{run.result_version or 0}" for run in runs)
+    if variant:
+        key += "-" + hashlib.sha256(variant.encode("utf-8")).hexdigest()[:16]
+    return f'"{key}"'
+
+
+def cache_headers(etag):
+    if etag is None:
+        return {"Cache-Control": UNCACHEABLE}
+    return {"ETag": etag, "Cache-Control": CACHEABLE}
+
+
+def not_modified(request: Request, etag):
+    """
+    A 304 response if the client's If-None-Match covers `etag`, else None.
+    The client may hold a compressed copy, whose ETag carries the content
+    coding (see compression.encoded_etag); the 304 repeats the one it sent.
+    If-None-Match compares weakly (RFC 9110 13.1.2): a W/ tag, as proxies
+    that re-compress send, matches its strong counterpart.
+    """
+    if etag is None:
+        return None
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    for tag in (tag.strip() for tag in header.split(",")):
+        if tag == "*":
+            return Response(status_code=304, headers=cache_headers(etag))
+        if decoded_etag(tag.removeprefix("W/")) == etag:
+            return Response(status_code=304, headers=cache_headers(tag))
+    return None
@@ -0,0 +1,159 @@
+"""
+Prometheus metrics for the API and the evaluation engine.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory before starting them: every worker then writes its
+samples there and /metrics aggregates all of them.
+"""
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+PROVIDER_CALLS = Counter(
+    "trustllm_provider_calls_total",
+    "LLM provider calls by provider, model and outcome",
+    ["provider", "model", "status"],
+)
+PROVIDER_RATE_LIMITED = Counter(
+    "trustllm_provider_rate_limited_total",
+    "Provider responses rejected with 429 / resource exhausted",
+    ["provider"],
+)
+PROVIDER_RETRIES = Counter(
+    "trustllm_provider_retries_total",
+    "Provider calls retried after a rate limit",
+    ["provider"],
+)
+PROVIDER_CACHED_INPUT_TOKENS = Counter(
+    "trustllm_provider_cached_input_tokens_total",
+    "Prompt tokens served from the provider's prompt cache",
+    ["provider"],
+)
+PROVIDER_HEDGED_CALLS = Counter(
+    "trustllm_provider_hedged_calls_total",
+    "Duplicate requests sent for slow provider calls, by which answered first",
+    ["outcome"],
+)
+JUDGE_CALLS_SAVED = Counter(
+    "trustllm_judge_calls_saved_total",
+    "Gradings decided without calling the LLM judge",
+    ["reason"],
+)
+JUDGE_CALLS = Counter(
+    "trustllm_judge_calls_total",
+    "Gradings attempted per judge backend, by outcome (ok | failed)",
+    ["backend", "outcome"],
+)
+RUNS_QUEUED = Gauge(
+    "trustllm_runs_queued",
+    "Runs waiting to start",
+    multiprocess_mode="livesum",
+)
+RUNS_IN_FLIGHT = Gauge(
+    "trustllm_runs_in_flight",
+    "Runs currently evaluating",
+    multiprocess_mode="livesum",
+)
+SCHEDULER_QUEUE_WAIT = Histogram(
+    "trustllm_scheduler_queue_wait_seconds",
+    "Time provider calls waited for a scheduler slot",
+    ["user", "priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+SCHEDULER_IN_FLIGHT = Gauge(
+    "trustllm_scheduler_in_flight",
+    "Provider calls holding a scheduler slot",
+    ["user"],
+    multiprocess_mode="livesum",
+)
+DB_QUERY_DURATION = Histogram(
+    "trustllm_db_query_duration_seconds",
+    "SQL statement duration by API route",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+REQUEST_DURATION = Histogram(
+    "trustllm_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+
+# Query durations of the current request; the route is only known once
+# routing has happened, so they are observed when the response is ready
+_request_queries: ContextVar = ContextVar("request_queries", default=None)
+
+
+def record_provider_call(provider, model, status):
+    PROVIDER_CALLS.labels(provider=provider, model=model, status=status).inc()
+    if status == "rate_limited":
+        PROVIDER_RATE_LIMITED.labels(provider=provider).inc()
+
+
+def _route_template(request):
+    route = request.scope.get("route")
+    # Unmatched paths share one label to keep cardinality bounded
+    return getattr(route, "path", "unmatched")
+
+
+async def metrics_middleware(request, call_next):
+    queries = []
+    token = _request_queries.set(queries)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = _route_template(request)
+        REQUEST_DURATION.labels(method=request.method, route=route, status=str(status)).observe(
+            time.perf_counter() - started
+        )
+        for duration in queries:
+            DB_QUERY_DURATION.labels(route=route).observe(duration)
+        _request_queries.reset(token)
+
+
+def install_db_metrics(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        queries = _request_queries.get()
+        if queries is None:
+            # Background jobs, startup, CLI
+            DB_QUERY_DURATION.labels(route="background").observe(duration)
+        else:
+            queries.append(duration)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        # Failed statements never reach after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_start"):
+            conn.info["metrics_query_start"].pop()
+
+
+def render_metrics():
+    """Returns (body, content type) for the /metrics endpoint."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
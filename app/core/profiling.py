@@ -0,0 +1,181 @@
+"""
+Opt-in per-request profiling (TRUSTLLM_PROFILE_REQUESTS=1).
+
+Every request gets X-DB-Queries / X-DB-Time-Ms / X-DB-Slowest-Ms headers
+and a structured log line, with warnings when a route exceeds the query
+budget or repeats the same statement (a likely N+1). Outside production,
+sending `X-Profile: 1` also dumps a sampled stack profile taken while the
+request runs. The profile is process-wide: the thread serving a request
+isn't known (sync endpoints and their dependencies hop between threadpool
+workers), so X-Profile-Concurrent reports how many other requests were in
+flight, and each stack is rooted at its thread's name to tell them apart.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger("trustllm.profiling")
+
+PROFILING_ENABLED = os.getenv("TRUSTLLM_PROFILE_REQUESTS") == "1"
+QUERY_BUDGET = int(os.getenv("TRUSTLLM_QUERY_BUDGET", "25"))
+# The same statement this many times in one request looks like an N+1
+REPEATED_STATEMENT_THRESHOLD = int(os.getenv("TRUSTLLM_REPEATED_STATEMENT_THRESHOLD", "10"))
+PROFILE_DIR = os.getenv("TRUSTLLM_PROFILE_DIR", "data/profiles")
+SAMPLE_INTERVAL = 0.005
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RequestQueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_s = 0.0
+        self.slowest_s = 0.0
+        self.slowest_statement = None
+        self.statements = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total_s += duration
+        self.statements[statement] += 1
+        if duration > self.slowest_s:
+            self.slowest_s = duration
+            self.slowest_statement = statement
+
+
+_request_stats: ContextVar = ContextVar("request_query_stats", default=None)
+# Requests currently inside profiling_middleware
+_in_flight = 0
+
+
+def install_query_profiler(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["profile_query_start"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("profile_query_start"):
+            conn.info["profile_query_start"].pop()
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads of the process (sync endpoints run in
+    the threadpool, not the event loop thread) and keeps those passing
+    through app code, so other requests served meanwhile show up too.
+    Output is in collapsed-stack format, ready for flamegraph tools.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        # Most other requests seen in flight while sampling
+        self.concurrent = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.concurrent = max(self.concurrent, _in_flight - 1)
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    code = frame.f_code
+                    in_app = in_app or code.co_filename.startswith(APP_DIR)
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if in_app:
+                    stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _profiling_requested(request):
+    return request.headers.get("x-profile") == "1" and os.getenv("TRUSTLLM_ENV", "development") != "production"
+
+
+async def profiling_middleware(request, call_next):
+    global _in_flight
+    stats = RequestQueryStats()
+    token = _request_stats.set(stats)
+    profiler = SamplingProfiler() if _profiling_requested(request) else None
+    # Middleware runs on the event loop thread, so no lock is needed
+    _in_flight += 1
+    if profiler:
+        profiler.start()
+
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _in_flight -= 1
+        _request_stats.reset(token)
+        if profiler:
+            profiler.stop()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    response.headers["X-DB-Queries"] = str(stats.count)
+    response.headers["X-DB-Time-Ms"] = f"{stats.total_s * 1000:.1f}"
+    response.headers["X-DB-Slowest-Ms"] = f"{stats.slowest_s * 1000:.1f}"
+
+    if profiler:
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.folded")
+        profiler.dump(path)
+        response.headers["X-Profile-File"] = path
+        response.headers["X-Profile-Concurrent"] = str(profiler.concurrent)
+
+    logger.info(json.dumps({
+        "event": "request_profile",
+        "method": request.method,
+        "route": route,
+        "status": response.status_code,
+        "duration_ms": round(elapsed_ms, 1),
+        "db_queries": stats.count,
+        "db_time_ms": round(stats.total_s * 1000, 1),
+        "db_slowest_ms": round(stats.slowest_s * 1000, 1),
+        "db_slowest_statement": stats.slowest_statement,
+    }))
+
+    if stats.count > QUERY_BUDGET:
+        logger.warning(f"{request.method} {route} ran {stats.count} SQL statements (budget {QUERY_BUDGET})")
+
+    repeated = [(s, n) for s, n in stats.statements.items() if n >= REPEATED_STATEMENT_THRESHOLD]
+    for statement, n in repeated:
+        logger.warning(f"Possible N+1 on {request.method} {route}: statement ran {n} times: {statement[:200]}")
+
+    return response
@@ -0,0 +1,22 @@
+import json
+
+from fastapi.responses import JSONResponse
+
+# orjson is several times faster on large, string-heavy payloads
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for the heavy endpoints (run details, comparisons). Return
+    it with plain dicts/lists: it skips FastAPI's jsonable_encoder pass and
+    serializes with orjson when installed.
+    """
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
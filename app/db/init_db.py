@@ -1,11 +1,30 @@
-from app.db.session import engine
 from app.db.base import Base
 
 from app.models.user import User
 from app.models.project import Project
 from app.models.test_case import TestCase
+from app.models.test_signature import TestCaseSignature, TestCaseBand
 # NEW IMPORT
 from app.models.prompt import PromptVersion
+from app.models.model_run import ModelRun
+from app.models.evaluation_result import EvaluationResult
+from app.models.output_blob import OutputBlob
+from app.models.evaluation_sample import EvaluationSample
+from app.models.deletion_job import ProjectDeletionJob
+from app.models.batch_job import BatchJob
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    from app.db.session import engine
+    from app.db.upgrade import upgrade_schema
+    from app.services.search_index import ensure_search_schema
+    Base.metadata.create_all(bind=engine)
+    # Columns added to tables that already existed (create_all skips those)
+    upgrade_schema(engine)
+    # Full-text indexes are dialect-specific DDL outside the models
+    ensure_search_schema(engine)
+
+if __name__ == "__main__":
+    # Explicit schema step: python -m app.db.init_db
+    from dotenv import load_dotenv
+    load_dotenv()
+    init_db()
@@ -0,0 +1,122 @@
+"""
+Brings a database created by an earlier version up to the current models.
+
+create_all only creates missing tables, so this adds the columns later
+added to existing tables (with their defaults and indexes), drops NOT NULL
+where a column became nullable, and backfills derived values. Every step
+inspects the live schema first, so it is safe to run at each startup.
+"""
+from sqlalchemy import MetaData, bindparam, inspect, literal, select, text
+
+from app.db.base import Base
+
+BACKFILL_CHUNK = 1000
+# Suffix of the copy SQLite tables are rebuilt into
+REBUILD_SUFFIX = "__rebuild"
+
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _column_ddl(conn, column):
+    """`name TYPE [DEFAULT x] [REFERENCES t (c)]` for ADD COLUMN."""
+    ddl = f"{_quote(conn, column.name)} {column.type.compile(dialect=conn.dialect)}"
+    if column.default is not None and column.default.is_scalar:
+        # Existing rows get the default in the same statement
+        value = literal(column.default.arg, column.type).compile(
+            dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+        )
+        ddl += f" DEFAULT {value}"
+    for fk in column.foreign_keys:
+        target = fk.column
+        ddl += f" REFERENCES {_quote(conn, target.table.name)} ({_quote(conn, target.name)})"
+    return ddl
+
+
+def _add_missing_columns(conn, table, existing):
+    for column in table.columns:
+        if column.name not in existing:
+            # Always nullable here: rows that predate the column have no value
+            conn.execute(text(f"ALTER TABLE {_quote(conn, table.name)} ADD COLUMN {_column_ddl(conn, column)}"))
+
+
+def _rebuild_sqlite_table(conn, table, existing_indexes):
+    """SQLite can't drop NOT NULL: copies the rows into a table of the current definition."""
+    metadata = MetaData()
+    for other in Base.metadata.tables.values():
+        if other is not table:
+            # Referenced tables must be known to compile foreign keys
+            other.to_metadata(metadata)
+    rebuilt = table.to_metadata(metadata, name=table.name + REBUILD_SUFFIX)
+
+    # The copy's indexes take the original names
+    for name in existing_indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {_quote(conn, name)}"))
+    rebuilt.drop(conn, checkfirst=True)
+    rebuilt.create(conn)
+
+    columns = ", ".join(_quote(conn, c.name) for c in table.columns)
+    conn.execute(text(
+        f"INSERT INTO {_quote(conn, rebuilt.name)} ({columns}) SELECT {columns} FROM {_quote(conn, table.name)}"
+    ))
+    conn.execute(text(f"DROP TABLE {_quote(conn, table.name)}"))
+    conn.execute(text(f"ALTER TABLE {_quote(conn, rebuilt.name)} RENAME TO {_quote(conn, table.name)}"))
+
+
+def _relax_not_null(conn, table, not_null, existing_indexes):
+    relaxed = [c for c in table.columns if c.nullable and c.name in not_null and not c.primary_key]
+    if not relaxed:
+        return
+    if conn.dialect.name == "sqlite":
+        _rebuild_sqlite_table(conn, table, existing_indexes)
+        return
+    for column in relaxed:
+        conn.execute(text(
+            f"ALTER TABLE {_quote(conn, table.name)} ALTER COLUMN {_quote(conn, column.name)} DROP NOT NULL"
+        ))
+
+
+def _create_missing_indexes(conn, table, existing_indexes):
+    for index in table.indexes:
+        if index.name not in existing_indexes:
+            index.create(conn)
+
+
+def _backfill_content_hashes(conn):
+    # Imported here: only needed while upgrading, and pulls in the importer
+    from app.services.test_import import content_hash
+
+    tests = Base.metadata.tables["tests"]
+    update = tests.update().where(tests.c.id == bindparam("_id")).values(content_hash=bindparam("_hash"))
+    while True:
+        rows = conn.execute(
+            select(tests.c.id, tests.c.prompt, tests.c.task_type, tests.c.context, tests.c.expected).where(
+                tests.c.content_hash.is_(None)
+            ).limit(BACKFILL_CHUNK)
+        ).all()
+        if not rows:
+            return
+        conn.execute(update, [
+            {"_id": row.id, "_hash": content_hash(row.prompt, row.task_type, row.context, row.expected)}
+            for row in rows
+        ])
+
+
+def upgrade_schema(engine):
+    """Run after create_all; a no-op on an up-to-date database."""
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {c["name"]: c for c in inspector.get_columns(table.name)}
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+
+            _add_missing_columns(conn, table, columns)
+            _relax_not_null(conn, table, {name for name, c in columns.items() if not c["nullable"]}, indexes)
+            # A rebuilt table already has its indexes
+            _create_missing_indexes(conn, table, {i["name"] for i in inspect(conn).get_indexes(table.name)})
+
+        _backfill_content_hashes(conn)
@@ -1,5 +1,11 @@
-from app.db.base import Base
+import os
+from dotenv import load_dotenv
+
+# Entry point: read .env before modules below look at the environment
+load_dotenv()
+
 from app.db.session import engine
+from app.db.init_db import init_db
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.auth import router as auth_router
@@ -8,6 +14,14 @@ from app.api.tests import router as test_router
 from app.api.runs import router as run_router
 # 👇 NEW: Import the User Router
 from app.api.user import router as user_router
+from app.api.metrics import router as metrics_router
+from app.api.search import router as search_router
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import install_db_metrics, metrics_middleware
+from app.core.profiling import PROFILING_ENABLED, install_query_profiler, profiling_middleware
+from app.services.project_deletion import resume_deletion_jobs
+from app.services.search_index import start_backfill as start_search_backfill
+from app.services.near_duplicates import start_backfill as start_duplicate_index_backfill
 
 try:
     from app.api.prompts import router as prompt_router
@@ -30,18 +44,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Ensure tables are created
-Base.metadata.create_all(bind=engine)
+# Negotiated brotli/gzip for large text/JSON responses
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("TRUSTLLM_COMPRESS_MIN_BYTES", "1024")))
+
+# Prometheus: request latency by route, SQL durations by route
+app.middleware("http")(metrics_middleware)
+install_db_metrics(engine)
+
+# Opt-in: per-request SQL counts, query budget / N+1 warnings, X-Profile dumps
+if PROFILING_ENABLED:
+    app.middleware("http")(profiling_middleware)
+    install_query_profiler(engine)
 
 app.include_router(auth_router)
 app.include_router(project_router)
 app.include_router(test_router)
 app.include_router(run_router)
 app.include_router(user_router) # <--- Register User Router
+app.include_router(metrics_router)
+app.include_router(search_router)
 
 if prompt_router:
     app.include_router(prompt_router)
 
+@app.on_event("startup")
+def create_schema():
+    # Runs at server startup, not import. Set TRUSTLLM_CREATE_SCHEMA=0 when
+    # the schema is managed separately (python -m app.db.init_db)
+    if os.getenv("TRUSTLLM_CREATE_SCHEMA", "1") == "1":
+        init_db()
+
+@app.on_event("startup")
+def resume_background_jobs():
+    # Pick up project deletions interrupted by a restart
+    resume_deletion_jobs()
+    # Index outputs stored before full-text search existed
+    start_search_backfill()
+    # Index tests created before near-duplicate detection existed
+    start_duplicate_index_backfill()
+
 @app.get("/")
 def root():
     return {"status": "TrustLLM backend running"}
\ No newline at end of file
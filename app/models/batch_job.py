@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from app.db.base import Base
+
+class BatchJob(Base):
+    """A provider batch job backing a run with mode="batch"."""
+    __tablename__ = "batch_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    model_run_id = Column(Integer, ForeignKey("model_runs.id"), nullable=False, unique=True)
+
+    backend = Column(String, nullable=False)             # openai | anthropic | local
+    provider_batch_id = Column(String, nullable=True)
+    # submitted | in_progress | ingesting | completed | failed | cancelled
+    status = Column(String, default="submitted")
+    request_count = Column(Integer, default=0)
+    succeeded = Column(Integer, nullable=True)
+    errored = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+    # A worker holds the job until then (polling or ingesting it)
+    locked_until = Column(DateTime, nullable=True)
@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from app.db.base import Base
+
+class ProjectDeletionJob(Base):
+    __tablename__ = "project_deletion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # No foreign keys: the job outlives the project it deletes
+    project_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
+
+    status = Column(String, default="pending")  # pending | running | completed | failed
+    stage = Column(String, nullable=True)       # Table currently being emptied
+    deleted_rows = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Heartbeat: bumped after every batch so stale jobs can be picked up again
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
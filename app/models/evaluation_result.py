@@ -1,10 +1,14 @@
 import uuid
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index, JSON
 # Note: We removed the UUID import since we don't need it for the foreign key anymore
 from app.db.base import Base
 
 class EvaluationResult(Base):
     __tablename__ = "evaluation_results"
+    __table_args__ = (
+        # Lookups and comparison joins always go by (run, test)
+        Index("ix_evaluation_results_run_test", "model_run_id", "test_case_id"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     
@@ -13,6 +17,32 @@ class EvaluationResult(Base):
     
     test_case_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
 
-    model_output = Column(String, nullable=False)
+    # Outputs live deduplicated and compressed in output_blobs. model_output
+    # is only set on rows written before that (read via output_store)
+    model_output = Column(String, nullable=True)
+    output_hash = Column(String(64), ForeignKey("output_blobs.hash"), nullable=True, index=True)
+
     score = Column(Integer, nullable=False)
-    category = Column(String, nullable=False)
\ No newline at end of file
+    category = Column(String, nullable=False)
+
+    # Timing (milliseconds). ttft_ms is only set for streaming providers
+    generation_latency_ms = Column(Float, nullable=True)
+    ttft_ms = Column(Float, nullable=True)
+    judge_latency_ms = Column(Float, nullable=True)
+    retry_count = Column(Integer, default=0)
+
+    # Which scorer stage decided: exact_match | llm_judge | local_judge | judge_error
+    scorer_stage = Column(String, nullable=True)
+    # Judge backend that gave the verdict (gemini | openai | anthropic | local)
+    judge_backend = Column(String, nullable=True)
+
+    # Repeated-sampling runs only (see services/flakiness): how many samples
+    # were drawn, the estimated pass probability, and the posterior
+    # probability that the test is flaky. score is the majority verdict
+    sample_count = Column(Integer, nullable=True)
+    pass_probability = Column(Float, nullable=True)
+    flakiness = Column(Float, nullable=True)
+
+    # RAG grading: [start, end] offsets of the context passages the judge
+    # was shown when the context exceeded its token budget (None: all of it)
+    context_spans = Column(JSON, nullable=True)
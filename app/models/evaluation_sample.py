@@ -0,0 +1,20 @@
+import uuid
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
+from app.db.base import Base
+
+class EvaluationSample(Base):
+    """One of several generations of a test in a repeated-sampling run."""
+    __tablename__ = "evaluation_samples"
+    __table_args__ = (
+        Index("ix_evaluation_samples_run_test", "model_run_id", "test_case_id"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    model_run_id = Column(Integer, ForeignKey("model_runs.id"), nullable=False)
+    test_case_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
+    sample_index = Column(Integer, nullable=False)
+
+    output_hash = Column(String(64), ForeignKey("output_blobs.hash"), nullable=True, index=True)
+    score = Column(Integer, nullable=False)
+    category = Column(String, nullable=False)
+    generation_latency_ms = Column(Float, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Float
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Float, JSON
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from datetime import datetime
@@ -10,7 +10,20 @@ class ModelRun(Base):
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     model_name = Column(String, nullable=False)
-    status = Column(String, default="pending")
+    status = Column(String, default="pending")  # ... | cancelling | cancelled
+    # Scheduler share of the run's provider calls: interactive | nightly
+    priority = Column(String, default="interactive")
+    mode = Column(String, default="full")  # full | smoke | batch | bisect (partial probe run)
+
+    # Smoke runs: estimate, interval and cases spent (see services/sampling)
+    sampling_report = Column(JSON, nullable=True)
+
+    # Repeated sampling: the per-test cap, and the generations actually spent
+    samples_per_test = Column(Integer, default=1)
+    sample_calls = Column(Integer, nullable=True)
+
+    # Duplicate requests sent for slow generation calls (hedged runs only)
+    hedged_calls = Column(Integer, nullable=True)
 
     # FIXED: Changed Integer to String because Prompt IDs are UUIDs
     prompt_version_id = Column(String, ForeignKey("prompt_versions.id"), nullable=True)
@@ -18,7 +31,20 @@ class ModelRun(Base):
     # Analytics
     total_input_tokens = Column(Integer, default=0)
     total_output_tokens = Column(Integer, default=0)
+    # Part of total_input_tokens served from the provider's prompt cache
+    total_cached_input_tokens = Column(Integer, default=0)
     estimated_cost = Column(Float, default=0.0)
 
+    # Bumped by manual score overrides; part of the run's HTTP ETag
+    result_version = Column(Integer, default=0)
+
     started_at = Column(DateTime, default=datetime.utcnow)
-    completed_at = Column(DateTime, nullable=True)
\ No newline at end of file
+    completed_at = Column(DateTime, nullable=True)
+
+    # Cold storage: archive_path is set once the archive file is complete
+    # (reads switch to it), archived_at once the hot rows are all deleted.
+    # The counts keep list/summary views working without reading the file
+    archived_at = Column(DateTime, nullable=True)
+    archive_path = Column(String, nullable=True)
+    archived_total = Column(Integer, nullable=True)
+    archived_correct = Column(Integer, nullable=True)
\ No newline at end of file
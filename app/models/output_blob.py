@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, LargeBinary, Boolean, DateTime
+from app.db.base import Base
+
+class OutputBlob(Base):
+    __tablename__ = "output_blobs"
+
+    # sha256 of the uncompressed text; identical outputs share one row
+    hash = Column(String(64), primary_key=True)
+
+    codec = Column(String, nullable=False)  # zstd | zlib
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)  # Uncompressed size in bytes
+
+    # Set once the text is in the full-text index (services/search_index)
+    search_indexed = Column(Boolean, default=False, nullable=False)
+
+    # Set when the garbage collector finds nothing references the blob;
+    # cleared when a new result reuses it (services/output_store)
+    unreferenced_since = Column(DateTime, nullable=True)
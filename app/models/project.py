@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -11,6 +11,14 @@ class Project(Base):
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
+    # Set when the project is deleted; children are removed in the background
+    deleted_at = Column(DateTime, nullable=True, index=True)
+
+    # Retention: completed runs older than N days (beyond the latest K per
+    # model) get their results archived to disk. NULL days = keep all hot
+    retention_days = Column(Integer, nullable=True)
+    retention_keep_latest = Column(Integer, default=3)
+
     owner = relationship("User", back_populates="projects")
     
     tests = relationship("TestCase", back_populates="project", cascade="all, delete-orphan")
@@ -16,6 +16,9 @@ class TestCase(Base):
     rules = Column(JSON, nullable=True)
     expected = Column(Text, nullable=True)
 
+    # sha256 of the case content, used to skip duplicates on import
+    content_hash = Column(String(64), nullable=True, index=True)
+
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
 
     project = relationship("Project", back_populates="tests")
\ No newline at end of file
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, LargeBinary, Index
+from app.db.base import Base
+
+class TestCaseSignature(Base):
+    """MinHash signature of a test's prompt + context (see services/near_duplicates)."""
+    __tablename__ = "test_signatures"
+
+    test_case_id = Column(Integer, ForeignKey("tests.id"), primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class TestCaseBand(Base):
+    """One LSH bucket per band: tests sharing a bucket are duplicate candidates."""
+    __tablename__ = "test_lsh_bands"
+    __table_args__ = (
+        Index("ix_test_lsh_bands_project_bucket", "project_id", "bucket"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    test_case_id = Column(Integer, ForeignKey("tests.id"), nullable=False, index=True)
+    # Hash of (band number, the band's signature rows)
+    bucket = Column(String(16), nullable=False)
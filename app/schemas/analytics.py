@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
 
 class FailingTest(BaseModel):
     test_id: int
@@ -11,4 +11,29 @@ class HealthResponse(BaseModel):
     drift: float            # Change from previous run (e.g. -5.2%)
     models_compared: int    # Count of unique models used
     regression_score: float # A calculated score of performance drop
-    worst_failing_tests: List[FailingTest]
\ No newline at end of file
+    worst_failing_tests: List[FailingTest]
+
+class LatencyStats(BaseModel):
+    count: int = 0
+    p50_ms: Optional[float] = None
+    p90_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    mean_ms: Optional[float] = None
+
+class LatencyReport(BaseModel):
+    results: int
+    generation: LatencyStats
+    time_to_first_token: LatencyStats
+    judge: LatencyStats
+    total_retries: int
+    throughput_per_min: Optional[float]  # Graded tests per minute of run wall-clock time
+    scorer_stages: Dict[str, int]       # e.g. {"exact_match": 40, "llm_judge": 60}
+    judge_backends: Dict[str, int] = {} # Verdicts per judge backend, e.g. {"gemini": 55, "local": 5}
+
+class RunLatencyResponse(LatencyReport):
+    run_id: str
+    model_name: str
+
+class ModelLatencyResponse(LatencyReport):
+    model_name: str
+    runs: int
@@ -14,11 +14,22 @@ class ComparisonRow(BaseModel):
     run2_output: Optional[str]
     run2_score: Optional[int]
 
+class ComparisonSummary(BaseModel):
+    total: int = 0
+    wins: int = 0       # Run 2 scored higher than Run 1 (fixes)
+    losses: int = 0     # Run 2 scored lower than Run 1 (regressions)
+    ties: int = 0
+    missing: int = 0    # Test has no result in one or both runs
+
 class ComparisonResponse(BaseModel):
     project_id: int
     run1_id: str
     run1_name: str
     run2_id: str
     run2_name: str
-    
-    comparisons: List[ComparisonRow]
\ No newline at end of file
+
+    summary: ComparisonSummary
+    comparisons: List[ComparisonRow]
+
+    # Pass as `after_test_id` to fetch the next page (None on the last page)
+    next_cursor: Optional[int] = None
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
 
 class ProjectCreate(BaseModel):
     name: str
@@ -10,4 +12,20 @@ class ProjectResponse(BaseModel):
     domain: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DeletionJobResponse(BaseModel):
+    job_id: int
+    project_id: int
+    status: str
+    stage: Optional[str] = None
+    deleted_rows: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+class RetentionPolicy(BaseModel):
+    # None disables archiving for the project
+    retention_days: Optional[int] = Field(default=None, ge=1)
+    retention_keep_latest: int = Field(default=3, ge=0)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 
 class PromptCreate(BaseModel):
     template: str
@@ -12,4 +13,31 @@ class PromptResponse(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BisectRequest(BaseModel):
+    good_version_id: str
+    bad_version_id: str
+    model_name: str
+
+class BrokenTest(BaseModel):
+    test_id: int
+    prompt: str
+
+class BisectCulprit(BaseModel):
+    prompt_version_id: str
+    version: int
+    broken_tests: List[BrokenTest]
+
+class BisectResponse(BaseModel):
+    model_name: str
+    good_version: int
+    bad_version: int
+    versions_in_range: int
+    versions_probed: int
+    regressed_test_ids: List[int]   # Pass on the good version, fail on the bad one
+    first_bad_version: Optional[int] = None
+    culprits: List[BisectCulprit]   # Earliest first
+    evaluated_cases: int            # Cases sent to the provider
+    cached_cases: int               # Scores reused from earlier runs
+    probe_run_ids: List[str]
@@ -1,14 +1,57 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
 
 class RunRequest(BaseModel):
     model_name: str
     # FIXED: Changed from int to str because PromptVersion uses UUIDs
     prompt_version_id: Optional[str] = None
 
+    # "smoke": stratified sample in waves, stopping once the confidence
+    # interval is narrower than target_ci_width. "batch": submitted as a
+    # provider batch job and completed by the worker (python -m app.worker)
+    mode: str = Field(default="full", pattern="^(full|smoke|batch)$")
+    target_ci_width: float = Field(default=0.1, gt=0, le=1)
+    confidence: float = Field(default=0.95, gt=0.5, lt=1)
+    wave_size: int = Field(default=50, ge=1, le=1000)
+    max_cases: Optional[int] = Field(default=None, ge=1)
+    # Stop on the interval of the pass-rate difference against this run
+    baseline_run_id: Optional[int] = None
+
+    # Repeated sampling (full runs): up to this many generations per test,
+    # stopping a test early once its samples agree with stop_confidence
+    samples_per_test: int = Field(default=1, ge=1, le=20)
+    stop_confidence: float = Field(default=0.8, gt=0.5, lt=1)
+    sample_concurrency: int = Field(default=4, ge=1, le=16)
+
+    # Hedging: a generation call slower than the run's hedge_quantile
+    # latency is duplicated, for at most hedge_budget of all calls
+    hedge: bool = False
+    hedge_quantile: float = Field(default=0.95, ge=0.5, lt=1)
+    hedge_budget: float = Field(default=0.05, gt=0, le=0.5)
+
+    # Nightly runs get a quarter of an interactive run's share of provider
+    # calls while both are waiting (see services/scheduler)
+    priority: str = Field(default="interactive", pattern="^(interactive|nightly)$")
+
+class SamplingReport(BaseModel):
+    estimate: Optional[float] = None   # Pass rate (0-1)
+    ci_low: Optional[float] = None
+    ci_high: Optional[float] = None
+    confidence: float
+    target_ci_width: float
+    cases_evaluated: int
+    population: int
+    stopped_early: bool
+    # Only with a baseline run: this run's pass rate minus the baseline's
+    diff_estimate: Optional[float] = None
+    diff_ci_low: Optional[float] = None
+    diff_ci_high: Optional[float] = None
+
 class RunSummary(BaseModel):
     run_id: str
     model_name: str
+    status: str = "completed"
     # FIXED: Changed from int to str
     prompt_version_id: Optional[str] = None
     
@@ -19,4 +62,43 @@ class RunSummary(BaseModel):
     # Analytics
     total_input_tokens: int = 0
     total_output_tokens: int = 0
-    estimated_cost: float = 0.0
\ No newline at end of file
+    total_cached_input_tokens: int = 0
+    estimated_cost: float = 0.0
+
+    mode: str = "full"
+    sampling: Optional[SamplingReport] = None
+
+    # Repeated sampling: the per-test cap and the generations actually spent
+    samples_per_test: int = 1
+    sample_calls: Optional[int] = None
+
+    hedged_calls: Optional[int] = None
+    priority: str = "interactive"
+
+class FlakyTest(BaseModel):
+    test_id: int
+    prompt: str
+    score: int                  # Majority verdict
+    sample_count: int
+    pass_probability: float
+    flakiness: float            # Posterior probability the test is flaky (0-1)
+    sample_scores: List[int]
+
+class FlakinessResponse(BaseModel):
+    run_id: str
+    samples_per_test: int
+    sample_calls: int           # Generations actually spent
+    full_sampling_calls: int    # What sampling every test k times would cost
+    tests: List[FlakyTest]      # Most flaky first
+
+class BatchJobResponse(BaseModel):
+    run_id: str
+    backend: str
+    provider_batch_id: Optional[str] = None
+    status: str                 # submitted | in_progress | ingesting | completed | failed
+    request_count: int
+    succeeded: Optional[int] = None
+    errored: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
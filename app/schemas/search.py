@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class TestSearchHit(BaseModel):
+    test_id: int
+    task_type: str
+    prompt: str
+    expected: Optional[str] = None
+
+class TestSearchResponse(BaseModel):
+    hits: List[TestSearchHit]
+    # Pass as `after_test_id` to fetch the next page (None on the last page)
+    next_cursor: Optional[int] = None
+
+class ResultSearchHit(BaseModel):
+    run_id: str
+    model_name: str
+    test_id: int
+    prompt: str
+    score: int
+    category: str
+    snippet: Optional[str] = None   # Output excerpt around the first match
+
+class ResultSearchResponse(BaseModel):
+    hits: List[ResultSearchHit]
+    # Pass as `after` to fetch the next page (None on the last page)
+    next_cursor: Optional[str] = None
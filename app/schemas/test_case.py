@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 class TestCaseCreate(BaseModel):
     prompt: str
@@ -19,4 +19,25 @@ class TestCaseResponse(BaseModel):
     expected: Optional[str]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    message: str
+    imported: int
+    skipped_duplicates: int = 0
+    skipped_near_duplicates: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    # True when more rows failed than are listed in `errors`
+    errors_truncated: bool = False
+
+class DuplicateCluster(BaseModel):
+    representative_id: int        # Lowest test id in the cluster
+    representative_prompt: Optional[str] = None
+    size: int
+    test_ids: List[int]
+    min_similarity: float         # Lowest estimated similarity to the representative
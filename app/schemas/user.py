@@ -29,4 +29,16 @@ class UserResponse(BaseModel):
     has_gemini: bool = False
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class JudgeBackendStatus(BaseModel):
+    backend: str
+    available: bool                 # A key is set (or none is needed)
+    agreement: float                # Expected agreement with the reference judge
+    meets_agreement: bool
+    healthy: bool
+    latency_p50_ms: Optional[float] = None
+    error_rate: Optional[float] = None
+    remaining_quota: Optional[int] = None   # Requests left this minute, if limited
+    cooldown_seconds: Optional[float] = None
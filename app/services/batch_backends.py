@@ -0,0 +1,208 @@
+"""
+Provider batch APIs behind one interface. A backend takes rendered
+requests ({"custom_id", "prefix", "prompt"}), submits them as one job,
+reports the job's state and yields its results:
+
+    submit(requests, model_name, api_key) -> provider batch id
+    poll(batch_id, api_key) -> "in_progress" | "completed" | "failed"
+    results(batch_id, api_key) -> (custom_id, output, usage, error) ...
+    cancel(batch_id, api_key)  (optional: stops a job whose run was cancelled)
+
+register_backend() adds or replaces one; TRUSTLLM_BATCH_BACKEND forces a
+backend (e.g. "local") for every model.
+"""
+import io
+import json
+import os
+import time
+import uuid
+
+from app.core.config import BATCH_DIR
+from app.services.evaluation_engine import anthropic_content, anthropic_model, openai_model
+
+MAX_TOKENS = 1000
+
+
+class OpenAIBatchBackend:
+    name = "openai"
+
+    def _client(self, api_key):
+        from openai import OpenAI
+        return OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+
+    def submit(self, requests, model_name, api_key):
+        client = self._client(api_key)
+        # Prefix first, so OpenAI's automatic prefix caching applies
+        lines = [
+            json.dumps({
+                "custom_id": req["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": openai_model(model_name),
+                    "messages": [{"role": "user", "content": req["prefix"] + req["prompt"]}],
+                },
+            })
+            for req in requests
+        ]
+        upload = client.files.create(
+            file=("requests.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+            purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def poll(self, batch_id, api_key):
+        status = self._client(api_key).batches.retrieve(batch_id).status
+        if status == "completed":
+            return "completed"
+        if status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "in_progress"
+
+    def results(self, batch_id, api_key):
+        client = self._client(api_key)
+        batch = client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    error = record.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+                    yield record["custom_id"], None, None, str(error)
+                    continue
+                usage = body.get("usage") or {}
+                yield record["custom_id"], body["choices"][0]["message"]["content"], {
+                    "input": usage.get("prompt_tokens", 0),
+                    "output": usage.get("completion_tokens", 0),
+                    "cached_input": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+                }, None
+
+    def cancel(self, batch_id, api_key):
+        self._client(api_key).batches.cancel(batch_id)
+
+
+class AnthropicBatchBackend:
+    name = "anthropic"
+
+    def _client(self, api_key):
+        from anthropic import Anthropic
+        return Anthropic(api_key=api_key or os.getenv("ANTHROPIC_API_KEY"))
+
+    def submit(self, requests, model_name, api_key):
+        batch = self._client(api_key).messages.batches.create(requests=[
+            {
+                "custom_id": req["custom_id"],
+                "params": {
+                    "model": anthropic_model(model_name),
+                    "max_tokens": MAX_TOKENS,
+                    "messages": [{"role": "user", "content": anthropic_content(req["prompt"], req["prefix"])}],
+                },
+            }
+            for req in requests
+        ])
+        return batch.id
+
+    def poll(self, batch_id, api_key):
+        batch = self._client(api_key).messages.batches.retrieve(batch_id)
+        return "completed" if batch.processing_status == "ended" else "in_progress"
+
+    def results(self, batch_id, api_key):
+        for entry in self._client(api_key).messages.batches.results(batch_id):
+            result = entry.result
+            if result.type != "succeeded":
+                error = getattr(result, "error", None) or result.type
+                yield entry.custom_id, None, None, str(error)
+                continue
+            message = result.message
+            cache_read = getattr(message.usage, "cache_read_input_tokens", 0) or 0
+            cache_write = getattr(message.usage, "cache_creation_input_tokens", 0) or 0
+            yield entry.custom_id, message.content[0].text, {
+                "input": message.usage.input_tokens + cache_read + cache_write,
+                "output": message.usage.output_tokens,
+                "cached_input": cache_read,
+            }, None
+
+    def cancel(self, batch_id, api_key):
+        self._client(api_key).messages.batches.cancel(batch_id)
+
+
+class LocalBatchBackend:
+    """
+    Stand-in for tests and development: requests are written to BATCH_DIR
+    and answered by the local provider once TRUSTLLM_LOCAL_BATCH_DELAY
+    seconds have passed. Files make it work across API and worker processes.
+    """
+    name = "local"
+
+    def _path(self, batch_id):
+        return os.path.join(BATCH_DIR, f"{batch_id}.jsonl")
+
+    def submit(self, requests, model_name, api_key):
+        os.makedirs(BATCH_DIR, exist_ok=True)
+        batch_id = f"local-{uuid.uuid4().hex}"
+        with open(self._path(batch_id), "w", encoding="utf-8") as f:
+            for req in requests:
+                f.write(json.dumps(req) + "\n")
+        return batch_id
+
+    def poll(self, batch_id, api_key):
+        path = self._path(batch_id)
+        if not os.path.exists(path):
+            return "failed"
+        delay = float(os.getenv("TRUSTLLM_LOCAL_BATCH_DELAY", "0"))
+        return "completed" if time.time() - os.path.getmtime(path) >= delay else "in_progress"
+
+    def results(self, batch_id, api_key):
+        from app.services import local_provider
+        with open(self._path(batch_id), encoding="utf-8") as f:
+            for line in f:
+                req = json.loads(line)
+                output, usage = local_provider.generate(req["prompt"], prefix=req["prefix"])
+                yield req["custom_id"], output, usage, None
+
+    def cancel(self, batch_id, api_key):
+        if os.path.exists(self._path(batch_id)):
+            self.cleanup(batch_id)
+
+    def cleanup(self, batch_id):
+        os.remove(self._path(batch_id))
+
+
+BACKENDS = {
+    "openai": OpenAIBatchBackend(),
+    "anthropic": AnthropicBatchBackend(),
+    "local": LocalBatchBackend(),
+}
+
+
+def register_backend(name, backend):
+    BACKENDS[name] = backend
+
+
+def backend_name_for(model_name):
+    """Backend that serves `model_name` in batch mode, or None if none does."""
+    forced = os.getenv("TRUSTLLM_BATCH_BACKEND")
+    if forced:
+        return forced
+    slug = model_name.lower()
+    if slug.startswith("local"):
+        return "local"
+    if "gpt" in slug:
+        return "openai"
+    if "claude" in slug:
+        return "anthropic"
+    return None
+
+
+def get_backend(name):
+    return BACKENDS[name]
@@ -0,0 +1,237 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from app.core.metrics import RUNS_IN_FLIGHT
+from app.db.session import SessionLocal
+from app.models.batch_job import BatchJob
+from app.models.evaluation_result import EvaluationResult
+from app.models.model_run import ModelRun
+from app.models.project import Project
+from app.models.test_case import TestCase
+from app.models.user import User
+from app.services.batch_backends import get_backend
+from app.services.evaluation_engine import estimate_cost, score_response_smart, split_template
+from app.services.output_store import save_results
+from app.services.scheduler import RunCancelled, scheduler
+
+PENDING_STATUSES = ("submitted", "in_progress", "ingesting")
+# A worker holds a job this long; the lease is renewed while ingesting
+LEASE = timedelta(minutes=10)
+INGEST_CHUNK = 500
+
+
+def _custom_id(test_id):
+    return f"test-{test_id}"
+
+
+def _test_id(custom_id):
+    return int(custom_id.split("-", 1)[1])
+
+
+def submit_batch_run(db, run, tests, system_template, api_keys, backend_name):
+    """Renders every test's prompt and submits them as one provider batch job."""
+    requests = []
+    for test in tests:
+        prefix, prompt = split_template(system_template, test.prompt)
+        requests.append({"custom_id": _custom_id(test.id), "prefix": prefix, "prompt": prompt})
+
+    batch_id = get_backend(backend_name).submit(requests, run.model_name, api_keys.get(backend_name))
+
+    job = BatchJob(
+        model_run_id=run.id,
+        backend=backend_name,
+        provider_batch_id=batch_id,
+        status="submitted",
+        request_count=len(requests)
+    )
+    run.status = "batch_pending"
+    db.add(job)
+    db.commit()
+    return job
+
+
+def _claim(db, job_id):
+    """Atomically leases the job, unless another worker holds a live lease."""
+    now = datetime.utcnow()
+    claimed = db.query(BatchJob).filter(
+        BatchJob.id == job_id,
+        BatchJob.status.in_(PENDING_STATUSES),
+        or_(BatchJob.locked_until.is_(None), BatchJob.locked_until < now)
+    ).update({"locked_until": now + LEASE, "updated_at": now}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def _owner(db, run):
+    return db.query(User).join(Project, Project.user_id == User.id).filter(
+        Project.id == run.project_id
+    ).first()
+
+
+def _keys(user):
+    return {
+        "openai": user.openai_key,
+        "anthropic": user.anthropic_key,
+        "gemini": user.gemini_key
+    }
+
+
+def ingest_batch(db, job, run, backend, api_keys, ticket=None):
+    """
+    Grades the batch's outputs and bulk-inserts them as the run's results.
+    Idempotent: an ingestion interrupted by a restart starts over. Judge
+    calls go through `ticket`, like those of an interactive run.
+    """
+    tests_by_id = {t.id: t for t in db.query(TestCase).filter(TestCase.project_id == run.project_id)}
+
+    db.query(EvaluationResult).filter(
+        EvaluationResult.model_run_id == run.id
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    input_tokens = output_tokens = cached_input = 0
+    succeeded = errored = 0
+    chunk = []
+    for custom_id, output, usage, error in backend.results(job.provider_batch_id, api_keys.get(job.backend)):
+        test = tests_by_id.get(_test_id(custom_id))
+        if test is None:
+            # Deleted since submission
+            continue
+
+        if error:
+            errored += 1
+            chunk.append({
+                "test_id": test.id,
+                "output": f"[Batch Error] {error}",
+                "score": 0,
+                "category": "incorrect",
+                "scorer_stage": "batch_error",
+            })
+        else:
+            succeeded += 1
+            if usage:
+                input_tokens += usage["input"]
+                output_tokens += usage["output"]
+                cached_input += usage.get("cached_input") or 0
+            judge_trace = {}
+            score, category = score_response_smart(output, test, api_keys, trace=judge_trace, ticket=ticket)
+            chunk.append({
+                "test_id": test.id,
+                "output": output,
+                "score": score,
+                "category": category,
+                "judge_latency_ms": judge_trace.get("latency_ms"),
+                "retry_count": judge_trace.get("retries", 0),
+                "scorer_stage": judge_trace.get("stage"),
+                "context_spans": judge_trace.get("context_spans"),
+                "judge_backend": judge_trace.get("backend"),
+            })
+
+        if len(chunk) >= INGEST_CHUNK:
+            save_results(db, run.id, chunk)
+            job.locked_until = datetime.utcnow() + LEASE
+            db.commit()
+            chunk = []
+
+    save_results(db, run.id, chunk)
+
+    run.total_input_tokens = input_tokens
+    run.total_output_tokens = output_tokens
+    run.total_cached_input_tokens = cached_input
+    run.estimated_cost = estimate_cost(
+        input_tokens, output_tokens, cached_input, batch=True, model_name=run.model_name
+    )
+    run.status = "completed"
+    run.completed_at = datetime.utcnow()
+
+    job.status = "completed"
+    job.succeeded = succeeded
+    job.errored = errored
+    job.completed_at = datetime.utcnow()
+    job.updated_at = job.completed_at
+    job.locked_until = None
+    db.commit()
+
+    if hasattr(backend, "cleanup"):
+        backend.cleanup(job.provider_batch_id)
+
+
+def _cancel(db, job, run):
+    # Partial results are discarded, as for a cancelled interactive run
+    db.rollback()
+    db.query(EvaluationResult).filter(
+        EvaluationResult.model_run_id == run.id
+    ).delete(synchronize_session=False)
+    run.status = "cancelled"
+    run.completed_at = datetime.utcnow()
+    job.status = "cancelled"
+    job.updated_at = run.completed_at
+    job.locked_until = None
+    db.commit()
+
+
+def process_batch_job(db, job):
+    run = db.query(ModelRun).filter(ModelRun.id == job.model_run_id).first()
+    backend = get_backend(job.backend)
+    owner = _owner(db, run)
+    api_keys = _keys(owner)
+
+    if run.status == "cancelling":
+        if job.status != "ingesting" and hasattr(backend, "cancel"):
+            backend.cancel(job.provider_batch_id, api_keys.get(job.backend))
+        _cancel(db, job, run)
+        return
+
+    if job.status != "ingesting":
+        state = backend.poll(job.provider_batch_id, api_keys.get(job.backend))
+        if state == "in_progress":
+            job.status = "in_progress"
+            job.locked_until = None
+            db.commit()
+            return
+        if state == "failed":
+            job.status = "failed"
+            job.error = "Provider batch job failed or expired"
+            job.locked_until = None
+            run.status = "failed"
+            db.commit()
+            return
+        job.status = "ingesting"
+        db.commit()
+
+    # Grading shares the provider slots of this worker with its other jobs
+    ticket = scheduler.register(run.id, owner.id, run.project_id, run.priority or "interactive")
+    RUNS_IN_FLIGHT.inc()
+    try:
+        ingest_batch(db, job, run, backend, api_keys, ticket=ticket)
+    except RunCancelled:
+        _cancel(db, job, run)
+    finally:
+        RUNS_IN_FLIGHT.dec()
+        scheduler.unregister(ticket)
+
+
+def poll_batch_jobs():
+    """One worker pass: polls every pending job and ingests finished ones."""
+    db = SessionLocal()
+    try:
+        job_ids = [row[0] for row in db.query(BatchJob.id).filter(
+            BatchJob.status.in_(PENDING_STATUSES)
+        ).order_by(BatchJob.id)]
+
+        for job_id in job_ids:
+            if not _claim(db, job_id):
+                continue
+            job = db.query(BatchJob).filter(BatchJob.id == job_id).first()
+            try:
+                process_batch_job(db, job)
+            except Exception as e:
+                # Transient (network, provider) errors: retry on the next pass
+                db.rollback()
+                print(f"Batch job {job_id} poll failed: {e}")
+                job.error = str(e)
+                job.locked_until = None
+                db.commit()
+    finally:
+        db.close()
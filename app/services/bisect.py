@@ -0,0 +1,199 @@
+from datetime import datetime
+
+from app.core.metrics import RUNS_IN_FLIGHT
+from app.models.evaluation_result import EvaluationResult
+from app.models.model_run import ModelRun
+from app.models.prompt import PromptVersion
+from app.models.test_case import TestCase
+from app.services.evaluation_engine import cached_input_tokens, estimate_cost, evaluate
+from app.services.output_store import save_results
+from app.services.run_archive import archived_scores, is_archived
+from app.services.scheduler import RunCancelled, scheduler
+
+LOOKUP_CHUNK = 500
+
+
+class BisectAborted(Exception):
+    """A probe could not grade every case it needed (rate limited)."""
+
+
+def cached_scores(db, project_id, version_id, model_name, test_ids):
+    """
+    Scores of `test_ids` from completed runs of this prompt version and
+    model, each test taken from the newest run that has it.
+    """
+    runs = db.query(ModelRun).filter(
+        ModelRun.project_id == project_id,
+        ModelRun.prompt_version_id == version_id,
+        ModelRun.model_name == model_name,
+        ModelRun.status == "completed"
+    ).order_by(ModelRun.completed_at.desc()).all()
+
+    scores = {}
+    for run in runs:
+        remaining = [t for t in test_ids if t not in scores]
+        if not remaining:
+            break
+        if is_archived(run):
+            archived = archived_scores(run)
+            for test_id in remaining:
+                if test_id in archived:
+                    scores[test_id] = archived[test_id]
+            continue
+        for i in range(0, len(remaining), LOOKUP_CHUNK):
+            chunk = remaining[i:i + LOOKUP_CHUNK]
+            for test_id, score in db.query(EvaluationResult.test_case_id, EvaluationResult.score).filter(
+                EvaluationResult.model_run_id == run.id,
+                EvaluationResult.test_case_id.in_(chunk)
+            ):
+                scores.setdefault(test_id, score)
+    return scores
+
+
+class Bisector:
+    def __init__(self, db, project_id, model_name, api_keys, tests_by_id, user_id):
+        self.db = db
+        self.project_id = project_id
+        self.user_id = user_id
+        self.model_name = model_name
+        self.api_keys = api_keys
+        self.tests_by_id = tests_by_id
+        self.evaluated = 0
+        self.cached = 0
+        self.probe_run_ids = []
+        self.versions_probed = set()
+
+    def scores(self, version, test_ids):
+        """Scores of `test_ids` under `version`, evaluating only what isn't cached."""
+        test_ids = sorted(test_ids)
+        self.versions_probed.add(version.id)
+        scores = cached_scores(self.db, self.project_id, version.id, self.model_name, test_ids)
+        self.cached += len(scores)
+
+        missing = [self.tests_by_id[t] for t in test_ids if t not in scores]
+        if missing:
+            scores.update(self._evaluate(version, missing))
+        return scores
+
+    def _evaluate(self, version, tests):
+        # Probes are kept as (partial) runs so later bisects can reuse them
+        run = ModelRun(
+            project_id=self.project_id,
+            model_name=self.model_name,
+            prompt_version_id=version.id,
+            status="running",
+            mode="bisect",
+            total_input_tokens=0,
+            total_output_tokens=0,
+            estimated_cost=0.0
+        )
+        self.db.add(run)
+        self.db.commit()
+        self.db.refresh(run)
+
+        # Probes take fair-share slots like any other run, and can be cancelled
+        ticket = scheduler.register(run.id, self.user_id, self.project_id, run.priority or "interactive")
+        RUNS_IN_FLIGHT.inc()
+        try:
+            results, input_tokens, output_tokens = evaluate(
+                test_cases=tests,
+                model_name=self.model_name,
+                api_keys=self.api_keys,
+                system_template=version.template,
+                ticket=ticket
+            )
+            cached_input = cached_input_tokens(results)
+            run.total_input_tokens = input_tokens
+            run.total_output_tokens = output_tokens
+            run.total_cached_input_tokens = cached_input
+            run.estimated_cost = estimate_cost(
+                input_tokens, output_tokens, cached_input, model_name=self.model_name
+            )
+            save_results(self.db, run.id, results)
+            run.status = "completed"
+            run.completed_at = datetime.utcnow()
+            self.db.commit()
+        except RunCancelled:
+            self.db.rollback()
+            run.status = "cancelled"
+            run.completed_at = datetime.utcnow()
+            self.db.commit()
+            raise
+        except Exception:
+            run.status = "failed"
+            self.db.commit()
+            raise
+        finally:
+            RUNS_IN_FLIGHT.dec()
+            scheduler.unregister(ticket)
+
+        self.evaluated += len(results)
+        self.probe_run_ids.append(run.id)
+        if len(results) < len(tests):
+            raise BisectAborted(f"Provider rate limited while evaluating prompt version {version.version}")
+        return {res["test_id"]: res["score"] for res in results}
+
+
+def bisect_prompt_versions(db, project_id, good, bad, model_name, api_keys, user_id):
+    """
+    Finds the prompt version that broke each case regressed between `good`
+    and `bad`. Only cases failing on `bad` are graded on `good`, and only
+    the regressed cases are graded on intermediate versions: cases share a
+    probe while their search intervals coincide and split when they
+    disagree, so each costs about log2(versions) evaluations.
+    """
+    versions = db.query(PromptVersion).filter(
+        PromptVersion.project_id == project_id,
+        PromptVersion.version >= good.version,
+        PromptVersion.version <= bad.version
+    ).order_by(PromptVersion.version).all()
+
+    tests_by_id = {t.id: t for t in db.query(TestCase).filter(TestCase.project_id == project_id)}
+    bisector = Bisector(db, project_id, model_name, api_keys, tests_by_id, user_id)
+
+    bad_scores = bisector.scores(bad, tests_by_id.keys())
+    failing = [t for t, score in bad_scores.items() if score != 2]
+    good_scores = bisector.scores(good, failing)
+    regressed = sorted(t for t in failing if good_scores.get(t) == 2)
+
+    # Every group passes at versions[lo] and fails at versions[hi]
+    pending = [(0, len(versions) - 1, regressed)] if regressed else []
+    broken_by = {}
+    while pending:
+        lo, hi, cases = pending.pop()
+        if hi - lo <= 1:
+            broken_by.setdefault(hi, []).extend(cases)
+            continue
+        mid = (lo + hi) // 2
+        scores = bisector.scores(versions[mid], cases)
+        still_failing = [t for t in cases if scores[t] != 2]
+        passing = [t for t in cases if scores[t] == 2]
+        if still_failing:
+            pending.append((lo, mid, still_failing))
+        if passing:
+            pending.append((mid, hi, passing))
+
+    culprits = [
+        {
+            "prompt_version_id": versions[index].id,
+            "version": versions[index].version,
+            "broken_tests": [
+                {"test_id": t, "prompt": tests_by_id[t].prompt} for t in sorted(cases)
+            ],
+        }
+        for index, cases in sorted(broken_by.items())
+    ]
+
+    return {
+        "model_name": model_name,
+        "good_version": good.version,
+        "bad_version": bad.version,
+        "versions_in_range": len(versions),
+        "versions_probed": len(bisector.versions_probed),
+        "regressed_test_ids": regressed,
+        "first_bad_version": culprits[0]["version"] if culprits else None,
+        "culprits": culprits,
+        "evaluated_cases": bisector.evaluated,
+        "cached_cases": bisector.cached,
+        "probe_run_ids": [str(run_id) for run_id in bisector.probe_run_ids],
+    }
@@ -0,0 +1,179 @@
+import importlib.util
+import tempfile
+
+from app.models.evaluation_result import EvaluationResult
+from app.models.model_run import ModelRun
+from app.models.output_blob import OutputBlob
+from app.models.test_case import TestCase
+from app.services.output_store import output_text
+from app.services.run_archive import archived_results, is_archived
+
+# pyarrow is optional and slow to import: it is loaded on first export
+pa = ipc = pq = None
+
+BATCH_SIZE = 10_000
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# (column name, label in the query, arrow type key)
+COLUMNS = [
+    ("run_id", ModelRun.id, "int64"),
+    ("model_name", ModelRun.model_name, "dict"),
+    ("prompt_version_id", ModelRun.prompt_version_id, "string"),
+    ("run_completed_at", ModelRun.completed_at, "timestamp"),
+    ("test_id", TestCase.id, "int64"),
+    ("task_type", TestCase.task_type, "dict"),
+    ("prompt", TestCase.prompt, "string"),
+    ("context", TestCase.context, "string"),
+    ("expected", TestCase.expected, "string"),
+    ("model_output", EvaluationResult.model_output, "string"),
+    ("score", EvaluationResult.score, "int32"),
+    ("category", EvaluationResult.category, "dict"),
+]
+
+
+def is_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _load_pyarrow():
+    global pa, ipc, pq
+    if pa is None:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        pa, ipc, pq = pyarrow, pyarrow.ipc, pyarrow.parquet
+
+
+def _arrow_type(key):
+    return {
+        "int64": pa.int64(),
+        "int32": pa.int32(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+        # Low-cardinality columns are dictionary encoded
+        "dict": pa.dictionary(pa.int32(), pa.string()),
+    }[key]
+
+
+def export_schema():
+    _load_pyarrow()
+    return pa.schema([(name, _arrow_type(key)) for name, _, key in COLUMNS])
+
+
+def _to_batch(rows, schema):
+    arrays = []
+    for i, field in enumerate(schema):
+        values = [row[i] for row in rows]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def results_query(db, project_id, run_id=None):
+    # Blob columns are appended last and folded into model_output per row
+    query = db.query(
+        *[col for _, col, _ in COLUMNS], OutputBlob.codec, OutputBlob.data
+    ).select_from(EvaluationResult).join(
+        TestCase, EvaluationResult.test_case_id == TestCase.id
+    ).join(
+        ModelRun, EvaluationResult.model_run_id == ModelRun.id
+    ).outerjoin(
+        OutputBlob, EvaluationResult.output_hash == OutputBlob.hash
+    ).filter(ModelRun.project_id == project_id)
+
+    if run_id is not None:
+        query = query.filter(ModelRun.id == run_id)
+
+    return query.order_by(ModelRun.id, TestCase.id).yield_per(BATCH_SIZE)
+
+
+def _archived_rows(db, run):
+    # Shaped like results_query rows, with the output text already resolved
+    for res, test in archived_results(db, run):
+        values = {
+            "run_id": run.id,
+            "model_name": run.model_name,
+            "prompt_version_id": run.prompt_version_id,
+            "run_completed_at": run.completed_at,
+            "test_id": test.id,
+            "task_type": test.task_type,
+            "prompt": test.prompt,
+            "context": test.context,
+            "expected": test.expected,
+            "model_output": res.output,
+            "score": res.score,
+            "category": res.category,
+        }
+        yield (*[values[name] for name, _, _ in COLUMNS], None, None)
+
+
+def export_rows(db, project_id, run_id=None):
+    """Rows of results_query, with archived runs read from their files."""
+    runs = db.query(ModelRun).filter(ModelRun.project_id == project_id)
+    if run_id is not None:
+        runs = runs.filter(ModelRun.id == run_id)
+    runs = runs.order_by(ModelRun.id).all()
+
+    if not any(is_archived(run) for run in runs):
+        yield from results_query(db, project_id, run_id)
+        return
+    for run in runs:
+        if is_archived(run):
+            yield from _archived_rows(db, run)
+        else:
+            yield from results_query(db, project_id, run.id)
+
+
+def iter_record_batches(rows, schema=None):
+    """Group an iterable of result rows into Arrow record batches."""
+    schema = schema or export_schema()
+    output_index = [name for name, _, _ in COLUMNS].index("model_output")
+    chunk = []
+    for row in rows:
+        *values, codec, data = row
+        values[output_index] = output_text(values[output_index], codec, data)
+        chunk.append(values)
+        if len(chunk) >= BATCH_SIZE:
+            yield _to_batch(chunk, schema)
+            chunk = []
+    if chunk:
+        yield _to_batch(chunk, schema)
+
+
+def write_export(db, fmt, project_id, run_id=None):
+    """
+    Writes the results of one run (or the whole project) to a temp file in
+    `fmt` ("parquet" or "arrow") and returns it rewound, ready to stream.
+    """
+    schema = export_schema()
+    sink = tempfile.TemporaryFile()
+    batches = iter_record_batches(export_rows(db, project_id, run_id), schema)
+
+    if fmt == "parquet":
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+    else:
+        # Stream format, because each batch carries its own dictionaries
+        with ipc.new_stream(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+
+    sink.seek(0)
+    return sink
+
+
+def iter_file(f, chunk_size=1024 * 1024):
+    try:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
@@ -0,0 +1,103 @@
+"""
+Relevance-based packing of long RAG contexts into a token budget.
+
+The context is split into passages (paragraphs, long ones cut into
+windows), every passage is scored with BM25 against the question and the
+answer being graded, and the best passages are kept, in their original
+order, until the budget is spent. Tokens are counted as whitespace words.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+PASSAGE_WORDS = 120
+SEPARATOR = "\n[...]\n"
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"\S+")
+_TERM = re.compile(r"\w+")
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+def _terms(text):
+    return _TERM.findall(text.lower())
+
+
+def passages(context):
+    """(start, end) character spans of the context's passages."""
+    spans = []
+    for para in re.finditer(r"\S(?:.*?\S)??(?=\s*\n\s*\n|\s*$)", context, re.S):
+        words = list(_WORD.finditer(context, para.start(), para.end()))
+        for i in range(0, len(words), PASSAGE_WORDS):
+            window = words[i:i + PASSAGE_WORDS]
+            spans.append((window[0].start(), window[-1].end()))
+    return spans
+
+
+@lru_cache(maxsize=64)
+def _index(context):
+    # The same test is often graded many times (samples, reruns)
+    spans = passages(context)
+    term_counts = [Counter(_terms(context[start:end])) for start, end in spans]
+    df = Counter(term for counts in term_counts for term in counts)
+    lengths = [sum(counts.values()) for counts in term_counts]
+    avg_length = sum(lengths) / len(lengths) if lengths else 0
+    return spans, term_counts, df, lengths, avg_length
+
+
+def bm25_scores(context, query):
+    spans, term_counts, df, lengths, avg_length = _index(context)
+    n = len(spans)
+    query_terms = set(_terms(query))
+    scores = []
+    for counts, length in zip(term_counts, lengths):
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+            score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return spans, scores
+
+
+def pack_context(context, query, budget):
+    """
+    Returns (packed context, spans). spans is None when the whole context
+    fits the budget, else the kept (start, end) offsets into `context`.
+    """
+    if not context or budget <= 0 or count_tokens(context) <= budget:
+        return context, None
+
+    spans, scores = bm25_scores(context, query)
+    # Best first, ties in document order. Passages sharing no term with the
+    # query are only used when none does
+    ranked = sorted(range(len(spans)), key=lambda i: (-scores[i], i))
+    if scores[ranked[0]] > 0:
+        ranked = [i for i in ranked if scores[i] > 0]
+
+    kept = []
+    used = 0
+    for i in ranked:
+        start, end = spans[i]
+        size = count_tokens(context[start:end])
+        if used + size > budget:
+            continue
+        kept.append(i)
+        used += size
+
+    if not kept:
+        # Budget smaller than any passage: the top passage, cut to fit
+        start, end = spans[ranked[0]]
+        words = list(_WORD.finditer(context, start, end))[:budget]
+        return context[start:words[-1].end()], [[start, words[-1].end()]]
+
+    kept_spans = [list(spans[i]) for i in sorted(kept)]
+    return SEPARATOR.join(context[start:end] for start, end in kept_spans), kept_spans
@@ -1,12 +1,13 @@
 import os
 import time
 import re
-from google import genai
-from openai import OpenAI
-from anthropic import Anthropic
-from dotenv import load_dotenv
+from contextlib import nullcontext
+from app.core.config import JUDGE_CONTEXT_TOKENS, PROVIDER_TIMEOUT_SECONDS
+from app.core.metrics import JUDGE_CALLS_SAVED, PROVIDER_CACHED_INPUT_TOKENS, PROVIDER_RETRIES, record_provider_call
+from app.services.scheduler import RunCancelled
 
-load_dotenv()
+# Provider SDKs are imported inside the call_* functions: each is slow to
+# import and a process only needs the ones it actually calls.
 
 # --- JUDGE PROMPTS ---
 JUDGE_PROMPTS = {
@@ -16,8 +17,57 @@ JUDGE_PROMPTS = {
     "rag": "You are a Truthfulness Auditor. Context: {context} Question: {prompt} Student Answer: {output} TASK: Is the answer supported by the Context? Reply 'YES' or 'NO'."
 }
 
+# Providers bill input served from their prompt cache at a fraction of the
+# normal rate (Anthropic: cache reads)
+CACHED_INPUT_RATE = {"openai": 0.5, "gemini": 0.25, "anthropic": 0.1}
+# Batch APIs (OpenAI, Anthropic) bill half the synchronous rates
+BATCH_RATE = 0.5
+
+def provider_for(model_name):
+    """The provider call_llm_router sends `model_name` to."""
+    model_slug = model_name.lower()
+    if model_slug.startswith("local"):
+        return "local"
+    if "gpt" in model_slug:
+        return "openai"
+    if "claude" in model_slug:
+        return "anthropic"
+    return "gemini"
+
+def estimate_cost(input_tokens, output_tokens, cached_input_tokens=0, batch=False, model_name=""):
+    """
+    USD estimate for a run's token usage (flat per-million-token rates).
+    `cached_input_tokens` is the part of `input_tokens` read from cache,
+    discounted at the rate of `model_name`'s provider.
+    """
+    fresh_input = input_tokens - cached_input_tokens
+    cached_rate = CACHED_INPUT_RATE.get(provider_for(model_name), CACHED_INPUT_RATE["gemini"])
+    cost = (
+        (fresh_input / 1_000_000 * 0.075)
+        + (cached_input_tokens / 1_000_000 * 0.075 * cached_rate)
+        + (output_tokens / 1_000_000 * 0.30)
+    )
+    return cost * BATCH_RATE if batch else cost
+
+def cached_input_tokens(results):
+    """Total prompt-cache hits across evaluate_one() results."""
+    return sum(res.get("cached_input_tokens") or 0 for res in results)
+
+def split_template(template, prompt):
+    """
+    (shared prefix, per-test remainder) of `template` applied to `prompt`.
+    Their concatenation is exactly template.replace("{{prompt}}", prompt);
+    keeping the prefix separate lets providers cache it across tests.
+    """
+    if not template:
+        return "", prompt
+    if "{{prompt}}" not in template:
+        return template, ""
+    prefix, rest = template.split("{{prompt}}", 1)
+    return prefix, prompt + rest.replace("{{prompt}}", prompt)
+
 # 👇 NEW: `api_keys` argument passed from the API layer
-def evaluate(test_cases, model_name, api_keys, system_template=None):
+def evaluate(test_cases, model_name, api_keys, system_template=None, hedge=None, ticket=None):
     results = []
     total_input = 0
     total_output = 0
@@ -27,15 +77,10 @@ def evaluate(test_cases, model_name, api_keys, system_template=None):
     for i, test in enumerate(test_cases):
         if i > 0: time.sleep(0.5)
 
-        content = test.prompt
-        if system_template:
-            content = system_template.replace("{{prompt}}", test.prompt)
+        result, usage = evaluate_one(test, model_name, api_keys, system_template, hedge=hedge, ticket=ticket)
 
-        # Pass keys to router
-        output, usage = call_llm_router(model_name, content, api_keys)
-        
         # Circuit Breaker
-        if "[Mock Fallback]" in output and "429" in output:
+        if "[Mock Fallback]" in result["output"] and "429" in result["output"]:
             print(f"🛑 Aborting run due to Rate Limit on {model_name}")
             break
 
@@ -43,117 +88,298 @@ def evaluate(test_cases, model_name, api_keys, system_template=None):
             total_input += usage["input"]
             total_output += usage["output"]
 
-        # Judge (Using Gemini Key for grading if available, else Fallback)
-        score, category = score_response_smart(output, test, api_keys)
-
-        results.append({
-            "test_id": test.id,
-            "output": output,
-            "score": score,
-            "category": category,
-        })
+        results.append(result)
 
     return results, total_input, total_output
 
-def call_llm_router(model_name, prompt, api_keys):
-    model_slug = model_name.lower()
+def _slot(ticket, trace=None):
+    return ticket.slot(trace) if ticket is not None else nullcontext()
 
-    if "gpt" in model_slug:
-        return call_openai(model_name, prompt, api_keys.get("openai"))
-    if "claude" in model_slug:
-        return call_anthropic(model_name, prompt, api_keys.get("anthropic"))
+def evaluate_one(test, model_name, api_keys, system_template=None, hedge=None, ticket=None):
+    """
+    Generates and grades a single test case, timing both stages. With a
+    HedgePolicy (services/hedging), a slow generation call is hedged; with
+    a scheduler Ticket (services/scheduler), every provider call waits for
+    a fair-share slot first.
+    """
+    prefix, content = split_template(system_template, test.prompt)
+
+    def generate(trace):
+        return call_llm_router(model_name, content, api_keys, trace=trace, prefix=prefix)
+
+    # Pass keys to router
+    gen_trace = {}
+    started = time.perf_counter()
+    if hedge is not None:
+        # Each attempt takes its own slot; the hedge timer starts from it
+        output, usage = hedge.call(generate, trace=gen_trace, slot=lambda trace: _slot(ticket, trace))
+    else:
+        with _slot(ticket, gen_trace):
+            output, usage = generate(gen_trace)
+    # Time spent waiting for a scheduler slot isn't provider latency
+    generation_ms = (time.perf_counter() - started) * 1000 - gen_trace.get("queue_wait_ms", 0)
+
+    # Judge (Using Gemini Key for grading if available, else Fallback)
+    judge_trace = {}
+    score, category = score_response_smart(output, test, api_keys, trace=judge_trace, ticket=ticket)
+
+    result = {
+        "test_id": test.id,
+        "output": output,
+        "score": score,
+        "category": category,
+        "generation_latency_ms": generation_ms,
+        "ttft_ms": gen_trace.get("ttft_ms"),
+        "judge_latency_ms": judge_trace.get("latency_ms"),
+        "retry_count": gen_trace.get("retries", 0) + judge_trace.get("retries", 0),
+        "scorer_stage": judge_trace.get("stage"),
+        "cached_input_tokens": (usage or {}).get("cached_input", 0),
+        "context_spans": judge_trace.get("context_spans"),
+        "judge_backend": judge_trace.get("backend"),
+    }
+    return result, usage
+
+def call_llm_router(model_name, prompt, api_keys, trace=None, prefix=""):
+    """
+    `prefix` is the part of the input shared by every test of a run (the
+    template up to {{prompt}}); it is sent first so providers can cache it.
+    """
+    provider = provider_for(model_name)
+
+    if provider == "local":
+        return call_local(model_name, prompt, trace=trace, prefix=prefix)
+    if provider == "openai":
+        return call_openai(model_name, prompt, api_keys.get("openai"), trace=trace, prefix=prefix)
+    if provider == "anthropic":
+        return call_anthropic(model_name, prompt, api_keys.get("anthropic"), trace=trace, prefix=prefix)
     
     # Default to Gemini
-    return call_gemini_with_usage(prompt, api_keys.get("gemini"))
+    return call_gemini_with_usage(prompt, api_keys.get("gemini"), trace=trace, prefix=prefix)
 
 # --- PROVIDERS ---
 
-def call_openai(model_name, prompt, key):
+def openai_model(model_name):
+    return "gpt-4-turbo" if "gpt-4" in model_name.lower() else "gpt-3.5-turbo"
+
+def anthropic_model(model_name):
+    return "claude-3-opus-20240229" if "claude-3" in model_name.lower() else "claude-3-sonnet-20240229"
+
+def anthropic_content(prompt, prefix=""):
+    """User message content with the shared prefix as a cache breakpoint."""
+    content = []
+    if prefix:
+        content.append({"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}})
+    if prompt or not prefix:
+        content.append({"type": "text", "text": prompt})
+    return content
+
+def _error_status(e):
+    message = str(e)
+    if "429" in message or "RESOURCE_EXHAUSTED" in message or "rate limit" in message.lower():
+        return "rate_limited"
+    if isinstance(e, TimeoutError) or "timeout" in type(e).__name__.lower() or "timed out" in message.lower():
+        return "timeout"
+    return "error"
+
+def _check_deadline(started, timeout):
+    # SDK timeouts bound each network read; this bounds a whole stream
+    if time.perf_counter() - started > timeout:
+        raise TimeoutError(f"Call exceeded its {timeout:g}s deadline")
+
+# Metrics are labelled with the model actually called (openai_model,
+# anthropic_model), never the requested name: that is free-form user
+# input and would make the label set unbounded. Local models share "local"
+
+# `trace`, when given, collects per-call details: retries and, for
+# streaming providers, time-to-first-token (ttft_ms). Usage dicts carry
+# "input" (all prompt tokens), "output" and "cached_input" (the part of
+# "input" served from the provider's prompt cache)
+
+def _record_cached(provider, usage):
+    if usage and usage.get("cached_input"):
+        PROVIDER_CACHED_INPUT_TOKENS.labels(provider=provider).inc(usage["cached_input"])
+
+def call_local(model_name, prompt, trace=None, prefix="", timeout=PROVIDER_TIMEOUT_SECONDS):
+    from app.services import local_provider
+    started = time.perf_counter()
+    try:
+        text, usage = local_provider.generate(prompt, prefix=prefix, timeout=timeout)
+    except Exception as e:
+        record_provider_call("local", "local", _error_status(e))
+        return f"[Mock Fallback] Local Error: {str(e)}", None
+    if trace is not None:
+        trace["ttft_ms"] = (time.perf_counter() - started) * 1000
+    record_provider_call("local", "local", "ok")
+    _record_cached("local", usage)
+    return text, usage
+
+def call_openai(model_name, prompt, key, trace=None, prefix="", timeout=PROVIDER_TIMEOUT_SECONDS):
     # Fallback to system env if user key not provided
     final_key = key or os.getenv("OPENAI_API_KEY")
+    real_model = openai_model(model_name)
     if not final_key:
+        record_provider_call("openai", real_model, "missing_key")
         return "[Mock] OpenAI Key Missing. Set in Settings.", None
     
     try:
-        client = OpenAI(api_key=final_key)
-        real_model = "gpt-4-turbo" if "gpt-4" in model_name.lower() else "gpt-3.5-turbo"
-        response = client.chat.completions.create(
+        from openai import OpenAI
+        client = OpenAI(api_key=final_key, timeout=timeout)
+        started = time.perf_counter()
+        # OpenAI caches identical prompt prefixes automatically
+        stream = client.chat.completions.create(
             model=real_model,
-            messages=[{"role": "user", "content": prompt}]
+            messages=[{"role": "user", "content": prefix + prompt}],
+            stream=True,
+            stream_options={"include_usage": True}
         )
-        text = response.choices[0].message.content
-        usage = {"input": response.usage.prompt_tokens, "output": response.usage.completion_tokens}
-        return text, usage
+        parts = []
+        usage = None
+        for chunk in stream:
+            _check_deadline(started, timeout)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not parts and trace is not None:
+                    trace["ttft_ms"] = (time.perf_counter() - started) * 1000
+                parts.append(chunk.choices[0].delta.content)
+            # The final chunk carries usage and no choices
+            if chunk.usage:
+                details = getattr(chunk.usage, "prompt_tokens_details", None)
+                usage = {
+                    "input": chunk.usage.prompt_tokens,
+                    "output": chunk.usage.completion_tokens,
+                    "cached_input": getattr(details, "cached_tokens", 0) or 0
+                }
+        record_provider_call("openai", real_model, "ok")
+        _record_cached("openai", usage)
+        return "".join(parts), usage
     except Exception as e:
+        record_provider_call("openai", real_model, _error_status(e))
         return f"[Mock Fallback] OpenAI Error: {str(e)}", None
 
-def call_anthropic(model_name, prompt, key):
+def call_anthropic(model_name, prompt, key, trace=None, prefix="", timeout=PROVIDER_TIMEOUT_SECONDS):
     final_key = key or os.getenv("ANTHROPIC_API_KEY")
+    real_model = anthropic_model(model_name)
     if not final_key:
+        record_provider_call("anthropic", real_model, "missing_key")
         return "[Mock] Anthropic Key Missing. Set in Settings.", None
     
     try:
-        client = Anthropic(api_key=final_key)
-        real_model = "claude-3-opus-20240229" if "claude-3" in model_name.lower() else "claude-3-sonnet-20240229"
-        message = client.messages.create(
+        from anthropic import Anthropic
+        client = Anthropic(api_key=final_key, timeout=timeout)
+        started = time.perf_counter()
+        with client.messages.stream(
             model=real_model,
             max_tokens=1000,
-            messages=[{"role": "user", "content": prompt}]
-        )
+            messages=[{"role": "user", "content": anthropic_content(prompt, prefix)}]
+        ) as stream:
+            for _ in stream.text_stream:
+                _check_deadline(started, timeout)
+                if trace is not None and "ttft_ms" not in trace:
+                    trace["ttft_ms"] = (time.perf_counter() - started) * 1000
+            message = stream.get_final_message()
         text = message.content[0].text
-        usage = {"input": message.usage.input_tokens, "output": message.usage.output_tokens}
+        # input_tokens excludes tokens read from or written to the cache
+        cache_read = getattr(message.usage, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(message.usage, "cache_creation_input_tokens", 0) or 0
+        usage = {
+            "input": message.usage.input_tokens + cache_read + cache_write,
+            "output": message.usage.output_tokens,
+            "cached_input": cache_read
+        }
+        record_provider_call("anthropic", real_model, "ok")
+        _record_cached("anthropic", usage)
         return text, usage
     except Exception as e:
+        record_provider_call("anthropic", real_model, _error_status(e))
         return f"[Mock Fallback] Anthropic Error: {str(e)}", None
 
-def call_gemini_with_usage(prompt, key, retries=3):
+def call_gemini_with_usage(prompt, key, retries=3, trace=None, prefix="", timeout=PROVIDER_TIMEOUT_SECONDS):
     final_key = key or os.getenv("GEMINI_API_KEY")
     if not final_key:
+        record_provider_call("gemini", "gemini-2.0-flash", "missing_key")
         return "[Mock] Gemini Key Missing. Set in Settings.", None
 
     for attempt in range(retries):
+        if trace is not None:
+            trace["retries"] = attempt
         try:
-            client = genai.Client(api_key=final_key)
+            from google import genai
+            from google.genai import types
+            client = genai.Client(
+                api_key=final_key,
+                http_options=types.HttpOptions(timeout=int(timeout * 1000))  # milliseconds
+            )
+            # Gemini caches repeated prefixes implicitly
             response = client.models.generate_content(
                 model='gemini-2.0-flash', 
-                contents=prompt
+                contents=prefix + prompt
             )
             # Safe access to usage metadata
             usage_dict = None
             if response.usage_metadata:
                 usage_dict = {
                     "input": response.usage_metadata.prompt_token_count,
-                    "output": response.usage_metadata.candidates_token_count
+                    "output": response.usage_metadata.candidates_token_count,
+                    "cached_input": response.usage_metadata.cached_content_token_count or 0
                 }
             
+            record_provider_call("gemini", "gemini-2.0-flash", "ok")
+            _record_cached("gemini", usage_dict)
             return response.text, usage_dict
         except Exception as e:
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                time.sleep(5 * (attempt + 1))
+            status = _error_status(e)
+            record_provider_call("gemini", "gemini-2.0-flash", status)
+            if status == "rate_limited":
+                # No point waiting after the last attempt
+                if attempt + 1 < retries:
+                    PROVIDER_RETRIES.labels(provider="gemini").inc()
+                    time.sleep(5 * (attempt + 1))
                 continue
             return f"[Mock Fallback] Gemini Error: {str(e)}", None
             
     return "[Mock Fallback] Failed after max retries", None
 
-def score_response_smart(output, test_case, api_keys) -> tuple[int, str]:
+def score_response_smart(output, test_case, api_keys, trace=None, ticket=None) -> tuple[int, str]:
+    """
+    Grades an output. `trace`, when given, records which stage decided
+    (exact_match | llm_judge | local_judge | judge_error), the judge
+    backend (services/judge_router), judge latency and retries, and the
+    context spans the judge saw if the context had to be packed.
+    """
+    trace = trace if trace is not None else {}
     expected = test_case.expected
     task_type = (getattr(test_case, "task_type", "general") or "general").lower()
     context = getattr(test_case, "context", "") or ""
 
     if expected and expected.lower() in output.lower():
+        trace["stage"] = "exact_match"
+        JUDGE_CALLS_SAVED.labels(reason="exact_match").inc()
         return 2, "correct"
     
+    started = time.perf_counter()
     try:
         template = JUDGE_PROMPTS.get(task_type, JUDGE_PROMPTS["general"])
+        if context and "{context}" in template:
+            from app.services.context_packing import pack_context
+            context, spans = pack_context(context, f"{test_case.prompt} {output}", JUDGE_CONTEXT_TOKENS)
+            if spans is not None:
+                trace["context_spans"] = spans
         grading_prompt = template.format(
             prompt=test_case.prompt,
             expected=expected or "N/A",
             context=context,
             output=output[:1000]
         )
-        # Use Gemini for grading (cheap/fast)
-        text, _ = call_gemini_with_usage(grading_prompt, api_keys.get("gemini"), retries=2)
+        # Fastest healthy judge backend that meets the agreement minimum;
+        # JudgeUnavailable (all of them failed) ends up as a judge_error
+        from app.services.judge_router import router as judge_router
+        text = judge_router.grade(test_case, output, grading_prompt, api_keys, trace, ticket=ticket)
+        trace["latency_ms"] = (time.perf_counter() - started) * 1000 - trace.get("queue_wait_ms", 0)
+        trace["stage"] = "local_judge" if trace["backend"] == "local" else "llm_judge"
         if "YES" in text.upper(): return 2, "correct"
         return 0, "incorrect"
+    except RunCancelled:
+        raise
     except:
+        trace["latency_ms"] = (time.perf_counter() - started) * 1000 - trace.get("queue_wait_ms", 0)
+        trace["stage"] = "judge_error"
         return 0, "incorrect"
\ No newline at end of file
@@ -0,0 +1,171 @@
+import math
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert
+
+from app.models.evaluation_sample import EvaluationSample
+from app.services.evaluation_engine import evaluate_one
+from app.services.output_store import store_outputs
+
+# A test is stable when its pass probability is within this margin of 0 or 1
+STABLE_MARGIN = 0.2
+# Further samples after the first wave are drawn this many at a time
+FOLLOW_UP_WAVE = 2
+
+
+def _betacf(a, b, x):
+    # Continued fraction for the incomplete beta function (modified Lentz)
+    tiny = 1e-30
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 200):
+        m2 = 2 * m
+        for aa in (
+            m * (b - m) * x / ((a - 1 + m2) * (a + m2)),
+            -(a + m) * (a + b + m) * x / ((a + m2) * (a + 1 + m2)),
+        ):
+            d = 1 + aa * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + aa / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1) < 1e-12:
+            break
+    return h
+
+
+def beta_cdf(x, a, b):
+    """Regularized incomplete beta I_x(a, b)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    log_front = (
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+        + a * math.log(x) + b * math.log(1 - x)
+    )
+    if x < (a + 1) / (a + b + 2):
+        return math.exp(log_front) * _betacf(a, b, x) / a
+    return 1 - math.exp(log_front) * _betacf(b, a, 1 - x) / b
+
+
+def flakiness(passes, n, margin=STABLE_MARGIN):
+    """
+    Posterior probability (Jeffreys prior) that the pass probability lies
+    strictly between `margin` and 1 - `margin`, i.e. that the test is flaky.
+    """
+    a, b = passes + 0.5, n - passes + 0.5
+    return beta_cdf(1 - margin, a, b) - beta_cdf(margin, a, b)
+
+
+def pass_probability(passes, n):
+    """Posterior mean of the pass probability under a Jeffreys prior."""
+    return (passes + 0.5) / (n + 1)
+
+
+def first_wave_size(samples_per_test, stop_confidence):
+    """Smallest number of unanimous samples that can end sampling, capped at k."""
+    for n in range(1, samples_per_test + 1):
+        if 1 - flakiness(n, n) >= stop_confidence:
+            return n
+    return samples_per_test
+
+
+def _sample(pool, test, model_name, api_keys, system_template, count, hedge, ticket):
+    return list(pool.map(
+        lambda _: evaluate_one(test, model_name, api_keys, system_template, hedge=hedge, ticket=ticket),
+        range(count)
+    ))
+
+
+def evaluate_repeated(
+    test_cases, model_name, api_keys, system_template=None,
+    samples_per_test=5, stop_confidence=0.8, concurrency=4, hedge=None, ticket=None
+):
+    """
+    Generates and grades every test up to `samples_per_test` times, drawing
+    each wave's samples concurrently. Sampling a test stops as soon as the
+    posterior probability that it is stable reaches `stop_confidence`, so
+    only tests whose samples disagree get the full budget.
+
+    Returns (results, input_tokens, output_tokens, samples): one result per
+    test carrying the majority verdict plus sample_count, pass_probability
+    and flakiness, and every individual sample.
+    """
+    results = []
+    samples = []
+    total_input = 0
+    total_output = 0
+    first_wave = first_wave_size(samples_per_test, stop_confidence)
+
+    print(f"🚀 Starting repeated-sampling evaluation on {model_name} (k={samples_per_test})...")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, test in enumerate(test_cases):
+            if i > 0: time.sleep(0.5)
+
+            drawn = []
+            wave = first_wave
+            rate_limited = False
+            while wave > 0:
+                for result, usage in _sample(pool, test, model_name, api_keys, system_template, wave, hedge, ticket):
+                    if "[Mock Fallback]" in result["output"] and "429" in result["output"]:
+                        rate_limited = True
+                        continue
+                    if usage:
+                        total_input += usage["input"]
+                        total_output += usage["output"]
+                    drawn.append(result)
+
+                if rate_limited:
+                    break
+                passes = sum(1 for r in drawn if r["score"] == 2)
+                if 1 - flakiness(passes, len(drawn)) >= stop_confidence:
+                    break
+                wave = min(FOLLOW_UP_WAVE, samples_per_test - len(drawn))
+
+            # Circuit Breaker
+            if rate_limited:
+                print(f"🛑 Aborting run due to Rate Limit on {model_name}")
+                break
+
+            n = len(drawn)
+            passes = sum(1 for r in drawn if r["score"] == 2)
+            majority = 2 if passes * 2 > n else 0
+            representative = next((r for r in drawn if (r["score"] == 2) == (majority == 2)), drawn[0])
+
+            results.append({
+                **representative,
+                "sample_count": n,
+                "pass_probability": round(pass_probability(passes, n), 4),
+                "flakiness": round(flakiness(passes, n), 4),
+            })
+            samples.extend(
+                {**r, "sample_index": index} for index, r in enumerate(drawn)
+            )
+
+    return results, total_input, total_output, samples
+
+
+def save_samples(db, run_id, samples):
+    """Bulk-inserts the individual samples of a repeated-sampling run."""
+    if not samples:
+        return
+
+    hashes = store_outputs(db, [s["output"] for s in samples])
+    db.execute(insert(EvaluationSample), [
+        {
+            "id": str(uuid.uuid4()),
+            "model_run_id": run_id,
+            "test_case_id": s["test_id"],
+            "sample_index": s["sample_index"],
+            "output_hash": h,
+            "score": s["score"],
+            "category": s["category"],
+            "generation_latency_ms": s.get("generation_latency_ms"),
+        }
+        for s, h in zip(samples, hashes)
+    ])
@@ -0,0 +1,137 @@
+"""
+Hedged provider calls. A generation call still pending after the run's
+recent latency percentile gets one duplicate request, and whichever
+usable answer arrives first wins; the other is left to finish (or hit its
+deadline) in the background. Duplicates are capped at a fraction of the
+run's calls, so hedging can only add that much load and cost.
+
+Latency is measured from when a call gets its scheduler slot: time spent
+queued behind other runs is load, not provider slowness, and hedging it
+would add requests exactly when the system is saturated.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+from app.core.metrics import PROVIDER_HEDGED_CALLS
+from app.services.latency_stats import percentile
+
+# Latencies the threshold is computed over, and how many are needed first
+WINDOW = 200
+MIN_SAMPLES = 10
+
+
+def _usable(output):
+    return not output.startswith("[Mock Fallback]")
+
+
+class _Attempt:
+    def __init__(self):
+        self.trace = {}
+        # Set once the attempt holds its slot (or gave up waiting for one)
+        self.started = threading.Event()
+        self.started_at = None
+
+
+class HedgePolicy:
+    """Hedging state for one run; safe to share between threads."""
+
+    def __init__(self, quantile=0.95, budget=0.05, max_workers=16):
+        self.quantile = quantile
+        self.budget = budget
+        self.calls = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self._latencies = deque(maxlen=WINDOW)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Losing attempts still running are abandoned, not waited for
+        self._pool.shutdown(wait=False)
+
+    def threshold(self):
+        """Seconds after which a call is hedged, or None while warming up."""
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return None
+            return percentile(sorted(self._latencies), self.quantile * 100)
+
+    def _take_hedge(self):
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def _run(self, attempt, fn, slot):
+        try:
+            with slot(attempt.trace):
+                attempt.started_at = time.perf_counter()
+                attempt.started.set()
+                return fn(attempt.trace)
+        finally:
+            attempt.started.set()
+
+    def _submit(self, fn, slot):
+        attempt = _Attempt()
+        return self._pool.submit(self._run, attempt, fn, slot), attempt
+
+    def call(self, fn, trace=None, slot=None):
+        """
+        Runs fn(trace) -> (output, usage), hedging it once if it is slow.
+        `slot(trace)` is entered around each attempt (a scheduler Ticket's
+        slot); the hedge timer starts once the first attempt holds it. The
+        winning attempt's trace is copied into `trace`.
+        """
+        slot = slot or (lambda _trace: nullcontext())
+        with self._lock:
+            self.calls += 1
+        delay = self.threshold()
+
+        primary, primary_attempt = self._submit(fn, slot)
+        attempts = {primary: primary_attempt}
+        hedge = None
+        if delay is not None:
+            primary_attempt.started.wait()
+            done, _ = wait([primary], timeout=delay)
+            if not done and self._take_hedge():
+                hedge, attempts[hedge] = self._submit(fn, slot)
+
+        winner = self._first_usable(attempts)
+        output, usage = winner.result()
+        if _usable(output):
+            with self._lock:
+                self._latencies.append(time.perf_counter() - attempts[winner].started_at)
+
+        if hedge is not None:
+            won = winner is hedge
+            if won:
+                with self._lock:
+                    self.hedges_won += 1
+            PROVIDER_HEDGED_CALLS.labels(outcome="won" if won else "lost").inc()
+        if trace is not None:
+            trace.update(attempts[winner].trace)
+            trace["hedged"] = hedge is not None
+        return output, usage
+
+    def _first_usable(self, futures):
+        # A fast failure shouldn't beat a slower success still in flight
+        pending = set(futures)
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and _usable(future.result()[0]):
+                    return future
+                if fallback is None or fallback.exception() is not None:
+                    fallback = future
+        return fallback
@@ -0,0 +1,81 @@
+import math
+from collections import Counter
+
+from app.models.evaluation_result import EvaluationResult
+from app.models.model_run import ModelRun
+
+FIELDS = (
+    "generation_latency_ms", "ttft_ms", "judge_latency_ms", "retry_count", "scorer_stage", "judge_backend",
+)
+
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile (q in 0-100) of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    if lo == hi:
+        return sorted_values[lo]
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def latency_stats(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50), 1),
+        "p90_ms": round(percentile(values, 90), 1),
+        "p99_ms": round(percentile(values, 99), 1),
+        "mean_ms": round(sum(values) / len(values), 1),
+    }
+
+
+def _wall_seconds(run):
+    if run.started_at and run.completed_at:
+        return (run.completed_at - run.started_at).total_seconds()
+    return None
+
+
+def latency_report(db, runs):
+    """Latency percentiles and throughput over all results of `runs`."""
+    # Not at module level: the judge router uses percentile() without a database
+    from app.services.run_archive import archived_records, is_archived
+
+    run_ids = [run.id for run in runs if not is_archived(run)]
+    rows = db.query(
+        *[getattr(EvaluationResult, field) for field in FIELDS]
+    ).filter(EvaluationResult.model_run_id.in_(run_ids)).all() if run_ids else []
+    for run in runs:
+        if is_archived(run):
+            rows.extend(tuple(record.get(field) for field in FIELDS) for record in archived_records(run))
+
+    wall = [s for s in (_wall_seconds(run) for run in runs) if s]
+    throughput = None
+    if wall and rows:
+        throughput = round(len(rows) / sum(wall) * 60, 2)
+
+    return {
+        "results": len(rows),
+        "generation": latency_stats(r[0] for r in rows),
+        "time_to_first_token": latency_stats(r[1] for r in rows),
+        "judge": latency_stats(r[2] for r in rows),
+        "total_retries": sum(r[3] or 0 for r in rows),
+        "throughput_per_min": throughput,
+        "scorer_stages": dict(Counter(r[4] for r in rows if r[4])),
+        "judge_backends": dict(Counter(r[5] for r in rows if r[5])),
+    }
+
+
+def completed_runs_by_model(db, project_id):
+    runs = db.query(ModelRun).filter(
+        ModelRun.project_id == project_id,
+        ModelRun.status == "completed",
+        ModelRun.archive_path.is_(None)
+    ).all()
+    by_model = {}
+    for run in runs:
+        by_model.setdefault(run.model_name, []).append(run)
+    return by_model
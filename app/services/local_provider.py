@@ -0,0 +1,58 @@
+"""
+Deterministic local stand-in provider, used for model names starting with
+"local". It needs no API key and simulates a provider-side prefix cache:
+a prefix seen recently is reported as cached input, as OpenAI, Anthropic
+and Gemini do, so prompt caching can be exercised and measured offline.
+Set TRUSTLLM_LOCAL_MS_PER_TOKEN to simulate latency for uncached input,
+and TRUSTLLM_LOCAL_STRAGGLER_RATE / _MS to make a fraction of calls hang.
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_SIZE = 256
+MS_PER_TOKEN = float(os.getenv("TRUSTLLM_LOCAL_MS_PER_TOKEN", "0"))
+STRAGGLER_RATE = float(os.getenv("TRUSTLLM_LOCAL_STRAGGLER_RATE", "0"))
+STRAGGLER_MS = float(os.getenv("TRUSTLLM_LOCAL_STRAGGLER_MS", "10000"))
+
+_prefix_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def count_tokens(text):
+    # Whitespace words: a rough but stable stand-in for a tokenizer
+    return len(text.split())
+
+
+def _prefix_cached(prefix):
+    with _lock:
+        hit = prefix in _prefix_cache
+        _prefix_cache[prefix] = True
+        _prefix_cache.move_to_end(prefix)
+        while len(_prefix_cache) > CACHE_SIZE:
+            _prefix_cache.popitem(last=False)
+    return hit
+
+
+def generate(prompt, prefix="", timeout=None):
+    """
+    Returns (output, usage) for prefix + prompt, usage including cached_input.
+    Raises TimeoutError when the simulated latency exceeds `timeout` seconds.
+    """
+    prefix_tokens = count_tokens(prefix)
+    input_tokens = prefix_tokens + count_tokens(prompt)
+    cached = prefix_tokens if prefix and _prefix_cached(prefix) else 0
+
+    latency = (input_tokens - cached) * MS_PER_TOKEN / 1000
+    if STRAGGLER_RATE and random.random() < STRAGGLER_RATE:
+        latency += STRAGGLER_MS / 1000
+    if timeout is not None and latency > timeout:
+        time.sleep(timeout)
+        raise TimeoutError(f"Call exceeded its {timeout:g}s deadline")
+    if latency:
+        time.sleep(latency)
+
+    output = f"[local] {prompt.strip()}"
+    return output, {"input": input_tokens, "output": count_tokens(output), "cached_input": cached}
@@ -0,0 +1,294 @@
+"""
+Near-duplicate test detection with MinHash locality-sensitive hashing.
+
+Each test's prompt + context is reduced to a set of word 3-gram shingles
+and a 128-value MinHash signature; the fraction of equal signature values
+estimates the Jaccard similarity of two tests. The signature is split into
+16 bands of 8 rows and every band is hashed to a bucket, so near-duplicates
+are found by bucket lookups instead of pairwise comparison: a pair with
+similarity 0.8 shares at least one bucket ~95% of the time, 0.9 ~99.9%.
+"""
+import hashlib
+import importlib.util
+import re
+import threading
+from array import array
+from itertools import groupby
+
+from sqlalchemy import func, insert
+
+from app.models.project import Project
+from app.models.test_case import TestCase
+from app.models.test_signature import TestCaseBand, TestCaseSignature
+
+# numpy makes signatures ~10x faster; the pure-Python path gives identical
+# values. Imported on first use to keep it off the startup path
+numpy = None
+_HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+LOOKUP_CHUNK = 500
+BACKFILL_BATCH = 1000
+
+_MASK = (1 << 64) - 1
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# Odd multipliers make each (a * x + b) mod 2^64 a permutation of 64-bit
+# values. Derived from fixed labels so signatures are stable across processes
+_PERMUTATIONS = [(_hash64(f"a{i}") | 1, _hash64(f"b{i}")) for i in range(NUM_PERM)]
+_PERM_A = _PERM_B = None
+
+
+def _load_numpy():
+    global numpy, _PERM_A, _PERM_B
+    if numpy is None and _HAS_NUMPY:
+        import numpy as np
+        _PERM_A = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)
+        _PERM_B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)
+        numpy = np
+    return numpy
+
+
+def shingles(prompt, context=None):
+    tokens = re.findall(r"\w+", f"{prompt or ''} {context or ''}".lower())
+    if len(tokens) < SHINGLE_SIZE:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash(prompt, context=None):
+    """MinHash signature (NUM_PERM 32-bit values) of a test's text."""
+    hashes = [_hash64(s) for s in shingles(prompt, context)]
+    if _load_numpy() is not None:
+        # uint64 arithmetic wraps, which is the mod 2^64 we want
+        values = numpy.outer(numpy.array(hashes, dtype=numpy.uint64), _PERM_A) + _PERM_B
+        return (values >> numpy.uint64(32)).min(axis=0).tolist()
+    return [min(((a * h + b) & _MASK) >> 32 for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def pack(signature) -> bytes:
+    return array("I", signature).tobytes()
+
+
+def unpack(data: bytes):
+    signature = array("I")
+    signature.frombytes(data)
+    return signature
+
+
+def similarity(sig_a, sig_b) -> float:
+    """Estimated Jaccard similarity of the two tests' shingle sets."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def buckets(signature):
+    return [
+        hashlib.blake2b(
+            array("I", signature[band * ROWS:(band + 1) * ROWS]).tobytes(),
+            digest_size=8,
+            key=band.to_bytes(2, "little")
+        ).hexdigest()
+        for band in range(BANDS)
+    ]
+
+
+def index_tests(db, project_id, tests):
+    """
+    Adds (test_id, signature) pairs to the index. The caller commits, so
+    a test and its index rows land in the same transaction.
+    """
+    if not tests:
+        return
+    db.execute(insert(TestCaseSignature), [
+        {"test_case_id": test_id, "project_id": project_id, "signature": pack(sig)}
+        for test_id, sig in tests
+    ])
+    db.execute(insert(TestCaseBand), [
+        {"project_id": project_id, "test_case_id": test_id, "bucket": bucket}
+        for test_id, sig in tests
+        for bucket in buckets(sig)
+    ])
+
+
+def remove_from_index(db, test_ids):
+    db.query(TestCaseBand).filter(TestCaseBand.test_case_id.in_(test_ids)).delete(synchronize_session=False)
+    db.query(TestCaseSignature).filter(TestCaseSignature.test_case_id.in_(test_ids)).delete(synchronize_session=False)
+
+
+def index_missing(db):
+    """Indexes tests created before the index existed, one batch per commit."""
+    while True:
+        # Soft-deleted projects are being torn down; don't index them again
+        missing = db.query(TestCase.id, TestCase.project_id, TestCase.prompt, TestCase.context).join(
+            Project, Project.id == TestCase.project_id
+        ).outerjoin(
+            TestCaseSignature, TestCaseSignature.test_case_id == TestCase.id
+        ).filter(
+            Project.deleted_at.is_(None),
+            TestCaseSignature.test_case_id.is_(None)
+        ).order_by(TestCase.project_id).limit(BACKFILL_BATCH).all()
+        if not missing:
+            return
+        for project_id, tests in groupby(missing, key=lambda row: row.project_id):
+            index_tests(db, project_id, [(t.id, minhash(t.prompt, t.context)) for t in tests])
+        db.commit()
+
+
+def backfill():
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        index_missing(db)
+    except Exception as e:
+        # e.g. another process backfilling the same tests; it finishes the job
+        db.rollback()
+        print(f"Near-duplicate index backfill failed: {e}")
+    finally:
+        db.close()
+
+
+def start_backfill():
+    threading.Thread(target=backfill, daemon=True).start()
+
+
+def _load_signatures(db, test_ids):
+    signatures = {}
+    test_ids = list(test_ids)
+    for i in range(0, len(test_ids), LOOKUP_CHUNK):
+        chunk = test_ids[i:i + LOOKUP_CHUNK]
+        for test_id, data in db.query(TestCaseSignature.test_case_id, TestCaseSignature.signature).filter(
+            TestCaseSignature.test_case_id.in_(chunk)
+        ):
+            signatures[test_id] = unpack(data)
+    return signatures
+
+
+def find_indexed_matches(db, project_id, signatures, threshold):
+    """
+    For each candidate signature, the id of an indexed test in the project
+    at least `threshold` similar to it, or None.
+    """
+    wanted = {}
+    for position, sig in enumerate(signatures):
+        for bucket in buckets(sig):
+            wanted.setdefault(bucket, []).append(position)
+
+    candidates = {}
+    keys = list(wanted)
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[i:i + LOOKUP_CHUNK]
+        for bucket, test_id in db.query(TestCaseBand.bucket, TestCaseBand.test_case_id).filter(
+            TestCaseBand.project_id == project_id,
+            TestCaseBand.bucket.in_(chunk)
+        ):
+            for position in wanted[bucket]:
+                candidates.setdefault(position, set()).add(test_id)
+
+    indexed = _load_signatures(db, set().union(*candidates.values())) if candidates else {}
+    matches = []
+    for position, sig in enumerate(signatures):
+        match = None
+        for test_id in sorted(candidates.get(position, ())):
+            if test_id in indexed and similarity(sig, indexed[test_id]) >= threshold:
+                match = test_id
+                break
+        matches.append(match)
+    return matches
+
+
+class BatchIndex:
+    """In-memory LSH over the rows of one import batch that were kept."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.buckets = {}
+
+    def match(self, signature):
+        seen = set()
+        for bucket in buckets(signature):
+            for position, other in self.buckets.get(bucket, ()):
+                if position not in seen:
+                    seen.add(position)
+                    if similarity(signature, other) >= self.threshold:
+                        return position
+        return None
+
+    def add(self, position, signature):
+        for bucket in buckets(signature):
+            self.buckets.setdefault(bucket, []).append((position, signature))
+
+
+def duplicate_clusters(db, project_id, threshold=0.8, limit=100):
+    """
+    Groups the project's tests into near-duplicate clusters, largest first.
+    Only tests sharing a bucket are compared, and within a bucket each test
+    is compared to the bucket's cluster leaders rather than to every member.
+    Read-only: tests are indexed when created or imported, and older ones
+    by the startup backfill.
+    """
+    shared = db.query(TestCaseBand.bucket).filter(
+        TestCaseBand.project_id == project_id
+    ).group_by(TestCaseBand.bucket).having(func.count() > 1).subquery()
+
+    rows = db.query(TestCaseBand.bucket, TestCaseBand.test_case_id).filter(
+        TestCaseBand.project_id == project_id,
+        TestCaseBand.bucket.in_(shared.select())
+    ).order_by(TestCaseBand.bucket, TestCaseBand.test_case_id).all()
+
+    signatures = _load_signatures(db, {test_id for _, test_id in rows})
+
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    for _, members in groupby(rows, key=lambda row: row[0]):
+        leaders = []
+        for _, test_id in members:
+            sig = signatures[test_id]
+            for leader in leaders:
+                if similarity(sig, signatures[leader]) >= threshold:
+                    a, b = find(test_id), find(leader)
+                    if a != b:
+                        parent[max(a, b)] = min(a, b)
+                    break
+            else:
+                leaders.append(test_id)
+
+    clusters = {}
+    for test_id in signatures:
+        clusters.setdefault(find(test_id), []).append(test_id)
+    groups = sorted(
+        (sorted(members) for members in clusters.values() if len(members) > 1),
+        key=lambda members: (-len(members), members[0])
+    )[:limit]
+
+    prompts = {}
+    representatives = [members[0] for members in groups]
+    for i in range(0, len(representatives), LOOKUP_CHUNK):
+        chunk = representatives[i:i + LOOKUP_CHUNK]
+        prompts.update(db.query(TestCase.id, TestCase.prompt).filter(TestCase.id.in_(chunk)).all())
+
+    return [
+        {
+            "representative_id": members[0],
+            "representative_prompt": prompts.get(members[0]),
+            "size": len(members),
+            "test_ids": members,
+            "min_similarity": round(min(
+                similarity(signatures[members[0]], signatures[m]) for m in members[1:]
+            ), 4),
+        }
+        for members in groups
+    ]
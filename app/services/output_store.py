@@ -0,0 +1,173 @@
+import hashlib
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, insert
+
+from app.core.config import BLOB_GC_GRACE_SECONDS
+from app.models.evaluation_result import EvaluationResult
+from app.models.evaluation_sample import EvaluationSample
+from app.models.output_blob import OutputBlob
+from app.services.search_index import index_outputs, unindex_outputs
+
+# zstd compresses better and faster, but zlib is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOOKUP_CHUNK = 500
+# Optional per-result fields copied straight from evaluate() results
+RESULT_FIELDS = (
+    "generation_latency_ms", "ttft_ms", "judge_latency_ms", "retry_count", "scorer_stage",
+    "sample_count", "pass_probability", "flakiness", "context_spans", "judge_backend",
+)
+
+
+def output_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(text: str) -> tuple[str, bytes]:
+    raw = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=9).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Output was stored with zstd but zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    return raw.decode("utf-8")
+
+
+def output_text(model_output, codec, data):
+    """
+    Resolves a result's output from a row joined with its blob: legacy rows
+    carry the text inline, newer rows only reference a blob.
+    """
+    if model_output is not None:
+        return model_output
+    if data is None:
+        return None
+    return decompress(codec, data)
+
+
+def _insert_ignoring_duplicates(db):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(OutputBlob).on_conflict_do_nothing(index_elements=["hash"])
+
+
+def store_outputs(db, texts):
+    """
+    Stores each distinct text once and returns the hash for every input, in
+    order. Only blobs that don't already exist are compressed, written and
+    added to the full-text index.
+    """
+    hashes = [output_hash(text) for text in texts]
+    unique = dict(zip(hashes, texts))
+
+    existing = set()
+    keys = list(unique)
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[i:i + LOOKUP_CHUNK]
+        # Reused blobs are no longer garbage. Clearing the mark before the
+        # lookup also locks them against a concurrent collect_garbage()
+        db.query(OutputBlob).filter(
+            OutputBlob.hash.in_(chunk),
+            OutputBlob.unreferenced_since.isnot(None)
+        ).update({OutputBlob.unreferenced_since: None}, synchronize_session=False)
+        existing.update(h for (h,) in db.query(OutputBlob.hash).filter(OutputBlob.hash.in_(chunk)))
+
+    rows = []
+    for h, text in unique.items():
+        if h in existing:
+            continue
+        codec, data = compress(text)
+        rows.append({"hash": h, "codec": codec, "data": data, "size": len(text.encode("utf-8"))})
+
+    if rows:
+        # Concurrent runs may insert the same blob; either copy is fine
+        stmt = _insert_ignoring_duplicates(db)
+        db.execute(stmt if stmt is not None else insert(OutputBlob), rows)
+        index_outputs(db, {row["hash"]: unique[row["hash"]] for row in rows})
+
+    return hashes
+
+
+def save_results(db, run_id, results):
+    """Bulk-inserts evaluate() results for a run, outputs going to the blob store."""
+    if not results:
+        return
+
+    hashes = store_outputs(db, [res["output"] for res in results])
+    db.execute(insert(EvaluationResult), [
+        {
+            "id": str(uuid.uuid4()),
+            "model_run_id": run_id,
+            "test_case_id": res["test_id"],
+            "output_hash": h,
+            "score": res["score"],
+            "category": res["category"],
+            **{field: res.get(field) for field in RESULT_FIELDS},
+        }
+        for res, h in zip(results, hashes)
+    ])
+
+
+def collect_garbage(db, grace=None):
+    """
+    Mark-and-sweep of blobs no result or sample references any more (their
+    runs were archived, deleted or discarded). A pass marks newly
+    unreferenced blobs and deletes those marked at least `grace` ago, so a
+    run that found a blob just before it was marked has long since saved
+    its reference. Works LOOKUP_CHUNK blobs per transaction; returns how
+    many it deleted.
+    """
+    grace = timedelta(seconds=BLOB_GC_GRACE_SECONDS) if grace is None else grace
+    unreferenced = (
+        ~exists().where(EvaluationResult.output_hash == OutputBlob.hash)
+        & ~exists().where(EvaluationSample.output_hash == OutputBlob.hash)
+    )
+
+    deleted = 0
+    last = ""
+    while True:
+        batch = [h for (h,) in db.query(OutputBlob.hash).filter(
+            OutputBlob.hash > last
+        ).order_by(OutputBlob.hash).limit(LOOKUP_CHUNK)]
+        if not batch:
+            return deleted
+        last = batch[-1]
+
+        now = datetime.utcnow()
+        # Marking first also takes SQLite's write lock for the whole batch
+        db.query(OutputBlob).filter(
+            OutputBlob.hash.in_(batch),
+            OutputBlob.unreferenced_since.is_(None),
+            unreferenced
+        ).update({OutputBlob.unreferenced_since: now}, synchronize_session=False)
+        doomed = db.query(OutputBlob.hash, OutputBlob.codec, OutputBlob.data, OutputBlob.search_indexed).filter(
+            OutputBlob.hash.in_(batch),
+            OutputBlob.unreferenced_since <= now - grace,
+            unreferenced
+        ).with_for_update(of=OutputBlob).all()
+
+        if doomed:
+            unindex_outputs(db, {h: decompress(codec, data) for h, codec, data, indexed in doomed if indexed})
+            db.query(OutputBlob).filter(
+                OutputBlob.hash.in_([row.hash for row in doomed])
+            ).delete(synchronize_session=False)
+            deleted += len(doomed)
+        db.commit()
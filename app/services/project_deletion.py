@@ -0,0 +1,132 @@
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from app.core.config import ARCHIVE_DIR
+from app.db.session import SessionLocal
+from app.models.batch_job import BatchJob
+from app.models.deletion_job import ProjectDeletionJob
+from app.models.evaluation_result import EvaluationResult
+from app.models.evaluation_sample import EvaluationSample
+from app.models.model_run import ModelRun
+from app.models.project import Project
+from app.models.prompt import PromptVersion
+from app.models.test_case import TestCase
+from app.models.test_signature import TestCaseBand, TestCaseSignature
+from app.services.output_store import collect_garbage
+
+BATCH_SIZE = 5000
+# A running job whose heartbeat is older than this is assumed dead
+STALE_AFTER = timedelta(minutes=5)
+
+
+def _stages(db, project_id):
+    """(stage name, model, filter) in foreign-key order, children first."""
+    run_ids = db.query(ModelRun.id).filter(ModelRun.project_id == project_id)
+    return [
+        ("evaluation_results", EvaluationResult, EvaluationResult.model_run_id.in_(run_ids)),
+        ("evaluation_samples", EvaluationSample, EvaluationSample.model_run_id.in_(run_ids)),
+        ("batch_jobs", BatchJob, BatchJob.model_run_id.in_(run_ids)),
+        ("model_runs", ModelRun, ModelRun.project_id == project_id),
+        ("test_lsh_bands", TestCaseBand, TestCaseBand.project_id == project_id),
+        ("test_signatures", TestCaseSignature, TestCaseSignature.project_id == project_id),
+        ("tests", TestCase, TestCase.project_id == project_id),
+        ("prompt_versions", PromptVersion, PromptVersion.project_id == project_id),
+        ("projects", Project, Project.id == project_id),
+    ]
+
+
+def _delete_in_batches(db, job, stage, model, condition):
+    """Deletes matching rows BATCH_SIZE at a time, one short transaction each."""
+    key = model.__mapper__.primary_key[0]
+    while True:
+        ids = [row[0] for row in db.query(key).filter(condition).limit(BATCH_SIZE)]
+        if not ids:
+            return
+
+        deleted = db.query(model).filter(key.in_(ids)).delete(synchronize_session=False)
+        job.stage = stage
+        job.deleted_rows = (job.deleted_rows or 0) + deleted
+        job.updated_at = datetime.utcnow()
+        db.commit()
+
+
+def _claim(db, job_id):
+    """Atomically marks the job as ours, unless another worker is alive on it."""
+    now = datetime.utcnow()
+    claimed = db.query(ProjectDeletionJob).filter(
+        ProjectDeletionJob.id == job_id,
+        or_(
+            ProjectDeletionJob.status == "pending",
+            (ProjectDeletionJob.status == "running") & (ProjectDeletionJob.updated_at < now - STALE_AFTER)
+        )
+    ).update({"status": "running", "updated_at": now}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def run_deletion_job(job_id):
+    """
+    Removes a soft-deleted project's children in bounded batches. Every
+    stage is idempotent, so a job interrupted by a restart simply resumes.
+    """
+    db = SessionLocal()
+    try:
+        while not _claim(db, job_id):
+            job = db.query(ProjectDeletionJob).filter(ProjectDeletionJob.id == job_id).first()
+            if not job or job.status not in ("pending", "running"):
+                return
+            # Another worker holds it; take over if its heartbeat goes stale
+            db.expire_all()
+            time.sleep(STALE_AFTER.total_seconds())
+
+        job = db.query(ProjectDeletionJob).filter(ProjectDeletionJob.id == job_id).first()
+        try:
+            for stage, model, condition in _stages(db, job.project_id):
+                _delete_in_batches(db, job, stage, model, condition)
+
+            # Archived (cold) results of the project's runs
+            shutil.rmtree(os.path.join(ARCHIVE_DIR, f"project_{job.project_id}"), ignore_errors=True)
+
+            job.status = "completed"
+            job.stage = None
+            job.completed_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Project deletion job {job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            db.commit()
+            return
+
+        # Marks the project's outputs; a later pass deletes them
+        try:
+            collect_garbage(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Output blob garbage collection failed: {e}")
+    finally:
+        db.close()
+
+
+def start_deletion_job(job_id):
+    threading.Thread(target=run_deletion_job, args=(job_id,), daemon=True).start()
+
+
+def resume_deletion_jobs():
+    """Restarts jobs that were pending or running when the process stopped."""
+    db = SessionLocal()
+    try:
+        job_ids = [row[0] for row in db.query(ProjectDeletionJob.id).filter(
+            ProjectDeletionJob.status.in_(["pending", "running"])
+        )]
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        start_deletion_job(job_id)
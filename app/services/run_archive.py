@@ -0,0 +1,250 @@
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import func, insert, or_
+
+from app.core.config import ARCHIVE_DIR
+from app.db.session import SessionLocal
+from app.models.evaluation_result import EvaluationResult
+from app.models.model_run import ModelRun
+from app.models.output_blob import OutputBlob
+from app.models.project import Project
+from app.models.test_case import TestCase
+from app.services.output_store import collect_garbage, output_text, store_outputs
+
+BATCH_SIZE = 2000
+LOOKUP_CHUNK = 500
+
+
+def _result_columns():
+    # Everything but the output reference, which is archived as plain text
+    return [c.name for c in EvaluationResult.__table__.columns if c.name not in ("model_output", "output_hash")]
+
+
+def _archive_path(run):
+    return os.path.join(ARCHIVE_DIR, f"project_{run.project_id}", f"run_{run.id}.jsonl.gz")
+
+
+class ArchiveInProgress(Exception):
+    """The run's results are still being deleted from the hot table."""
+
+
+def _write_archive(db, run, path):
+    """Writes the run's hot results to `path`; returns (total, correct)."""
+    columns = _result_columns()
+    rows = db.query(EvaluationResult, OutputBlob.codec, OutputBlob.data).outerjoin(
+        OutputBlob, EvaluationResult.output_hash == OutputBlob.hash
+    ).filter(EvaluationResult.model_run_id == run.id).order_by(
+        EvaluationResult.test_case_id
+    ).yield_per(BATCH_SIZE)
+
+    total = correct = 0
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for res, codec, data in rows:
+            record = {name: getattr(res, name) for name in columns}
+            record["output"] = output_text(res.model_output, codec, data)
+            f.write(json.dumps(record) + "\n")
+            total += 1
+            correct += res.score == 2
+    return total, correct
+
+
+def archive_run(db, run):
+    """
+    Moves a run's results to a gzipped JSONL file, keeping summary counts on
+    the run. Setting archive_path (once the file is complete) switches reads
+    to the file; archived_at is only set once every hot row is deleted, so
+    rehydrate_run never races the batched delete. A run left in between by
+    a crash resumes deleting on the next retention pass.
+    """
+    if run.archive_path is None:
+        path = _archive_path(run)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        total, correct = _write_archive(db, run, tmp_path)
+
+        # Claim the run; a concurrent pass that got here first wins
+        claimed = db.query(ModelRun).filter(
+            ModelRun.id == run.id,
+            ModelRun.archive_path.is_(None)
+        ).update({
+            "archive_path": path,
+            "archived_total": total,
+            "archived_correct": correct,
+        }, synchronize_session=False)
+        if claimed:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+        db.commit()
+        db.refresh(run)
+
+    while True:
+        ids = [row[0] for row in db.query(EvaluationResult.id).filter(
+            EvaluationResult.model_run_id == run.id
+        ).limit(BATCH_SIZE)]
+        if not ids:
+            break
+        db.query(EvaluationResult).filter(EvaluationResult.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+    if run.archived_at is None:
+        run.archived_at = datetime.utcnow()
+        db.commit()
+
+
+def is_archived(run):
+    """True once reads go to the archive file, including while archiving."""
+    return run.archive_path is not None
+
+
+def archived_records(run):
+    """
+    An archived run's results read straight from its file, in test id
+    order: dicts of the result columns plus "output" (the text).
+    """
+    with gzip.open(run.archive_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def archived_scores(run):
+    """{test id: score} of an archived run."""
+    return {record["test_case_id"]: record["score"] for record in archived_records(run)}
+
+
+def _with_tests(db, records):
+    tests = {t.id: t for t in db.query(TestCase).filter(
+        TestCase.id.in_({record["test_case_id"] for record in records})
+    )}
+    for record in records:
+        test = tests.get(record["test_case_id"])
+        # Tests deleted since are skipped, as the joins of hot reads do
+        if test is not None:
+            yield SimpleNamespace(**record), test
+
+
+def archived_results(db, run):
+    """
+    (result, TestCase) pairs of an archived run. Results are namespaces
+    with the attributes of EvaluationResult, plus `output`.
+    """
+    chunk = []
+    for record in archived_records(run):
+        chunk.append(record)
+        if len(chunk) >= LOOKUP_CHUNK:
+            yield from _with_tests(db, chunk)
+            chunk = []
+    if chunk:
+        yield from _with_tests(db, chunk)
+
+
+def _insert_batch(db, batch):
+    hashes = store_outputs(db, [record.pop("output") or "" for record in batch])
+    for record, h in zip(batch, hashes):
+        record["output_hash"] = h
+    db.execute(insert(EvaluationResult), batch)
+
+
+def rehydrate_run(db, run):
+    """
+    Loads an archived run's results back into the hot table. Raises
+    ArchiveInProgress while archive_run is still deleting them.
+    """
+    # Lock the run so concurrent writers don't rehydrate it twice
+    run = db.query(ModelRun).filter(ModelRun.id == run.id).populate_existing().with_for_update().first()
+    if run.archive_path is None:
+        db.commit()
+        return
+    if run.archived_at is None:
+        db.rollback()
+        raise ArchiveInProgress(f"Run {run.id} is being archived")
+
+    batch = []
+    for record in archived_records(run):
+        batch.append(record)
+        if len(batch) >= BATCH_SIZE:
+            _insert_batch(db, batch)
+            batch = []
+    if batch:
+        _insert_batch(db, batch)
+
+    path = run.archive_path
+    run.archived_at = None
+    run.archive_path = None
+    run.archived_total = None
+    run.archived_correct = None
+    db.commit()
+
+    # Only now: the hot rows are committed and nothing deletes them any more
+    os.remove(path)
+
+
+def ensure_hot(db, run):
+    """
+    Call before modifying a run's results; a no-op for runs that are hot.
+    Reads go to the archive file instead (archived_records/archived_results).
+    """
+    if run is not None and is_archived(run):
+        rehydrate_run(db, run)
+
+
+def runs_to_archive(db, project):
+    """
+    Completed, still-hot runs older than the policy, minus the latest K per
+    model. Bisect probes don't count toward the K and are never kept.
+    """
+    if not project.retention_days:
+        return []
+
+    cutoff = datetime.utcnow() - timedelta(days=project.retention_days)
+    probe = ModelRun.mode == "bisect"
+    rank = func.row_number().over(
+        partition_by=(ModelRun.model_name, probe),
+        order_by=ModelRun.completed_at.desc()
+    ).label("rank")
+
+    ranked = db.query(ModelRun.id, ModelRun.completed_at, ModelRun.archived_at, probe.label("probe"), rank).filter(
+        ModelRun.project_id == project.id,
+        ModelRun.status == "completed"
+    ).subquery()
+
+    run_ids = [row[0] for row in db.query(ranked.c.id).filter(
+        or_(ranked.c.probe, ranked.c.rank > (project.retention_keep_latest or 0)),
+        ranked.c.completed_at < cutoff,
+        ranked.c.archived_at.is_(None)
+    )]
+    return db.query(ModelRun).filter(ModelRun.id.in_(run_ids)).all() if run_ids else []
+
+
+def apply_retention(project_id):
+    """
+    Archives every run the project's policy makes eligible, then deletes
+    output blobs that no longer back any result.
+    """
+    db = SessionLocal()
+    try:
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if not project:
+            return
+        for run in runs_to_archive(db, project):
+            try:
+                archive_run(db, run)
+            except Exception as e:
+                db.rollback()
+                print(f"Archiving run {run.id} failed: {e}")
+        try:
+            collect_garbage(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Output blob garbage collection failed: {e}")
+    finally:
+        db.close()
+
+
+def start_retention(project_id):
+    threading.Thread(target=apply_retention, args=(project_id,), daemon=True).start()
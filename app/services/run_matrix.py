@@ -0,0 +1,129 @@
+import json
+from itertools import combinations
+
+from sqlalchemy import and_, case, func
+
+from app.db.session import SessionLocal
+from app.models.evaluation_result import EvaluationResult
+from app.models.test_case import TestCase
+from app.services.run_archive import archived_scores, is_archived
+
+FETCH_SIZE = 1000
+
+
+def matrix_query(db, project_id, run_ids, all_tests=False):
+    """
+    One aggregated query pivoting results into a test x run score matrix:
+    a row per test, a score column per run (NULL when the run has no result).
+    Only tests with a result are returned, unless `all_tests`.
+    """
+    score_columns = [
+        func.max(case((EvaluationResult.model_run_id == run_id, EvaluationResult.score)))
+        for run_id in run_ids
+    ]
+    query = db.query(TestCase.id, TestCase.prompt, *score_columns)
+    if all_tests:
+        query = query.outerjoin(EvaluationResult, and_(
+            EvaluationResult.test_case_id == TestCase.id,
+            EvaluationResult.model_run_id.in_(run_ids)
+        ))
+    else:
+        query = query.join(
+            EvaluationResult, EvaluationResult.test_case_id == TestCase.id
+        ).filter(EvaluationResult.model_run_id.in_(run_ids))
+    return query.filter(
+        TestCase.project_id == project_id
+    ).group_by(TestCase.id).order_by(TestCase.id).yield_per(FETCH_SIZE)
+
+
+def _score_rows(db, project_id, runs):
+    """(test id, prompt, scores in `runs` order) for every test with a result."""
+    archived = {run.id: archived_scores(run) for run in runs if is_archived(run)}
+    hot_ids = [run.id for run in runs if run.id not in archived]
+    if not archived:
+        yield from matrix_query(db, project_id, hot_ids)
+        return
+
+    # Archived runs' scores come from their files, merged in test order
+    for test_id, prompt, *hot_scores in matrix_query(db, project_id, hot_ids, all_tests=True):
+        hot = dict(zip(hot_ids, hot_scores))
+        scores = [
+            archived[run.id].get(test_id) if run.id in archived else hot[run.id]
+            for run in runs
+        ]
+        if any(score is not None for score in scores):
+            yield test_id, prompt, *scores
+
+
+def stream_matrix(project_id, runs, disagreements_only=False):
+    """
+    Yields the matrix as NDJSON: one line per test, then a summary line with
+    per-run pass rates and pairwise pass/fail agreement counts.
+
+    Opens its own session because it runs after the request handler returns.
+    """
+    run_ids = [run.id for run in runs]
+    totals = {run_id: 0 for run_id in run_ids}
+    passed = {run_id: 0 for run_id in run_ids}
+    pairs = list(combinations(range(len(run_ids)), 2))
+    agree = [0] * len(pairs)
+    compared = [0] * len(pairs)
+    disagreements = 0
+
+    db = SessionLocal()
+    try:
+        for test_id, prompt, *scores in _score_rows(db, project_id, runs):
+            verdicts = []
+            for run_id, score in zip(run_ids, scores):
+                if score is None:
+                    verdicts.append(None)
+                    continue
+                totals[run_id] += 1
+                passed[run_id] += score == 2
+                verdicts.append(score == 2)
+
+            for k, (i, j) in enumerate(pairs):
+                if verdicts[i] is not None and verdicts[j] is not None:
+                    compared[k] += 1
+                    agree[k] += verdicts[i] == verdicts[j]
+
+            seen = {v for v in verdicts if v is not None}
+            disagree = len(seen) > 1
+            disagreements += disagree
+
+            if disagreements_only and not disagree:
+                continue
+
+            yield json.dumps({
+                "type": "row",
+                "test_id": test_id,
+                "prompt": prompt,
+                "scores": {str(run_id): score for run_id, score in zip(run_ids, scores)},
+                "disagree": disagree,
+            }) + "\n"
+    finally:
+        db.close()
+
+    yield json.dumps({
+        "type": "summary",
+        "runs": [
+            {
+                "run_id": str(run.id),
+                "model_name": run.model_name,
+                "total": totals[run.id],
+                "passed": passed[run.id],
+                "pass_rate": round(passed[run.id] / totals[run.id] * 100, 2) if totals[run.id] else 0.0,
+            }
+            for run in runs
+        ],
+        "agreement": [
+            {
+                "run_a": str(run_ids[i]),
+                "run_b": str(run_ids[j]),
+                "agree": agree[k],
+                "compared": compared[k],
+            }
+            for k, (i, j) in enumerate(pairs)
+        ],
+        "disagreements": disagreements,
+    }) + "\n"
@@ -0,0 +1,151 @@
+import math
+import random
+from statistics import NormalDist
+
+from app.services.evaluation_engine import evaluate
+
+# Never stop before this many cases, however narrow the interval looks
+MIN_CASES = 30
+
+
+def stratified_order(tests, seed=None):
+    """
+    Orders tests so that every prefix is a proportional stratified sample by
+    task_type: the k-th of N_h shuffled tests in a stratum gets the key
+    (k + u) / N_h, and sorting by key interleaves the strata evenly.
+    """
+    rng = random.Random(seed)
+    strata = {}
+    for test in tests:
+        strata.setdefault(test.task_type or "general", []).append(test)
+
+    keyed = []
+    for members in strata.values():
+        rng.shuffle(members)
+        offset = rng.random()
+        n = len(members)
+        keyed.extend(((k + offset) / n, test) for k, test in enumerate(members))
+
+    keyed.sort(key=lambda item: item[0])
+    return [test for _, test in keyed]
+
+
+def _z(confidence):
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def stratified_interval(values_by_stratum, population, confidence):
+    """
+    Stratified mean and normal-approximation interval of per-test values
+    (1/0 for pass/fail, or -1/0/1 for paired differences), with a finite
+    population correction. A half pseudo-observation per stratum keeps the
+    variance away from zero when a small sample happens to be unanimous.
+    """
+    sampled = {h: v for h, v in values_by_stratum.items() if v}
+    if not sampled:
+        return None, None, None
+
+    total = sum(population[h] for h in sampled)
+    estimate = 0.0
+    variance = 0.0
+    for h, values in sampled.items():
+        n = len(values)
+        weight = population[h] / total
+        mean = sum(values) / n
+        smoothed_var = (sum((v - mean) ** 2 for v in values) + 0.25) / (n + 0.5)
+        fpc = max(0.0, 1 - n / population[h])
+        estimate += weight * mean
+        variance += weight ** 2 * smoothed_var / n * fpc
+
+    half = _z(confidence) * math.sqrt(variance)
+    return estimate, estimate - half, estimate + half
+
+
+def evaluate_sampled(
+    tests, model_name, api_keys, system_template=None,
+    target_ci_width=0.1, confidence=0.95, wave_size=50, max_cases=None,
+    baseline_scores=None, seed=None, hedge=None, ticket=None
+):
+    """
+    Evaluates a stratified sample in waves, stopping once the interval on
+    the pass rate (or, with a baseline, on the paired pass-rate difference)
+    is narrower than `target_ci_width`.
+
+    Returns (results, input_tokens, output_tokens, report).
+    """
+    ordered = stratified_order(tests, seed=seed)
+    if max_cases:
+        ordered = ordered[:max_cases]
+
+    population = {}
+    for test in tests:
+        h = test.task_type or "general"
+        population[h] = population.get(h, 0) + 1
+    stratum_of = {test.id: test.task_type or "general" for test in tests}
+
+    results = []
+    total_input = total_output = 0
+    passes = {h: [] for h in population}
+    diffs = {h: [] for h in population}
+    stats = diff_stats = (None, None, None)
+    stopped_early = False
+
+    for start in range(0, len(ordered), wave_size):
+        wave = ordered[start:start + wave_size]
+        wave_results, wave_input, wave_output = evaluate(
+            test_cases=wave,
+            model_name=model_name,
+            api_keys=api_keys,
+            system_template=system_template,
+            hedge=hedge,
+            ticket=ticket
+        )
+        results.extend(wave_results)
+        total_input += wave_input
+        total_output += wave_output
+
+        for res in wave_results:
+            h = stratum_of[res["test_id"]]
+            passed = 1 if res["score"] == 2 else 0
+            passes[h].append(passed)
+            if baseline_scores is not None and res["test_id"] in baseline_scores:
+                diffs[h].append(passed - (1 if baseline_scores[res["test_id"]] == 2 else 0))
+
+        # evaluate() stopped short (rate-limit circuit breaker)
+        if len(wave_results) < len(wave):
+            break
+
+        stats = stratified_interval(passes, population, confidence)
+        deciding = stats
+        if baseline_scores is not None:
+            diff_stats = stratified_interval(diffs, population, confidence)
+            deciding = diff_stats
+
+        if len(results) >= MIN_CASES and deciding[0] is not None and deciding[2] - deciding[1] <= target_ci_width:
+            stopped_early = len(results) < len(ordered)
+            break
+
+    stats = stratified_interval(passes, population, confidence)
+    if baseline_scores is not None:
+        diff_stats = stratified_interval(diffs, population, confidence)
+
+    def _clip(value, low, high):
+        return None if value is None else round(min(max(value, low), high), 4)
+
+    report = {
+        "estimate": _clip(stats[0], 0, 1),
+        "ci_low": _clip(stats[1], 0, 1),
+        "ci_high": _clip(stats[2], 0, 1),
+        "confidence": confidence,
+        "target_ci_width": target_ci_width,
+        "cases_evaluated": len(results),
+        "population": len(tests),
+        "stopped_early": stopped_early,
+    }
+    if baseline_scores is not None:
+        report.update({
+            "diff_estimate": _clip(diff_stats[0], -1, 1),
+            "diff_ci_low": _clip(diff_stats[1], -1, 1),
+            "diff_ci_high": _clip(diff_stats[2], -1, 1),
+        })
+    return results, total_input, total_output, report
@@ -0,0 +1,184 @@
+"""
+Fair sharing of provider calls between concurrent runs.
+
+Runs still execute in their request threads, but each of their provider
+calls (generation and judge) first takes one of PROVIDER_SLOTS process-wide
+slots. Waiting calls are served in weighted fair queuing order over
+(user, project) flows: a call is tagged max(virtual time, its flow's last
+tag) + 1 / weight, and the lowest tag whose user holds fewer than
+USER_MAX_IN_FLIGHT slots goes next. A user with ten runs in one project
+gets the share of a user with one, and interactive runs get four times
+the share of nightly ones.
+
+Slots are not shared between processes: each API or batch worker process
+has its own PROVIDER_SLOTS (see core/config).
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from app.core.config import PROVIDER_SLOTS, USER_MAX_IN_FLIGHT
+from app.core.metrics import RUNS_QUEUED, SCHEDULER_IN_FLIGHT, SCHEDULER_QUEUE_WAIT
+
+PRIORITY_WEIGHTS = {"interactive": 4, "nightly": 1}
+# Waiting calls re-check for cancellation this often. Runs cancelled via
+# another API process are read from the database at the same interval
+CANCEL_POLL_SECONDS = 2.0
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class Ticket:
+    """A run's handle on the scheduler; wrap each provider call in slot()."""
+
+    def __init__(self, scheduler, run_id, user_id, project_id, priority):
+        self.scheduler = scheduler
+        self.run_id = run_id
+        self.user_id = user_id
+        self.flow = (user_id, project_id)
+        self.priority = priority
+        self.weight = PRIORITY_WEIGHTS[priority]
+        self.cancelled = False
+        self.started = False
+
+    def check(self):
+        if self.cancelled:
+            raise RunCancelled(f"Run {self.run_id} was cancelled")
+
+    @contextmanager
+    def slot(self, trace=None):
+        """Holds a slot for the block; `trace` gets queue_wait_ms added."""
+        waited = self.scheduler.acquire(self)
+        if trace is not None:
+            trace["queue_wait_ms"] = trace.get("queue_wait_ms", 0) + waited * 1000
+        try:
+            yield
+        finally:
+            self.scheduler.release(self)
+
+
+class Scheduler:
+    def __init__(self, slots=PROVIDER_SLOTS, user_cap=USER_MAX_IN_FLIGHT):
+        self.slots = slots
+        self.user_cap = user_cap
+        self.in_flight = 0
+        self.user_in_flight = {}
+        self.virtual_time = 0.0
+        self.last_tag = {}
+        self.waiting = []       # [tag, sequence, ticket]
+        self.tickets = {}       # run_id -> Ticket
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._poll_lock = threading.Lock()
+        self._last_poll = 0.0
+
+    def register(self, run_id, user_id, project_id, priority="interactive"):
+        ticket = Ticket(self, run_id, user_id, project_id, priority)
+        with self._cond:
+            self.tickets[run_id] = ticket
+        RUNS_QUEUED.inc()
+        return ticket
+
+    def unregister(self, ticket):
+        with self._cond:
+            self.tickets.pop(ticket.run_id, None)
+            # An idle flow restarts from the virtual time
+            if not any(t.flow == ticket.flow for t in self.tickets.values()):
+                self.last_tag.pop(ticket.flow, None)
+        if not ticket.started:
+            RUNS_QUEUED.dec()
+
+    def cancel(self, run_id):
+        """Cancels a run executing in this process; False if there is none."""
+        with self._cond:
+            ticket = self.tickets.get(run_id)
+            if ticket is None:
+                return False
+            ticket.cancelled = True
+            self._cond.notify_all()
+            return True
+
+    def _next(self):
+        eligible = [e for e in self.waiting if self.user_in_flight.get(e[2].user_id, 0) < self.user_cap]
+        # (tag, sequence) is unique, so tickets are never compared
+        return min(eligible, default=None)
+
+    def acquire(self, ticket):
+        self._poll_cancellations()
+        queued = time.perf_counter()
+        with self._cond:
+            ticket.check()
+            tag = max(self.virtual_time, self.last_tag.get(ticket.flow, 0.0)) + 1 / ticket.weight
+            self.last_tag[ticket.flow] = tag
+            entry = [tag, next(self._sequence), ticket]
+            self.waiting.append(entry)
+
+        while True:
+            with self._cond:
+                if ticket.cancelled:
+                    self.waiting.remove(entry)
+                    self._cond.notify_all()
+                    ticket.check()
+                if self.in_flight < self.slots and self._next() is entry:
+                    self.waiting.remove(entry)
+                    self.in_flight += 1
+                    self.user_in_flight[ticket.user_id] = self.user_in_flight.get(ticket.user_id, 0) + 1
+                    self.virtual_time = max(self.virtual_time, tag)
+                    # A free slot may let the next call go too
+                    self._cond.notify_all()
+                    break
+                self._cond.wait(timeout=CANCEL_POLL_SECONDS)
+            self._poll_cancellations()
+
+        waited = time.perf_counter() - queued
+        user = str(ticket.user_id)
+        SCHEDULER_QUEUE_WAIT.labels(user=user, priority=ticket.priority).observe(waited)
+        SCHEDULER_IN_FLIGHT.labels(user=user).inc()
+        if not ticket.started:
+            ticket.started = True
+            RUNS_QUEUED.dec()
+        return waited
+
+    def release(self, ticket):
+        with self._cond:
+            self.in_flight -= 1
+            self.user_in_flight[ticket.user_id] -= 1
+            if not self.user_in_flight[ticket.user_id]:
+                del self.user_in_flight[ticket.user_id]
+            self._cond.notify_all()
+        SCHEDULER_IN_FLIGHT.labels(user=str(ticket.user_id)).dec()
+
+    def _poll_cancellations(self):
+        with self._poll_lock:
+            now = time.monotonic()
+            if now - self._last_poll < CANCEL_POLL_SECONDS:
+                return
+            self._last_poll = now
+        with self._cond:
+            run_ids = [run_id for run_id, t in self.tickets.items() if not t.cancelled]
+        if not run_ids:
+            return
+
+        from app.db.session import SessionLocal
+        from app.models.model_run import ModelRun
+        db = SessionLocal()
+        try:
+            cancelled = [row[0] for row in db.query(ModelRun.id).filter(
+                ModelRun.id.in_(run_ids),
+                ModelRun.status == "cancelling"
+            )]
+        except Exception as e:
+            # Only cross-process cancellation depends on this
+            print(f"Cancellation poll failed: {e}")
+            return
+        finally:
+            db.close()
+        for run_id in cancelled:
+            self.cancel(run_id)
+
+
+# Shared by every run of this process
+scheduler = Scheduler()
@@ -0,0 +1,270 @@
+"""
+Full-text search over test cases and model outputs.
+
+Postgres: a GIN expression index over the tests' prompt/expected/context,
+and an `output_search` table holding one tsvector per output blob (blobs
+are stored compressed, so they can't be indexed in place). SQLite falls
+back to FTS5: `tests_fts` mirrors the tests table through triggers, and
+the contentless `output_search_fts` is keyed by `output_search_keys.id`,
+an INTEGER PRIMARY KEY assigned per blob hash. (Not the blob's implicit
+rowid: output_blobs has a string primary key, so VACUUM or a table
+rebuild may renumber it.)
+
+Both are created by ensure_search_schema() after create_all. Outputs are
+indexed as store_outputs() writes them; blobs written before search
+existed are picked up by the startup backfill.
+"""
+import re
+import threading
+
+from sqlalchemy import bindparam, column, literal_column, text, update
+
+from app.models.evaluation_result import EvaluationResult
+from app.models.output_blob import OutputBlob
+from app.models.test_case import TestCase
+
+BACKFILL_BATCH = 500
+LOOKUP_CHUNK = 500
+TS_CONFIG = "english"
+
+# Must match the index expression exactly for Postgres to use the index
+TESTS_DOCUMENT = (
+    f"to_tsvector('{TS_CONFIG}', coalesce(tests.prompt, '') || ' ' || "
+    "coalesce(tests.expected, '') || ' ' || coalesce(tests.context, ''))"
+)
+
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_tests_fulltext ON tests USING GIN ({TESTS_DOCUMENT})",
+    "CREATE TABLE IF NOT EXISTS output_search ("
+    " hash VARCHAR(64) PRIMARY KEY REFERENCES output_blobs (hash),"
+    " document TSVECTOR NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_output_search_document ON output_search USING GIN (document)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tests_fts USING fts5("
+    " prompt, expected, context, content='tests', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS tests_fts_insert AFTER INSERT ON tests BEGIN"
+    " INSERT INTO tests_fts (rowid, prompt, expected, context)"
+    " VALUES (new.id, new.prompt, new.expected, new.context); END",
+    "CREATE TRIGGER IF NOT EXISTS tests_fts_delete AFTER DELETE ON tests BEGIN"
+    " INSERT INTO tests_fts (tests_fts, rowid, prompt, expected, context)"
+    " VALUES ('delete', old.id, old.prompt, old.expected, old.context); END",
+    "CREATE TRIGGER IF NOT EXISTS tests_fts_update AFTER UPDATE ON tests BEGIN"
+    " INSERT INTO tests_fts (tests_fts, rowid, prompt, expected, context)"
+    " VALUES ('delete', old.id, old.prompt, old.expected, old.context);"
+    " INSERT INTO tests_fts (rowid, prompt, expected, context)"
+    " VALUES (new.id, new.prompt, new.expected, new.context); END",
+    "CREATE TABLE IF NOT EXISTS output_search_keys ("
+    " id INTEGER PRIMARY KEY,"
+    " hash VARCHAR(64) NOT NULL UNIQUE REFERENCES output_blobs (hash))",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS output_search_fts USING fts5("
+    " body, content='', tokenize='porter unicode61')",
+]
+
+
+def _dialect(db_or_engine):
+    bind = db_or_engine.get_bind() if hasattr(db_or_engine, "get_bind") else db_or_engine
+    return bind.dialect.name
+
+
+def ensure_search_schema(engine):
+    dialect = _dialect(engine)
+    if dialect == "postgresql":
+        statements = POSTGRES_DDL
+    elif dialect == "sqlite":
+        statements = SQLITE_DDL
+    else:
+        return
+
+    with engine.begin() as conn:
+        def exists(name):
+            return conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": name}
+            ).first() is not None
+
+        tests_indexed = dialect == "sqlite" and exists("tests_fts")
+        if dialect == "sqlite" and exists("output_search_fts") and not exists("output_search_keys"):
+            # Indexed by output_blobs rowids: start over, the backfill reindexes
+            conn.execute(text("DROP TABLE output_search_fts"))
+            conn.execute(update(OutputBlob).values(search_indexed=False))
+        for statement in statements:
+            conn.execute(text(statement))
+        if dialect == "sqlite" and not tests_indexed:
+            # Tests that existed before the FTS table
+            conn.execute(text("INSERT INTO tests_fts (tests_fts) VALUES ('rebuild')"))
+
+
+def index_outputs(db, texts_by_hash):
+    """
+    Indexes newly stored blobs and flags them as indexed. Must run in the
+    transaction that inserted them; blobs already flagged are skipped.
+    """
+    if not texts_by_hash:
+        return
+    dialect = _dialect(db)
+    if dialect not in ("postgresql", "sqlite"):
+        return
+
+    hashes = list(texts_by_hash)
+    for i in range(0, len(hashes), LOOKUP_CHUNK):
+        chunk = hashes[i:i + LOOKUP_CHUNK]
+        pending = [h for (h,) in db.query(OutputBlob.hash).filter(
+            OutputBlob.hash.in_(chunk),
+            OutputBlob.search_indexed.is_(False)
+        )]
+        if not pending:
+            continue
+
+        if dialect == "postgresql":
+            db.execute(text(
+                "INSERT INTO output_search (hash, document)"
+                f" VALUES (:hash, to_tsvector('{TS_CONFIG}', :body)) ON CONFLICT (hash) DO NOTHING"
+            ), [{"hash": h, "body": texts_by_hash[h]} for h in pending])
+        else:
+            # A key exists exactly when the blob's FTS row does
+            db.execute(text("INSERT INTO output_search_keys (hash) VALUES (:hash)"), [{"hash": h} for h in pending])
+            keys = db.execute(
+                text("SELECT id, hash FROM output_search_keys WHERE hash IN :hashes")
+                .bindparams(bindparam("hashes", expanding=True)),
+                {"hashes": pending}
+            ).all()
+            db.execute(text(
+                "INSERT INTO output_search_fts (rowid, body) VALUES (:key, :body)"
+            ), [{"key": key, "body": texts_by_hash[h]} for key, h in keys])
+
+        db.execute(update(OutputBlob).where(OutputBlob.hash.in_(pending)).values(search_indexed=True))
+
+
+def unindex_outputs(db, texts_by_hash):
+    """
+    Removes blobs about to be deleted from the full-text index. Contentless
+    FTS5 rows can only be deleted given the text they were indexed with.
+    """
+    if not texts_by_hash:
+        return
+    dialect = _dialect(db)
+    hashes = list(texts_by_hash)
+    for i in range(0, len(hashes), LOOKUP_CHUNK):
+        chunk = hashes[i:i + LOOKUP_CHUNK]
+        if dialect == "postgresql":
+            db.execute(
+                text("DELETE FROM output_search WHERE hash IN :hashes").bindparams(bindparam("hashes", expanding=True)),
+                {"hashes": chunk}
+            )
+        elif dialect == "sqlite":
+            keys = db.execute(
+                text("SELECT id, hash FROM output_search_keys WHERE hash IN :hashes")
+                .bindparams(bindparam("hashes", expanding=True)),
+                {"hashes": chunk}
+            ).all()
+            if not keys:
+                continue
+            db.execute(text(
+                "INSERT INTO output_search_fts (output_search_fts, rowid, body) VALUES ('delete', :key, :body)"
+            ), [{"key": key, "body": texts_by_hash[h]} for key, h in keys])
+            db.execute(
+                text("DELETE FROM output_search_keys WHERE id IN :keys").bindparams(bindparam("keys", expanding=True)),
+                {"keys": [key for key, _ in keys]}
+            )
+
+
+def backfill():
+    """
+    Indexes blobs written before search existed, and moves legacy inline
+    outputs into the blob store so they become searchable too.
+    """
+    from app.db.session import SessionLocal
+    from app.services.output_store import output_text, store_outputs
+
+    db = SessionLocal()
+    try:
+        if _dialect(db) not in ("postgresql", "sqlite"):
+            return
+
+        while True:
+            legacy = db.query(EvaluationResult).filter(
+                EvaluationResult.output_hash.is_(None),
+                EvaluationResult.model_output.isnot(None)
+            ).limit(BACKFILL_BATCH).all()
+            if not legacy:
+                break
+            for res, h in zip(legacy, store_outputs(db, [res.model_output for res in legacy])):
+                res.output_hash = h
+                res.model_output = None
+            db.commit()
+
+        last = ""
+        while True:
+            blobs = db.query(OutputBlob.hash, OutputBlob.codec, OutputBlob.data).filter(
+                OutputBlob.hash > last,
+                OutputBlob.search_indexed.is_(False)
+            ).order_by(OutputBlob.hash).limit(BACKFILL_BATCH).all()
+            if not blobs:
+                break
+            index_outputs(db, {h: output_text(None, codec, data) for h, codec, data in blobs})
+            db.commit()
+            last = blobs[-1][0]
+    except Exception as e:
+        db.rollback()
+        print(f"Search backfill failed: {e}")
+    finally:
+        db.close()
+
+
+def start_backfill():
+    threading.Thread(target=backfill, daemon=True).start()
+
+
+def query_terms(q):
+    """Quoted phrases and bare words of a user query, lower-cased."""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', q):
+        tokens = re.findall(r"\w+", (phrase or word).lower())
+        if tokens:
+            terms.append(tokens)
+    return terms
+
+
+def _fts5_query(q):
+    # Every term quoted, so user input can't hit FTS5 query syntax
+    return " ".join('"' + " ".join(tokens) + '"' for tokens in query_terms(q))
+
+
+def tests_match(db, q):
+    """Filter clause: the test's prompt, expected or context matches `q`."""
+    if _dialect(db) == "postgresql":
+        return literal_column(TESTS_DOCUMENT).op("@@")(
+            text(f"websearch_to_tsquery('{TS_CONFIG}', :tests_q)").bindparams(tests_q=q)
+        )
+    return TestCase.id.in_(
+        text("SELECT rowid FROM tests_fts WHERE tests_fts MATCH :tests_q")
+        .bindparams(tests_q=_fts5_query(q))
+        .columns(column("rowid"))
+    )
+
+
+def outputs_match(db, q):
+    """Filter clause: the result's model output matches `q`."""
+    if _dialect(db) == "postgresql":
+        matching = text(
+            f"SELECT hash FROM output_search WHERE document @@ websearch_to_tsquery('{TS_CONFIG}', :outputs_q)"
+        ).bindparams(outputs_q=q).columns(column("hash"))
+    else:
+        matching = text(
+            "SELECT hash FROM output_search_keys WHERE id IN"
+            " (SELECT rowid FROM output_search_fts WHERE output_search_fts MATCH :outputs_q)"
+        ).bindparams(outputs_q=_fts5_query(q)).columns(column("hash"))
+    return EvaluationResult.output_hash.in_(matching)
+
+
+def snippet(body, q, width=160):
+    """A window of `body` around the first query term found in it."""
+    if body is None:
+        return None
+    lowered = body.lower()
+    positions = [lowered.find(" ".join(tokens)) for tokens in query_terms(q)]
+    positions = [p for p in positions if p >= 0]
+    start = max(0, min(positions) - width // 4) if positions else 0
+    excerpt = body[start:start + width]
+    return ("…" if start > 0 else "") + excerpt + ("…" if start + width < len(body) else "")
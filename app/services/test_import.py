@@ -0,0 +1,218 @@
+import csv
+import hashlib
+import gzip
+import io
+import json
+
+from sqlalchemy import insert
+
+from app.models.test_case import TestCase
+from app.services.near_duplicates import BatchIndex, find_indexed_matches, index_tests, minhash
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+GZIP_MAGIC = b"\x1f\x8b"
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def content_hash(prompt, task_type, context=None, expected=None) -> str:
+    """Stable hash of the fields that make two test cases the same case."""
+    payload = json.dumps(
+        [prompt or "", task_type or "general", context or "", expected or ""],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def open_text_stream(raw):
+    """
+    Wraps a binary upload in an incremental UTF-8 decoder, transparently
+    un-gzipping it when the content starts with the gzip magic bytes.
+    """
+    head = raw.read(2)
+    raw.seek(0)
+    if head == GZIP_MAGIC:
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+
+def detect_format(filename, fmt="auto"):
+    if fmt != "auto":
+        return fmt
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "jsonl" if name.endswith(JSONL_EXTENSIONS) else "csv"
+
+
+def iter_rows(text, fmt):
+    """Yields (row_number, row_dict, error) for every record in the stream."""
+    if fmt == "jsonl":
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "Expected a JSON object"
+                continue
+            yield line_no, row, None
+    else:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # line_num is the physical line, so it already counts the header
+            yield reader.line_num, row, None
+
+
+def validate_row(row, project_id):
+    """Turns a raw row into a TestCase insert mapping, or raises ValueError."""
+    prompt = row.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("Missing 'prompt'")
+
+    rules = row.get("rules")
+    if isinstance(rules, str):
+        rules = json.loads(rules) if rules.strip() else None
+    if rules is not None and not isinstance(rules, dict):
+        raise ValueError("'rules' must be a JSON object")
+
+    mapping = {
+        "project_id": project_id,
+        "prompt": prompt,
+        "expected": row.get("expected") or "",
+        "context": row.get("context") or "",
+        "task_type": row.get("task_type") or "general",
+        "rules": rules,
+    }
+    for field in ("expected", "context", "task_type"):
+        if not isinstance(mapping[field], str):
+            raise ValueError(f"'{field}' must be a string")
+
+    mapping["content_hash"] = content_hash(
+        mapping["prompt"], mapping["task_type"], mapping["context"], mapping["expected"]
+    )
+    return mapping
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.skipped_duplicates = 0
+        self.skipped_near_duplicates = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": str(error)})
+
+    def as_report(self):
+        return {
+            "message": f"Successfully imported {self.imported} test cases",
+            "imported": self.imported,
+            "skipped_duplicates": self.skipped_duplicates,
+            "skipped_near_duplicates": self.skipped_near_duplicates,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _skip_near_duplicates(db, project_id, batch, signatures, result, threshold):
+    """Drops rows similar to an indexed test or to an earlier row of the batch."""
+    matches = find_indexed_matches(db, project_id, signatures, threshold)
+    in_batch = BatchIndex(threshold)
+    kept, kept_signatures = [], []
+    for position, (entry, sig, match) in enumerate(zip(batch, signatures, matches)):
+        if match is not None or in_batch.match(sig) is not None:
+            result.skipped_near_duplicates += 1
+            continue
+        in_batch.add(position, sig)
+        kept.append(entry)
+        kept_signatures.append(sig)
+    return kept, kept_signatures
+
+
+def _flush(db, project_id, batch, result, skip_duplicates, near_duplicate_threshold=None):
+    if skip_duplicates:
+        hashes = {m["content_hash"] for _, m in batch}
+        existing = {
+            h for (h,) in db.query(TestCase.content_hash).filter(
+                TestCase.project_id == project_id,
+                TestCase.content_hash.in_(hashes)
+            )
+        }
+        unique = []
+        for row_no, mapping in batch:
+            if mapping["content_hash"] in existing:
+                result.skipped_duplicates += 1
+                continue
+            existing.add(mapping["content_hash"])
+            unique.append((row_no, mapping))
+        batch = unique
+
+    if not batch:
+        return
+
+    # Every imported test joins the near-duplicate index
+    signatures = [minhash(m["prompt"], m["context"]) for _, m in batch]
+    if near_duplicate_threshold is not None:
+        batch, signatures = _skip_near_duplicates(
+            db, project_id, batch, signatures, result, near_duplicate_threshold
+        )
+        if not batch:
+            return
+
+    try:
+        test_ids = db.execute(
+            insert(TestCase).returning(TestCase.id, sort_by_parameter_order=True),
+            [m for _, m in batch]
+        ).scalars().all()
+        index_tests(db, project_id, list(zip(test_ids, signatures)))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        for row_no, _ in batch:
+            result.add_error(row_no, f"Insert failed: {e}")
+        return
+
+    result.imported += len(batch)
+
+
+def import_test_cases(
+    db, project_id, raw, filename="", fmt="auto", skip_duplicates=False, near_duplicate_threshold=None
+):
+    """
+    Streams test cases from a CSV/JSONL (optionally gzipped) upload into the
+    project, committing every BATCH_SIZE rows so memory stays bounded and a
+    bad row only fails itself. With a near_duplicate_threshold, rows at least
+    that similar to an existing or earlier row are skipped.
+    """
+    result = ImportResult()
+    text = open_text_stream(raw)
+    batch = []
+
+    try:
+        for row_no, row, error in iter_rows(text, detect_format(filename, fmt)):
+            if error:
+                result.add_error(row_no, error)
+                continue
+            try:
+                batch.append((row_no, validate_row(row, project_id)))
+            except ValueError as e:
+                result.add_error(row_no, e)
+                continue
+
+            if len(batch) >= BATCH_SIZE:
+                _flush(db, project_id, batch, result, skip_duplicates, near_duplicate_threshold)
+                batch = []
+    except (UnicodeDecodeError, OSError, csv.Error) as e:
+        # Unreadable stream: keep what was imported so far and report the rest
+        result.add_error(-1, f"Could not read file: {e}")
+
+    _flush(db, project_id, batch, result, skip_duplicates, near_duplicate_threshold)
+    return result
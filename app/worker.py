@@ -0,0 +1,39 @@
+"""
+Background worker for batch runs: polls submitted provider batch jobs and
+ingests the finished ones into evaluation results.
+
+    python -m app.worker [--once] [--interval 30]
+
+Several workers can run at once; each job is leased to one at a time.
+"""
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+# Entry point: read .env before modules below look at the environment
+load_dotenv()
+
+from app.services.batch_runs import poll_batch_jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TrustLLM batch-run worker")
+    parser.add_argument("--once", action="store_true", help="Run a single polling pass and exit")
+    parser.add_argument(
+        "--interval", type=float,
+        default=float(os.getenv("TRUSTLLM_BATCH_POLL_SECONDS", "30")),
+        help="Seconds between polling passes"
+    )
+    args = parser.parse_args(argv)
+
+    while True:
+        poll_batch_jobs()
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
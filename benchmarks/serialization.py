@@ -0,0 +1,81 @@
+"""
+Serialization benchmark for a 10k-row run-details payload: FastAPI's
+default JSON path vs FastJSONResponse, and bytes on the wire with gzip and
+brotli.
+
+    python benchmarks/serialization.py [--rows 10000]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.core.compression import brotli  # noqa: E402
+from app.core.responses import FastJSONResponse  # noqa: E402
+
+PROMPT = "Summarise the following policy document and list every obligation it places on the tenant. " * 8
+OUTPUT = "The document requires the tenant to keep the property in good repair, to pay rent monthly, and to notify the landlord of damage. " * 12
+
+
+def build_rows(n):
+    return [
+        {
+            "test_id": i,
+            "prompt": f"{i}: {PROMPT}",
+            "expected": "repair, rent, notice",
+            "output": OUTPUT,
+            "score": 2 if i % 3 else 0,
+            "category": "correct" if i % 3 else "incorrect",
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def default_fastapi(rows):
+    # What FastAPI does for a plain return value with JSONResponse
+    return json.dumps(
+        jsonable_encoder(rows), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+    rows = build_rows(args.rows)
+
+    default_s, body = timed(lambda: default_fastapi(rows))
+    fast_s, fast_body = timed(lambda: FastJSONResponse(rows).body)
+
+    print(f"rows: {args.rows}")
+    print(f"default encoder   {default_s * 1000:8.1f} ms")
+    print(f"FastJSONResponse  {fast_s * 1000:8.1f} ms  ({default_s / fast_s:.1f}x)")
+
+    gzip_s, gz = timed(lambda: gzip.compress(fast_body, compresslevel=6), repeat=3)
+    print(f"identity          {len(fast_body) / 1e6:8.2f} MB")
+    print(f"gzip (6)          {len(gz) / 1e6:8.2f} MB  in {gzip_s * 1000:.0f} ms")
+    if brotli is not None:
+        br_s, br = timed(lambda: brotli.compress(fast_body, quality=4), repeat=3)
+        print(f"brotli (4)        {len(br) / 1e6:8.2f} MB  in {br_s * 1000:.0f} ms")
+    else:
+        print("brotli            not installed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Startup-time budget check: imports each entry point in a fresh interpreter
+and fails (exit 1) if the median import time exceeds its budget, or if a
+provider SDK was imported eagerly.
+
+    python benchmarks/startup_budget.py [--runs 5]
+
+No database is needed: DATABASE_URL defaults to in-memory SQLite here.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> budget in seconds (override with TRUSTLLM_STARTUP_BUDGET_<NAME>)
+BUDGETS = {
+    "app.main": 1.5,
+    "app.services.evaluation_engine": 0.5,
+    "app.worker": 1.0,
+    "app.cli": 1.0,
+}
+
+# Must only be loaded when a provider is first called
+LAZY_MODULES = ["openai", "anthropic", "google.genai", "pyarrow", "numpy"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "eager": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")
+    samples = []
+    eager = set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        eager.update(result["eager"])
+    return statistics.median(samples), sorted(eager)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in BUDGETS.items():
+        env_key = "TRUSTLLM_STARTUP_BUDGET_" + module.replace(".", "_").upper()
+        budget = float(os.getenv(env_key, budget))
+        median, eager = measure(module, args.runs)
+        ok = median <= budget and not eager
+        failed = failed or not ok
+        line = f"{'OK  ' if ok else 'FAIL'} {module:<40} {median * 1000:7.0f} ms (budget {budget * 1000:.0f} ms)"
+        if eager:
+            line += f"  eager imports: {', '.join(eager)}"
+        print(line)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
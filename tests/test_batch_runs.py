@@ -0,0 +1,119 @@
+"""
+Batch runs end to end against the local batch backend: submission, a
+worker pass ingesting the results, and job leases between workers.
+"""
+import os
+from datetime import datetime, timedelta
+
+# app.db.session builds its engine at import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.db.init_db  # noqa: F401  (registers every model)
+import app.db.session
+from app.db.base import Base
+from app.models.batch_job import BatchJob
+from app.models.evaluation_result import EvaluationResult
+from app.models.model_run import ModelRun
+from app.models.project import Project
+from app.models.test_case import TestCase
+from app.models.user import User
+from app.services import batch_backends, batch_runs
+from app.services.evaluation_engine import estimate_cost
+from app.services.search_index import ensure_search_schema
+
+TEMPLATE = "You answer questions about arithmetic. {{prompt}}"
+QUESTIONS = ["what is 2+2", "what is 3+3", "what is 4+4"]
+
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'batch.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    ensure_search_schema(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # The worker and the scheduler's cancellation poll open their own sessions
+    monkeypatch.setattr(batch_runs, "SessionLocal", Session)
+    monkeypatch.setattr(app.db.session, "SessionLocal", Session)
+    monkeypatch.setattr(batch_backends, "BATCH_DIR", str(tmp_path / "batches"))
+    yield Session
+    engine.dispose()
+
+
+@pytest.fixture
+def job_id(Session):
+    with Session() as db:
+        user = User(email="a@b.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        project = Project(name="p", user_id=user.id)
+        db.add(project)
+        db.flush()
+        # The local provider echoes the prompt, so each output contains its answer
+        tests = [TestCase(prompt=q, task_type="math", expected=q, project_id=project.id) for q in QUESTIONS]
+        run = ModelRun(project_id=project.id, model_name="local-batch", status="running", mode="batch")
+        db.add_all(tests + [run])
+        db.commit()
+
+        job = batch_runs.submit_batch_run(db, run, tests, TEMPLATE, {}, "local")
+        assert run.status == "batch_pending"
+        return job.id
+
+
+def test_worker_ingests_finished_batch(Session, job_id):
+    batch_runs.poll_batch_jobs()
+
+    with Session() as db:
+        job = db.get(BatchJob, job_id)
+        run = db.get(ModelRun, job.model_run_id)
+        assert (job.status, job.succeeded, job.errored, job.locked_until) == ("completed", 3, 0, None)
+        assert run.status == "completed"
+
+        results = db.query(EvaluationResult).filter(EvaluationResult.model_run_id == run.id).all()
+        assert len(results) == len(QUESTIONS)
+        assert all((res.score, res.scorer_stage) == (2, "exact_match") for res in results)
+
+        # Every request shares the template prefix; the local cache reports its hits
+        assert run.total_cached_input_tokens > 0
+        assert run.estimated_cost == pytest.approx(estimate_cost(
+            run.total_input_tokens, run.total_output_tokens, run.total_cached_input_tokens,
+            batch=True, model_name="local-batch"
+        ))
+
+    # The request file is cleaned up once ingested
+    assert os.listdir(batch_backends.BATCH_DIR) == []
+
+
+def test_claim_is_exclusive_until_the_lease_expires(Session, job_id):
+    with Session() as first, Session() as second:
+        assert batch_runs._claim(first, job_id)
+        assert not batch_runs._claim(second, job_id)
+
+        # The lease lapses (the first worker died)
+        first.query(BatchJob).filter(BatchJob.id == job_id).update(
+            {"locked_until": datetime.utcnow() - timedelta(seconds=1)}
+        )
+        first.commit()
+        assert batch_runs._claim(second, job_id)
+
+
+def test_worker_skips_job_leased_by_another(Session, job_id):
+    with Session() as other_worker:
+        assert batch_runs._claim(other_worker, job_id)
+
+    batch_runs.poll_batch_jobs()
+
+    with Session() as db:
+        job = db.get(BatchJob, job_id)
+        assert job.status == "submitted"
+        assert db.query(EvaluationResult).count() == 0
+
+        job.locked_until = None
+        db.commit()
+
+    batch_runs.poll_batch_jobs()
+    with Session() as db:
+        assert db.get(BatchJob, job_id).status == "completed"
@@ -0,0 +1,113 @@
+"""
+Repeated sampling: the Jeffreys-posterior flakiness estimate and the
+early stop that ends sampling once a test is confidently stable.
+"""
+import math
+import os
+import threading
+from types import SimpleNamespace
+
+# app.db.session builds its engine at import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+
+from app.services import flakiness as flakiness_module
+from app.services.flakiness import (
+    FOLLOW_UP_WAVE, STABLE_MARGIN, evaluate_repeated, first_wave_size, flakiness, pass_probability,
+)
+
+
+def _posterior_mass(passes, n, lo=STABLE_MARGIN, hi=1 - STABLE_MARGIN, steps=2000):
+    # Simpson's rule over the Beta(passes + 1/2, n - passes + 1/2) density
+    a, b = passes + 0.5, n - passes + 0.5
+    log_norm = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+    pdf = lambda x: math.exp(log_norm + (a - 1) * math.log(x) + (b - 1) * math.log(1 - x))
+    h = (hi - lo) / steps
+    total = pdf(lo) + pdf(hi) + sum((4 if i % 2 else 2) * pdf(lo + i * h) for i in range(1, steps))
+    return total * h / 3
+
+
+def test_flakiness_of_the_prior_matches_the_arcsine_law():
+    # Beta(1/2, 1/2) has the closed-form CDF 2/pi * asin(sqrt(x))
+    expected = 2 / math.pi * (math.asin(math.sqrt(0.8)) - math.asin(math.sqrt(0.2)))
+    assert flakiness(0, 0) == pytest.approx(expected, abs=1e-9)
+
+
+@pytest.mark.parametrize("passes, n", [(3, 3), (0, 3), (2, 4), (1, 5), (7, 10), (50, 60)])
+def test_flakiness_is_the_posterior_mass_between_the_margins(passes, n):
+    assert flakiness(passes, n) == pytest.approx(_posterior_mass(passes, n), abs=1e-6)
+    # Passing and failing are symmetric
+    assert flakiness(passes, n) == pytest.approx(flakiness(n - passes, n), abs=1e-12)
+
+
+@pytest.mark.parametrize("passes, n, expected", [(0, 0, 0.5), (0, 1, 0.25), (3, 3, 0.875), (2, 4, 0.5)])
+def test_pass_probability_is_the_posterior_mean(passes, n, expected):
+    assert pass_probability(passes, n) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("k, confidence", [(5, 0.8), (10, 0.9), (5, 0.5), (3, 0.99)])
+def test_first_wave_is_the_fewest_unanimous_samples_that_can_stop(k, confidence):
+    n = first_wave_size(k, confidence)
+    assert 1 <= n <= k
+    if n < k:
+        assert 1 - flakiness(n, n) >= confidence
+    if n > 1:
+        assert 1 - flakiness(n - 1, n - 1) < confidence
+
+
+def _scripted(monkeypatch, verdicts):
+    """Replaces evaluate_one; the i-th call of a test gets verdicts[test.id][i]."""
+    calls = {}
+    lock = threading.Lock()
+
+    def evaluate_one(test, model_name, api_keys, system_template=None, hedge=None, ticket=None):
+        with lock:
+            index = calls.get(test.id, 0)
+            calls[test.id] = index + 1
+        score = 2 if verdicts[test.id][index % len(verdicts[test.id])] else 0
+        result = {"test_id": test.id, "output": f"sample {index}", "score": score,
+                  "category": "correct" if score else "incorrect"}
+        return result, {"input": 10, "output": 5}
+
+    monkeypatch.setattr(flakiness_module, "evaluate_one", evaluate_one)
+    monkeypatch.setattr(flakiness_module.time, "sleep", lambda s: None)
+    return calls
+
+
+def _test(test_id):
+    return SimpleNamespace(id=test_id, prompt="q", expected="a", task_type="general", context=None)
+
+
+def test_unanimous_samples_stop_after_the_first_wave(monkeypatch):
+    calls = _scripted(monkeypatch, {1: [True], 2: [False]})
+
+    results, input_tokens, _, samples = evaluate_repeated(
+        [_test(1), _test(2)], "local-x", {}, samples_per_test=10, stop_confidence=0.8
+    )
+
+    first_wave = first_wave_size(10, 0.8)
+    assert first_wave < 10
+    assert calls == {1: first_wave, 2: first_wave}
+    assert [r["sample_count"] for r in results] == [first_wave, first_wave]
+    assert [r["score"] for r in results] == [2, 0]
+    assert results[0]["pass_probability"] == round(pass_probability(first_wave, first_wave), 4)
+    assert len(samples) == 2 * first_wave
+    assert input_tokens == 10 * 2 * first_wave
+
+
+def test_split_samples_draw_follow_up_waves_up_to_k(monkeypatch):
+    calls = _scripted(monkeypatch, {1: [True, False]})
+    k = 7
+
+    results, _, _, samples = evaluate_repeated([_test(1)], "local-x", {}, samples_per_test=k, stop_confidence=0.8)
+
+    assert calls == {1: k}
+    # The first wave, then FOLLOW_UP_WAVE at a time, the last one cut to k
+    assert (k - first_wave_size(k, 0.8)) > FOLLOW_UP_WAVE
+    assert results[0]["sample_count"] == k
+    assert [s["sample_index"] for s in samples] == list(range(k))
+
+    passes = sum(1 for s in samples if s["score"] == 2)
+    assert results[0]["flakiness"] == round(flakiness(passes, k), 4)
+    assert results[0]["flakiness"] > 0.5
@@ -0,0 +1,60 @@
+"""
+Conditional GETs: If-None-Match matches the run ETag whichever content
+coding the client holds, and compares weakly as RFC 9110 requires. The
+content coding itself is chosen by Accept-Encoding q-value.
+"""
+from starlette.requests import Request
+
+from app.core import compression
+from app.core.compression import encoded_etag
+from app.core.http_cache import not_modified
+
+ETAG = '"r1v0"'
+
+
+def _request(if_none_match=None):
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_no_header_or_other_tag_is_not_a_hit():
+    assert not_modified(_request(), ETAG) is None
+    assert not_modified(_request('"r2v0"'), ETAG) is None
+    assert not_modified(_request(ETAG), None) is None
+
+
+def test_plain_and_encoded_tags_match():
+    assert not_modified(_request(ETAG), ETAG).status_code == 304
+    gzip_tag = encoded_etag(ETAG, "gzip")
+    response = not_modified(_request(f'"other", {gzip_tag}'), ETAG)
+    assert response.status_code == 304
+    assert response.headers["etag"] == gzip_tag
+
+
+def test_weak_tags_match():
+    weak = 'W/"r1v0-gzip"'
+    response = not_modified(_request(weak), ETAG)
+    assert response.status_code == 304
+    assert response.headers["etag"] == weak
+    assert not_modified(_request('W/"r1v0"'), ETAG).status_code == 304
+
+
+def test_wildcard_matches():
+    assert not_modified(_request("*"), ETAG).status_code == 304
+
+
+def test_encoding_follows_q_values(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert compression.negotiate_encoding("gzip, br") == "br"
+    assert compression.negotiate_encoding("gzip;q=1, br;q=0.1") == "gzip"
+    assert compression.negotiate_encoding("gzip;q=0.5, br;q=0.5") == "br"
+    assert compression.negotiate_encoding("br;q=0, gzip;q=0.2") == "gzip"
+    assert compression.negotiate_encoding("identity, deflate") is None
+
+
+def test_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.negotiate_encoding("br") is None
+    assert compression.negotiate_encoding("br;q=1, gzip;q=0.1") == "gzip"
@@ -0,0 +1,76 @@
+"""
+Garbage collection of output blobs: unreferenced blobs are marked on one
+pass and deleted, with their search rows, once the grace period is over.
+"""
+import os
+from datetime import timedelta
+
+# app.db.session builds its engine at import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import app.db.init_db  # noqa: F401  (registers every model)
+from app.db.base import Base
+from app.models.evaluation_result import EvaluationResult
+from app.models.output_blob import OutputBlob
+from app.services.output_store import collect_garbage, output_hash, save_results
+from app.services.search_index import ensure_search_schema, outputs_match
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    ensure_search_schema(engine)
+    with Session(engine) as db:
+        save_results(db, 1, [
+            {"test_id": 1, "output": "shared answer", "score": 2, "category": "correct"},
+            {"test_id": 2, "output": "orphaned answer", "score": 0, "category": "incorrect"},
+        ])
+        save_results(db, 2, [{"test_id": 1, "output": "shared answer", "score": 2, "category": "correct"}])
+        db.commit()
+        # Run 1 archived or deleted
+        db.query(EvaluationResult).filter(EvaluationResult.model_run_id == 1).delete()
+        db.commit()
+        yield db
+    engine.dispose()
+
+
+def _blobs(db):
+    return {h for (h,) in db.query(OutputBlob.hash)}
+
+
+def _found(db, q):
+    return db.query(EvaluationResult).filter(outputs_match(db, q)).count()
+
+
+def test_unreferenced_blobs_are_deleted_after_grace(db):
+    # The first pass only marks
+    assert collect_garbage(db, grace=timedelta(hours=1)) == 0
+    assert _blobs(db) == {output_hash("shared answer"), output_hash("orphaned answer")}
+
+    assert collect_garbage(db, grace=timedelta(0)) == 1
+    assert _blobs(db) == {output_hash("shared answer")}
+    assert _found(db, "shared") == 1
+
+
+def test_reused_blob_is_kept_and_searchable(db):
+    collect_garbage(db, grace=timedelta(hours=1))
+    # A new run produces the marked output again
+    save_results(db, 3, [{"test_id": 2, "output": "orphaned answer", "score": 0, "category": "incorrect"}])
+    db.commit()
+
+    assert collect_garbage(db, grace=timedelta(0)) == 0
+    assert _found(db, "orphaned") == 1
+
+
+def test_deleted_blob_can_be_stored_again(db):
+    collect_garbage(db, grace=timedelta(0))
+    save_results(db, 3, [{"test_id": 2, "output": "orphaned answer", "score": 0, "category": "incorrect"}])
+    db.commit()
+
+    assert output_hash("orphaned answer") in _blobs(db)
+    assert _found(db, "orphaned") == 1
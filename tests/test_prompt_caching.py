@@ -0,0 +1,84 @@
+"""
+Prompt caching with the local stand-in provider: the template is split
+into a shared prefix, repeated prefixes are reported as cached input, and
+cached input is billed at the provider's discount.
+"""
+import os
+import uuid
+from types import SimpleNamespace
+
+# app.db.session builds its engine at import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+
+from app.services import local_provider
+from app.services.evaluation_engine import (
+    cached_input_tokens, call_local, estimate_cost, evaluate_one, split_template,
+)
+
+
+@pytest.mark.parametrize("template, prompt, expected", [
+    (None, "Q", ("", "Q")),
+    ("", "Q", ("", "Q")),
+    ("Be brief.", "Q", ("Be brief.", "")),
+    ("System rules. {{prompt}}", "Q", ("System rules. ", "Q")),
+    ("Rules. {{prompt}} Answer:", "Q", ("Rules. ", "Q Answer:")),
+    ("A {{prompt}} B {{prompt}}", "Q", ("A ", "Q B Q")),
+])
+def test_split_template(template, prompt, expected):
+    prefix, rest = split_template(template, prompt)
+    assert (prefix, rest) == expected
+    if template and "{{prompt}}" in template:
+        assert prefix + rest == template.replace("{{prompt}}", prompt)
+
+
+def _unique_prefix():
+    # The local provider's prefix cache is process-wide
+    return f"You are grader {uuid.uuid4().hex}. Answer briefly: "
+
+
+def test_local_provider_reports_repeated_prefix_as_cached():
+    prefix = _unique_prefix()
+    prefix_tokens = local_provider.count_tokens(prefix)
+
+    _, first = call_local("local-x", "what is 2+2", prefix=prefix)
+    _, second = call_local("local-x", "what is 3+3", prefix=prefix)
+    _, unprefixed = call_local("local-x", "what is 4+4")
+
+    assert first["cached_input"] == 0
+    assert second["cached_input"] == prefix_tokens
+    assert second["input"] == prefix_tokens + local_provider.count_tokens("what is 3+3")
+    assert unprefixed["cached_input"] == 0
+
+
+def test_run_counts_cache_hits_of_every_test_after_the_first():
+    template = _unique_prefix() + "{{prompt}}"
+    prefix_tokens = local_provider.count_tokens(split_template(template, "")[0])
+    tests = [
+        SimpleNamespace(id=i, prompt=f"question {i}", expected=f"question {i}", task_type="general", context=None)
+        for i in range(4)
+    ]
+
+    results = [evaluate_one(test, "local-x", {}, template)[0] for test in tests]
+
+    assert [res["cached_input_tokens"] for res in results] == [0] + [prefix_tokens] * 3
+    assert cached_input_tokens(results) == 3 * prefix_tokens
+
+
+@pytest.mark.parametrize("model_name, rate", [
+    ("gpt-4", 0.5), ("claude-3", 0.1), ("gemini", 0.25), ("local-x", 0.25),
+])
+def test_cached_input_is_discounted_per_provider(model_name, rate):
+    full = estimate_cost(1_000_000, 0, model_name=model_name)
+    cached = estimate_cost(1_000_000, 0, 1_000_000, model_name=model_name)
+    assert cached == pytest.approx(full * rate)
+
+    # Half the input cached, output billed as before
+    mixed = estimate_cost(1_000_000, 1_000_000, 500_000, model_name=model_name)
+    assert mixed == pytest.approx(full * (0.5 + 0.5 * rate) + 0.30)
+
+
+def test_batch_halves_the_cost():
+    sync = estimate_cost(1_000_000, 200_000, 300_000, model_name="gpt-4")
+    assert estimate_cost(1_000_000, 200_000, 300_000, batch=True, model_name="gpt-4") == pytest.approx(sync / 2)
@@ -0,0 +1,149 @@
+"""
+Smoke runs: stratified ordering, the stratified interval and the wave
+loop that stops once the interval is narrow enough.
+"""
+import math
+import os
+from collections import Counter
+from types import SimpleNamespace
+
+# app.db.session builds its engine at import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+
+from app.services import sampling
+from app.services.sampling import MIN_CASES, evaluate_sampled, stratified_interval, stratified_order
+
+Z95 = 1.959964
+
+
+def _tests(sizes):
+    tests = []
+    for task_type, size in sizes.items():
+        start = len(tests)
+        tests.extend(SimpleNamespace(id=start + i, task_type=task_type, prompt="q") for i in range(size))
+    return tests
+
+
+def test_every_prefix_of_the_order_is_proportional():
+    sizes = {"math": 60, "general": 30, "safety": 10}
+    tests = _tests(sizes)
+    ordered = stratified_order(tests, seed=7)
+
+    assert sorted(t.id for t in ordered) == sorted(t.id for t in tests)
+    counts = Counter()
+    for m, test in enumerate(ordered, 1):
+        counts[test.task_type] += 1
+        for task_type, size in sizes.items():
+            assert abs(counts[task_type] - m * size / len(tests)) <= 1
+    assert [t.id for t in stratified_order(tests, seed=7)] == [t.id for t in ordered]
+
+
+def test_interval_of_one_stratum():
+    estimate, low, high = stratified_interval({"general": [1, 1, 0, 0]}, {"general": 10 ** 9}, 0.95)
+    # Smoothed variance (1 + 1/4) / (4 + 1/2), then over n
+    half = Z95 * math.sqrt(1.25 / 4.5 / 4)
+    assert estimate == pytest.approx(0.5)
+    assert (low, high) == (pytest.approx(0.5 - half, abs=1e-5), pytest.approx(0.5 + half, abs=1e-5))
+
+
+def test_interval_weights_strata_by_population_and_applies_the_fpc():
+    values = {"math": [1] * 10, "general": [0] * 10}
+    estimate, low, high = stratified_interval(values, {"math": 30, "general": 10}, 0.95)
+
+    assert estimate == pytest.approx(0.75)
+    # "general" was fully evaluated: only the math half of the sample varies
+    math_var = 0.25 / 10.5 / 10 * (1 - 10 / 30)
+    assert high - low == pytest.approx(2 * Z95 * math.sqrt(0.75 ** 2 * math_var), abs=1e-5)
+
+
+def test_unanimous_sample_still_has_an_interval():
+    estimate, low, high = stratified_interval({"general": [1] * 5}, {"general": 1000}, 0.95)
+    assert estimate == 1 and high - low > 0
+
+
+def test_interval_without_samples():
+    assert stratified_interval({"general": []}, {"general": 10}, 0.95) == (None, None, None)
+
+
+def _fake_evaluate(monkeypatch, score_of, stop_after=None):
+    """Replaces evaluate(); records each wave's size, optionally rate-limits after `stop_after` cases."""
+    waves = []
+
+    def evaluate(test_cases, model_name, api_keys, system_template=None, hedge=None, ticket=None):
+        waves.append(len(test_cases))
+        done = sum(waves[:-1])
+        if stop_after is not None:
+            test_cases = test_cases[:max(0, stop_after - done)]
+        results = [
+            {"test_id": t.id, "output": "o", "score": score_of(t), "category": "c"}
+            for t in test_cases
+        ]
+        return results, 10 * len(results), 5 * len(results)
+
+    monkeypatch.setattr(sampling, "evaluate", evaluate)
+    return waves
+
+
+def test_stops_once_the_interval_is_narrow_enough(monkeypatch):
+    tests = _tests({"math": 300, "general": 200})
+    waves = _fake_evaluate(monkeypatch, lambda t: 2 if t.id % 2 else 0)
+
+    results, input_tokens, _, report = evaluate_sampled(tests, "m", {}, target_ci_width=0.15, wave_size=50, seed=1)
+
+    assert all(size == 50 for size in waves)
+    assert report["cases_evaluated"] == len(results) == sum(waves) < len(tests)
+    assert report["stopped_early"] is True
+    assert report["ci_high"] - report["ci_low"] <= 0.15
+    assert input_tokens == 10 * len(results)
+
+    # One wave fewer would not have been narrow enough
+    fewer = len(results) - 50
+    by_stratum = {"math": [], "general": []}
+    for res in results[:fewer]:
+        by_stratum["math" if res["test_id"] < 300 else "general"].append(1 if res["score"] == 2 else 0)
+    _, low, high = stratified_interval(by_stratum, {"math": 300, "general": 200}, 0.95)
+    assert high - low > 0.15
+
+
+def test_never_stops_before_min_cases(monkeypatch):
+    waves = _fake_evaluate(monkeypatch, lambda t: 2)
+
+    _, _, _, report = evaluate_sampled(_tests({"general": 200}), "m", {}, target_ci_width=0.5, wave_size=10)
+
+    assert report["cases_evaluated"] == MIN_CASES
+    assert waves == [10] * (MIN_CASES // 10)
+
+
+def test_unreachable_target_evaluates_everything(monkeypatch):
+    _fake_evaluate(monkeypatch, lambda t: 2 if t.id % 3 else 0)
+
+    _, _, _, report = evaluate_sampled(_tests({"general": 120}), "m", {}, target_ci_width=0.001, wave_size=50)
+
+    assert report["cases_evaluated"] == 120
+    assert report["stopped_early"] is False
+    # Everything evaluated: the finite population correction closes the interval
+    assert report["ci_low"] == report["ci_high"] == report["estimate"]
+
+
+def test_rate_limited_wave_ends_the_run(monkeypatch):
+    _fake_evaluate(monkeypatch, lambda t: 2, stop_after=70)
+
+    _, _, _, report = evaluate_sampled(_tests({"general": 500}), "m", {}, target_ci_width=0.001, wave_size=50)
+
+    assert report["cases_evaluated"] == 70
+    assert report["stopped_early"] is False
+
+
+def test_baseline_difference_decides_the_stop(monkeypatch):
+    tests = _tests({"general": 400})
+    _fake_evaluate(monkeypatch, lambda t: 2)
+    # Same verdicts as the baseline: the difference is known long before the pass rate
+    baseline = {t.id: 2 for t in tests}
+
+    _, _, _, report = evaluate_sampled(tests, "m", {}, target_ci_width=0.05, wave_size=50, baseline_scores=baseline)
+
+    assert report["stopped_early"] is True
+    assert report["diff_estimate"] == 0
+    assert report["diff_ci_high"] - report["diff_ci_low"] <= 0.05
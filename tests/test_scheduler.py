@@ -0,0 +1,122 @@
+"""
+Fair sharing of provider slots: weighted fair queuing order between flows,
+the per-user cap and cancellation of waiting calls.
+"""
+import os
+import threading
+import time
+
+# app.db.session builds its engine at import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+
+from app.services.scheduler import RunCancelled, Scheduler
+
+
+def _scheduler(slots, user_cap):
+    scheduler = Scheduler(slots=slots, user_cap=user_cap)
+    # Cross-process cancellations are read from the database; not needed here
+    scheduler._poll_cancellations = lambda: None
+    return scheduler
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _queue_call(scheduler, ticket, on_slot, errors=None):
+    """Starts a thread making one call through `ticket`, once it is queued."""
+    def call():
+        try:
+            with ticket.slot():
+                on_slot()
+        except RunCancelled as e:
+            errors.append(e)
+
+    queued = len(scheduler.waiting)
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    # Queue order decides the tags, so start threads one at a time
+    _wait_until(lambda: len(scheduler.waiting) > queued or not thread.is_alive())
+    return thread
+
+
+def _run_in_slot_order(scheduler, calls):
+    """Queues `calls` ([(label, ticket)]) behind a held slot; returns the order they ran in."""
+    holder = scheduler.register("holder", "holder", 0)
+    scheduler.acquire(holder)
+
+    order = []
+    threads = [_queue_call(scheduler, ticket, lambda label=label: order.append(label)) for label, ticket in calls]
+    scheduler.release(holder)
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+
+def test_flows_of_equal_weight_interleave():
+    scheduler = _scheduler(slots=1, user_cap=4)
+    a = scheduler.register("a", user_id=1, project_id=1)
+    b = scheduler.register("b", user_id=2, project_id=2)
+
+    order = _run_in_slot_order(scheduler, [("a", a)] * 3 + [("b", b)] * 3)
+    assert order == ["a", "b", "a", "b", "a", "b"]
+
+
+def test_interactive_gets_four_times_the_nightly_share():
+    scheduler = _scheduler(slots=1, user_cap=4)
+    interactive = scheduler.register("i", user_id=1, project_id=1, priority="interactive")
+    nightly = scheduler.register("n", user_id=2, project_id=2, priority="nightly")
+
+    order = _run_in_slot_order(scheduler, [("i", interactive)] * 5 + [("n", nightly)] * 2)
+    assert order == ["i", "i", "i", "i", "n", "i", "n"]
+
+
+def test_user_cap_lets_other_users_pass():
+    scheduler = _scheduler(slots=2, user_cap=1)
+    first = scheduler.register("first", user_id=1, project_id=1)
+    second = scheduler.register("second", user_id=1, project_id=2)
+    other = scheduler.register("other", user_id=2, project_id=3)
+    scheduler.acquire(first)
+
+    second_ran = threading.Event()
+    other_ran = threading.Event()
+    capped = _queue_call(scheduler, second, second_ran.set)
+    passed = _queue_call(scheduler, other, other_ran.set)
+
+    # A slot is free, but user 1 already holds their one
+    assert other_ran.wait(timeout=5)
+    passed.join(timeout=5)
+    assert not second_ran.is_set()
+    assert scheduler.user_in_flight == {1: 1}
+
+    scheduler.release(first)
+    assert second_ran.wait(timeout=5)
+    capped.join(timeout=5)
+    assert scheduler.in_flight == 0
+
+
+def test_cancel_wakes_a_waiting_call():
+    scheduler = _scheduler(slots=1, user_cap=1)
+    holder = scheduler.register("holder", user_id=1, project_id=1)
+    waiter = scheduler.register("waiter", user_id=2, project_id=2)
+    scheduler.acquire(holder)
+
+    errors = []
+    thread = _queue_call(scheduler, waiter, lambda: None, errors)
+    assert scheduler.cancel("waiter") is True
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert len(errors) == 1 and isinstance(errors[0], RunCancelled)
+    assert scheduler.waiting == []
+    # Later calls of the cancelled run fail without queueing
+    with pytest.raises(RunCancelled):
+        scheduler.acquire(waiter)
+
+    scheduler.release(holder)
+    assert scheduler.cancel("unknown") is False
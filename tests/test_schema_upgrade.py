@@ -0,0 +1,143 @@
+"""
+Startup against a database created with the original schema: before test
+content hashes, soft-deleted projects, retention, the output blob store
+and the per-result timing and judge columns.
+"""
+import os
+
+# app.db.session builds its engine at import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+import app.db.init_db  # noqa: F401  (registers every model)
+from app.db.base import Base
+from app.db.upgrade import upgrade_schema
+from app.models.evaluation_result import EvaluationResult
+from app.models.model_run import ModelRun
+from app.models.project import Project
+from app.models.test_case import TestCase
+from app.services.output_store import output_text, save_results
+from app.services.search_index import ensure_search_schema
+from app.services.test_import import content_hash
+
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER NOT NULL, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL,
+        openai_key VARCHAR, anthropic_key VARCHAR, gemini_key VARCHAR,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    """CREATE TABLE projects (
+        id INTEGER NOT NULL, name VARCHAR NOT NULL, domain VARCHAR, user_id INTEGER NOT NULL,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+    )""",
+    "CREATE INDEX ix_projects_id ON projects (id)",
+    """CREATE TABLE prompt_versions (
+        id VARCHAR NOT NULL, project_id INTEGER NOT NULL, version INTEGER NOT NULL,
+        template TEXT NOT NULL, created_at DATETIME,
+        PRIMARY KEY (id), FOREIGN KEY(project_id) REFERENCES projects (id)
+    )""",
+    """CREATE TABLE tests (
+        id INTEGER NOT NULL, prompt TEXT NOT NULL, context TEXT, task_type VARCHAR NOT NULL,
+        rules JSON, expected TEXT, project_id INTEGER NOT NULL,
+        PRIMARY KEY (id), FOREIGN KEY(project_id) REFERENCES projects (id)
+    )""",
+    "CREATE INDEX ix_tests_id ON tests (id)",
+    """CREATE TABLE model_runs (
+        id INTEGER NOT NULL, project_id INTEGER NOT NULL, model_name VARCHAR NOT NULL,
+        status VARCHAR, prompt_version_id VARCHAR, total_input_tokens INTEGER,
+        total_output_tokens INTEGER, estimated_cost FLOAT, started_at DATETIME, completed_at DATETIME,
+        PRIMARY KEY (id), FOREIGN KEY(project_id) REFERENCES projects (id),
+        FOREIGN KEY(prompt_version_id) REFERENCES prompt_versions (id)
+    )""",
+    "CREATE INDEX ix_model_runs_id ON model_runs (id)",
+    """CREATE TABLE evaluation_results (
+        id VARCHAR NOT NULL, model_run_id INTEGER NOT NULL, test_case_id INTEGER NOT NULL,
+        model_output VARCHAR NOT NULL, score INTEGER NOT NULL, category VARCHAR NOT NULL,
+        PRIMARY KEY (id), FOREIGN KEY(model_run_id) REFERENCES model_runs (id),
+        FOREIGN KEY(test_case_id) REFERENCES tests (id)
+    )""",
+]
+
+BASELINE_ROWS = [
+    "INSERT INTO users (id, email, hashed_password) VALUES (1, 'a@b.com', 'x')",
+    "INSERT INTO projects (id, name, domain, user_id) VALUES (1, 'p', 'general', 1)",
+    "INSERT INTO tests (id, prompt, task_type, expected, project_id) VALUES (1, 'What is 2+2?', 'math', '4', 1)",
+    "INSERT INTO model_runs (id, project_id, model_name, status, total_input_tokens, total_output_tokens,"
+    " estimated_cost) VALUES (1, 1, 'gpt-4', 'completed', 10, 5, 0.1)",
+    "INSERT INTO evaluation_results (id, model_run_id, test_case_id, model_output, score, category)"
+    " VALUES ('r1', 1, 1, 'It is 4', 2, 'correct')",
+]
+
+
+def _startup(engine):
+    # What init_db does, against this engine
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    ensure_search_schema(engine)
+
+
+def _schema(engine):
+    inspector = inspect(engine)
+    return {
+        table: (
+            {c["name"]: c["nullable"] for c in inspector.get_columns(table)},
+            sorted(i["name"] for i in inspector.get_indexes(table)),
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA + BASELINE_ROWS:
+            conn.execute(text(statement))
+    _startup(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_adds_missing_columns_and_indexes(engine):
+    schema = _schema(engine)
+    for table in Base.metadata.sorted_tables:
+        columns, indexes = schema[table.name]
+        assert set(columns) == {c.name for c in table.columns}, table.name
+        assert {i.name for i in table.indexes} <= set(indexes), table.name
+    assert schema["evaluation_results"][0]["model_output"] is True
+
+
+def test_existing_rows_are_backfilled(engine):
+    with Session(engine) as db:
+        test = db.get(TestCase, 1)
+        assert test.content_hash == content_hash("What is 2+2?", "math", None, "4")
+        assert db.get(Project, 1).retention_keep_latest == 3
+
+        run = db.get(ModelRun, 1)
+        assert (run.mode, run.priority, run.samples_per_test, run.result_version) == ("full", "interactive", 1, 0)
+        assert run.archive_path is None
+
+        result = db.get(EvaluationResult, "r1")
+        assert output_text(result.model_output, None, None) == "It is 4"
+        assert result.retry_count == 0
+
+
+def test_current_code_works_on_upgraded_database(engine):
+    with Session(engine) as db:
+        assert db.query(Project).filter(Project.deleted_at.is_(None)).count() == 1
+
+        # Outputs go to the blob store, leaving model_output NULL
+        save_results(db, 1, [{"test_id": 1, "output": "Four", "score": 2, "category": "correct"}])
+        db.commit()
+        assert db.query(EvaluationResult).filter(EvaluationResult.model_output.is_(None)).count() == 1
+
+
+def test_upgrade_is_idempotent(engine):
+    before = _schema(engine)
+    _startup(engine)
+    assert _schema(engine) == before
@@ -0,0 +1,66 @@
+"""
+SQLite output search must survive anything that renumbers the implicit
+rowids of output_blobs (a table with a string primary key): VACUUM may,
+and rebuilding the table (as db/upgrade does) always does.
+"""
+import os
+
+# app.db.session builds its engine at import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import app.db.init_db  # noqa: F401  (registers every model)
+from app.db.base import Base
+from app.models.evaluation_result import EvaluationResult
+from app.models.output_blob import OutputBlob
+from app.services.output_store import output_hash, save_results
+from app.services.search_index import ensure_search_schema, outputs_match
+
+OUTPUTS = ["alpha apples", "bravo bananas", "charlie cherries", "delta dates"]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(bind=engine)
+    ensure_search_schema(engine)
+    yield engine
+    engine.dispose()
+
+
+def _matching(engine, q):
+    with Session(engine) as db:
+        return sorted(
+            h for (h,) in db.query(EvaluationResult.output_hash).filter(outputs_match(db, q))
+        )
+
+
+def _rebuild_output_blobs(conn):
+    conn.execute(text("CREATE TABLE output_blobs_copy AS SELECT * FROM output_blobs WHERE 0"))
+    conn.execute(text("INSERT INTO output_blobs_copy SELECT * FROM output_blobs ORDER BY hash DESC"))
+    conn.execute(text("DROP TABLE output_blobs"))
+    conn.execute(text("ALTER TABLE output_blobs_copy RENAME TO output_blobs"))
+
+
+def test_search_survives_renumbered_blobs(engine):
+    with Session(engine) as db:
+        save_results(db, 1, [
+            {"test_id": i, "output": output, "score": 2, "category": "correct"}
+            for i, output in enumerate(OUTPUTS)
+        ])
+        db.commit()
+        # Leaves a gap in the rowids
+        db.query(EvaluationResult).filter(EvaluationResult.output_hash == output_hash(OUTPUTS[0])).delete()
+        db.query(OutputBlob).filter(OutputBlob.hash == output_hash(OUTPUTS[0])).delete()
+        db.commit()
+
+    with engine.begin() as conn:
+        _rebuild_output_blobs(conn)
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+
+    for output in OUTPUTS[1:]:
+        assert _matching(engine, output.split()[1]) == [output_hash(output)]